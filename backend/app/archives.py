@@ -0,0 +1,118 @@
+"""Streaming ZIP archives of job outputs."""
+
+from __future__ import annotations
+
+import os
+import uuid
+import zipfile
+from pathlib import Path
+from typing import IO, Iterator
+
+CHUNK_SIZE = 1024 * 1024
+
+# Formats whose payload is already compressed; deflating them again costs
+# CPU for no size gain.
+STORED_SUFFIXES = frozenset(
+    {
+        ".aac",
+        ".avi",
+        ".flac",
+        ".jpeg",
+        ".jpg",
+        ".m4a",
+        ".mkv",
+        ".mov",
+        ".mp3",
+        ".mp4",
+        ".ogg",
+        ".png",
+        ".webm",
+        ".webp",
+        ".zip",
+    },
+)
+
+
+class _ChunkSink:
+    """Write-only stream that hands written bytes back to the generator.
+
+    It deliberately has no ``tell``/``seek`` so :class:`zipfile.ZipFile`
+    treats it as unseekable and writes data descriptors instead of seeking
+    back to patch local headers.
+    """
+
+    def __init__(self, tee: IO[bytes] | None = None) -> None:
+        self._chunks: list[bytes] = []
+        self._tee = tee
+
+    def write(self, data: bytes) -> int:
+        if data:
+            chunk = bytes(data)
+            self._chunks.append(chunk)
+            if self._tee is not None:
+                self._tee.write(chunk)
+        return len(data)
+
+    def flush(self) -> None:
+        return None
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _archive_members(directory: Path) -> list[tuple[Path, str]]:
+    return [
+        (path, path.relative_to(directory).as_posix())
+        for path in sorted(directory.rglob("*"))
+        if path.is_file()
+    ]
+
+
+def stream_zip(directory: Path, *, cache_path: Path | None = None) -> Iterator[bytes]:
+    """Yield a ZIP archive of ``directory`` while it is being built.
+
+    Entries are read and compressed one chunk at a time, so the first bytes
+    go out immediately regardless of job size. ZIP64 records are written
+    when needed. With ``cache_path`` the archive is also written to disk and
+    only moved into place once complete, so later downloads can be served
+    (and resumed) from the finished file.
+    """
+
+    cache_file: IO[bytes] | None = None
+    staging: Path | None = None
+    if cache_path is not None:
+        staging = cache_path.with_name(f"{cache_path.name}.part-{uuid.uuid4().hex}")
+        cache_file = staging.open("wb")
+
+    completed = False
+    try:
+        sink = _ChunkSink(cache_file)
+        with zipfile.ZipFile(sink, "w", allowZip64=True) as archive:  # type: ignore[arg-type]
+            for path, arcname in _archive_members(directory):
+                info = zipfile.ZipInfo.from_file(path, arcname)
+                if path.suffix.lower() in STORED_SUFFIXES:
+                    info.compress_type = zipfile.ZIP_STORED
+                else:
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                with path.open("rb") as source, archive.open(info, "w") as entry:
+                    while chunk := source.read(CHUNK_SIZE):
+                        entry.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+                data = sink.drain()
+                if data:
+                    yield data
+        data = sink.drain()
+        if data:
+            yield data
+        completed = True
+    finally:
+        if cache_file is not None and staging is not None and cache_path is not None:
+            cache_file.close()
+            if completed:
+                os.replace(staging, cache_path)
+            else:
+                staging.unlink(missing_ok=True)
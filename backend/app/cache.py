@@ -0,0 +1,262 @@
+"""Content-addressed cache of conversion results."""
+
+from __future__ import annotations
+
+import errno
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Mapping
+
+from .metrics import result_cache_evictions, result_cache_lookups
+
+logger = logging.getLogger("converti")
+
+CACHE_DIRNAME = ".cache"
+# Bump whenever converter output for the same inputs changes.
+CACHE_VERSION = 2
+
+_FICLONE = 0x40049409
+_DIGEST_CHUNK_BYTES = 1024 * 1024
+
+
+def _reflink(source: Path, destination: Path) -> None:
+    import fcntl
+
+    with source.open("rb") as src, destination.open("wb") as dst:
+        fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+
+
+def link_or_copy(source: Path, destination: Path) -> None:
+    """Place ``source`` at ``destination`` without copying bytes if possible.
+
+    Tries a hard link first, then a copy-on-write reflink, and only falls
+    back to a byte copy when the filesystem supports neither.
+    """
+
+    destination.unlink(missing_ok=True)
+    try:
+        os.link(source, destination)
+        return
+    except OSError:
+        pass
+    try:
+        _reflink(source, destination)
+        return
+    except (ImportError, OSError):
+        destination.unlink(missing_ok=True)
+    shutil.copyfile(source, destination)
+
+
+def file_digest(path: Path) -> str:
+    """Hex SHA-256 of the contents of ``path``."""
+
+    hasher = hashlib.sha256()
+    with path.open("rb") as handle:
+        while chunk := handle.read(_DIGEST_CHUNK_BYTES):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_used_at ON entries (used_at);
+"""
+
+
+class ResultCache:
+    """LRU cache of converted files stored under ``directory``.
+
+    Entries are keyed on the source content hash plus everything that
+    influences the output (category, target format, converter options).
+    Sizes and recency live in an SQLite index next to the files, shared by
+    every process using the directory, so the API and queue workers enforce
+    one ``max_bytes`` budget between them.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max(0, max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+        if self.enabled:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(
+                self.directory / "index.sqlite3",
+                check_same_thread=False,
+                isolation_level=None,
+                timeout=30,
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(
+        source_digest: str,
+        category: str,
+        target_format: str,
+        options: Mapping[str, Any] | None = None,
+    ) -> str:
+        payload = json.dumps(
+            {
+                "v": CACHE_VERSION,
+                "source": source_digest,
+                "category": category,
+                "target": target_format.lower(),
+                "options": dict(options or {}),
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        assert self._db is not None
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _load(self) -> None:
+        """Index files from before the index existed, oldest first."""
+
+        with self._transaction() as db:
+            if db.execute("SELECT 1 FROM entries LIMIT 1").fetchone() is not None:
+                # The budget may have shrunk since the last start.
+                self._evict(db)
+                return
+            for path in self.directory.glob("??/*"):
+                if not path.is_file() or ".tmp-" in path.name:
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                db.execute(
+                    "INSERT OR REPLACE INTO entries (key, size, used_at) VALUES (?, ?, ?)",
+                    (path.name, stat.st_size, stat.st_mtime),
+                )
+            self._evict(db)
+
+    def fetch(self, key: str, destination: Path) -> bool:
+        """Link a cached result to ``destination``; return whether it was a hit."""
+
+        if not self.enabled:
+            return False
+        assert self._db is not None
+        with self._lock:
+            present = self._db.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+        hit = False
+        if present is not None:
+            # Outside the transaction: a fallback copy may take a while.
+            try:
+                link_or_copy(self._path(key), destination)
+                hit = True
+            except FileNotFoundError:
+                pass
+            with self._transaction() as db:
+                if hit:
+                    db.execute("UPDATE entries SET used_at = ? WHERE key = ?", (time.time(), key))
+                elif not self._path(key).exists():
+                    # Evicted by another process since the lookup.
+                    db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        result_cache_lookups.labels(outcome="hit" if hit else "miss").inc()
+        return hit
+
+    def store(self, key: str, produced: Path) -> None:
+        """Add a freshly converted file to the cache."""
+
+        if not self.enabled:
+            return
+        try:
+            size = produced.stat().st_size
+        except FileNotFoundError:
+            return
+        if size > self.max_bytes:
+            return
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        staging = path.with_name(f"{key}.tmp-{uuid.uuid4().hex}")
+        try:
+            link_or_copy(produced, staging)
+            os.replace(staging, path)
+        except OSError as exc:
+            staging.unlink(missing_ok=True)
+            if exc.errno != errno.ENOSPC:
+                logger.warning("Could not cache result %s: %s", produced.name, exc)
+            return
+
+        with self._transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, size, used_at) VALUES (?, ?, ?)",
+                (key, size, time.time()),
+            )
+            self._evict(db)
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        (total,) = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in db.execute(
+            "SELECT key, size FROM entries ORDER BY used_at",
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._path(key).unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        self.evictions += evicted
+        result_cache_evictions.inc(evicted)
+
+    def stats(self) -> dict[str, int]:
+        entries = size = 0
+        if self._db is not None:
+            with self._lock:
+                entries, size = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries",
+                ).fetchone()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": size,
+                "maxBytes": self.max_bytes,
+            }
@@ -2,10 +2,11 @@
 
 from __future__ import annotations
 
+import os
 from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, Iterable, Literal
 
-from pydantic import field_validator
+from pydantic import Field, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -17,7 +18,39 @@ class Settings(BaseSettings):
     allowed_origins: list[str] | str = ["*"]
     job_storage_dir: Path = Path("./storage/jobs").resolve()
     max_concurrent_jobs: int = 4
+    max_jobs_per_client: int = 2
+    reserved_job_slots: int = 1
+    max_conversion_workers: int = Field(default_factory=lambda: os.cpu_count() or 4)
+    conversion_timeout_seconds: int = 0
+    cpu_thread_budget: int = Field(default_factory=lambda: os.cpu_count() or 4)
+    memory_budget_mb: int = 0
+    max_queued_jobs: int = 200
+    max_queued_jobs_per_client: int = 20
+    ffmpeg_threads: int = 0
+    ffmpeg_hardware_encoding: bool = False
+    video_segment_min_seconds: int = 600
+    video_segment_workers: int = 4
+    image_executor: Literal["thread", "process"] = "thread"
+    image_worker_max_tasks: int = 200
+    image_worker_memory_limit_mb: int = 0
+    image_max_pixels: int = 100_000_000
+    image_max_memory_mb: int = 1024
     job_retention_days: int = 7
+    job_store: Literal["memory", "sqlite"] = "memory"
+    job_store_path: Path | None = None
+    execution_mode: Literal["local", "queue"] = "local"
+    queue_path: Path | None = None
+    queue_visibility_timeout: int = 300
+    queue_max_attempts: int = 3
+    queue_poll_interval: float = 1.0
+    max_upload_file_mb: int = 0
+    max_upload_request_mb: int = 0
+    upload_session_hours: int = 24
+    pipelined_uploads: bool = False
+    result_cache_max_mb: int = 2048
+    event_stream_max_pending: int = 256
+    cache_zip_archives: bool = False
+    accel_redirect_prefix: str = ""
     model_config = SettingsConfigDict(env_prefix="CONVERTI_")
 
     @field_validator("allowed_origins", mode="after")
@@ -34,6 +67,13 @@ class Settings(BaseSettings):
             return result or ["*"]
         raise TypeError("allowed_origins must be a string or list of strings")
 
+    @model_validator(mode="after")
+    def check_execution_mode(self) -> "Settings":
+        # Workers in other processes only see jobs through a shared store.
+        if self.execution_mode == "queue" and self.job_store != "sqlite":
+            raise ValueError("execution_mode 'queue' requires job_store 'sqlite'")
+        return self
+
 
 settings = Settings()
 
@@ -2,21 +2,41 @@
 
 from __future__ import annotations
 
+import logging
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Iterable, Iterator, Mapping, Sequence
+
+from PIL import Image
 
 from .audio import SUPPORTED_FORMATS as AUDIO_FORMATS
 from .audio import AudioConverter
-from .base import ConversionError, Converter
+from .base import (
+    ConversionError,
+    ConversionObserver,
+    ConversionOutput,
+    ConversionSample,
+    Converter,
+    ProgressCallback,
+)
+from .image import IMAGE_PROFILES
 from .image import SUPPORTED_FORMATS as IMAGE_FORMATS
 from .image import ImageConverter
+from .profiles import AUDIO_PROFILES, PRESETS, VIDEO_PROFILES
 from .video import SUPPORTED_FORMATS as VIDEO_FORMATS
 from .video import VideoConverter
 
+logger = logging.getLogger("converti")
+
+_IMAGE = ImageConverter()
+_AUDIO = AudioConverter()
+_VIDEO = VideoConverter()
+
 _CONVERTERS: dict[str, Converter] = {
-    "images": ImageConverter(),
-    "audio": AudioConverter(),
-    "video": VideoConverter(),
+    "images": _IMAGE,
+    "audio": _AUDIO,
+    "video": _VIDEO,
 }
 
 SUPPORTED_TARGETS: dict[str, list[str]] = {
@@ -25,6 +45,118 @@ SUPPORTED_TARGETS: dict[str, list[str]] = {
     "video": sorted(VIDEO_FORMATS),
 }
 
+SUPPORTED_PROFILES: dict[str, dict[str, list[str]]] = {
+    "images": {
+        name: list(PRESETS)
+        for name, fmt in sorted(IMAGE_FORMATS.items())
+        if fmt in IMAGE_PROFILES
+    },
+    "audio": {fmt: list(PRESETS) for fmt in sorted(AUDIO_PROFILES)},
+    "video": {fmt: list(PRESETS) for fmt in sorted(VIDEO_PROFILES)},
+}
+
+
+def configure_ffmpeg(
+    *,
+    threads: int = 0,
+    prefer_hardware: bool = False,
+    segment_min_seconds: float = 0,
+    segment_workers: int = 0,
+) -> None:
+    """Apply deployment-wide ffmpeg settings to the audio and video converters."""
+
+    for converter in (_AUDIO, _VIDEO):
+        converter.threads = max(0, threads)
+        converter.prefer_hardware = prefer_hardware
+    _VIDEO.segment_min_seconds = max(0.0, segment_min_seconds)
+    _VIDEO.segment_workers = max(0, segment_workers)
+
+
+def video_segments(duration: float | None) -> int:
+    """Concurrent encoders a video of ``duration`` seconds is split across."""
+
+    return _VIDEO.segments_for(duration)
+
+
+def configure_images(*, max_pixels: int = 0, max_memory_bytes: int = 0) -> None:
+    """Apply deployment-wide size limits to the image converter."""
+
+    _IMAGE.max_pixels = max(0, max_pixels)
+    _IMAGE.max_memory_bytes = max(0, max_memory_bytes)
+    # Our own check runs first with a clearer message; keep Pillow's
+    # decompression bomb guard from refusing images we allow.
+    Image.MAX_IMAGE_PIXELS = _IMAGE.max_pixels or None
+
+
+def image_limits() -> dict[str, int]:
+    """Current :func:`configure_images` arguments, to replay in workers."""
+
+    return {"max_pixels": _IMAGE.max_pixels, "max_memory_bytes": _IMAGE.max_memory_bytes}
+
+
+_OBSERVERS: list[ConversionObserver] = []
+
+
+def add_conversion_observer(observer: ConversionObserver) -> None:
+    """Call ``observer`` after every conversion, successful or not."""
+
+    _OBSERVERS.append(observer)
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+@contextmanager
+def observe_conversion(
+    category: str,
+    source: Path,
+    target: Path | Sequence[Path],
+    target_format: str | Sequence[str],
+) -> Iterator[None]:
+    """Time the enclosed conversion and report it to the observers.
+
+    A multi-output conversion takes one target format per target and is
+    reported once per output, each with an equal share of the time spent
+    and the bytes read.
+    """
+
+    targets = [target] if isinstance(target, Path) else list(target)
+    formats = [target_format] if isinstance(target_format, str) else list(target_format)
+
+    started = time.perf_counter()
+    succeeded = False
+    try:
+        yield
+        succeeded = True
+    finally:
+        if _OBSERVERS:
+            share = max(1, len(targets))
+            seconds = (time.perf_counter() - started) / share
+            input_bytes = _file_size(source) // share
+            for path, name in zip(targets, formats):
+                _report(
+                    ConversionSample(
+                        category=category,
+                        target_format=name.lower(),
+                        seconds=seconds,
+                        input_bytes=input_bytes,
+                        output_bytes=_file_size(path) if succeeded else 0,
+                        succeeded=succeeded,
+                    )
+                )
+
+
+def _report(sample: ConversionSample) -> None:
+    for observer in _OBSERVERS:
+        try:
+            observer(sample)
+        except Exception:  # pragma: no cover - never fail a conversion
+            logger.exception("Conversion observer failed")
+
 
 def available_categories() -> Iterable[str]:
     return _CONVERTERS.keys()
@@ -43,10 +175,49 @@ def list_targets(category: str) -> list[str]:
     return SUPPORTED_TARGETS[category]
 
 
-def convert_file(category: str, source: Path, target: Path, target_format: str) -> Path:
+def convert_file(
+    category: str,
+    source: Path,
+    target: Path,
+    target_format: str,
+    *,
+    options: Mapping[str, Any] | None = None,
+    progress: ProgressCallback | None = None,
+) -> Path:
     converter = get_converter(category)
     if not converter.can_handle(source, target_format):
         raise ConversionError(
             f"Conversion from {source.suffix} to {target_format} not supported",
         )
-    return converter.convert(source, target, target_format)
+    with observe_conversion(category, source, target, target_format):
+        return converter.convert(
+            source,
+            target,
+            target_format,
+            options=options,
+            progress=progress,
+        )
+
+
+def convert_outputs(
+    category: str,
+    source: Path,
+    outputs: Sequence[ConversionOutput],
+    *,
+    progress: ProgressCallback | None = None,
+) -> list[ConversionError | None]:
+    """Convert ``source`` to several outputs, reading and decoding it once."""
+
+    converter = get_converter(category)
+    for output in outputs:
+        if not converter.can_handle(source, output.target_format):
+            raise ConversionError(
+                f"Conversion from {source.suffix} to {output.target_format} not supported",
+            )
+    with observe_conversion(
+        category,
+        source,
+        [output.target for output in outputs],
+        [output.target_format for output in outputs],
+    ):
+        return converter.convert_many(source, outputs, progress=progress)
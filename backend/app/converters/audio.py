@@ -3,10 +3,12 @@
 from __future__ import annotations
 
 import shutil
-import subprocess
 from pathlib import Path
+from typing import Any, Mapping, Sequence
 
-from .base import ConversionError
+from .base import ConversionError, ConversionOutput, ProgressCallback
+from .ffmpeg import MediaInfo, probe_media, run_ffmpeg
+from .profiles import AUDIO_PROFILES, encoder_arguments, resolve_profile
 
 SUPPORTED_FORMATS = {"mp3", "wav", "aac", "ogg", "flac", "m4a"}
 
@@ -18,29 +20,73 @@ class AudioConverter:
 
     def __init__(self) -> None:
         self._ffmpeg = shutil.which("ffmpeg")
+        self._ffprobe = shutil.which("ffprobe")
+        self.threads = 0
+        self.prefer_hardware = False
 
     def can_handle(self, source: Path, target_format: str) -> bool:
         return self._ffmpeg is not None and target_format.lower() in SUPPORTED_FORMATS
 
-    def convert(self, source: Path, target: Path, target_format: str) -> Path:
-        if self._ffmpeg is None:
-            raise ConversionError("ffmpeg binary not found in PATH")
+    def _output_arguments(self, media: MediaInfo, target_format: str, options: Mapping[str, Any], threads: int) -> list[str]:
+        preset = options.get("profile")
+        profile = resolve_profile(
+            AUDIO_PROFILES,
+            target_format,
+            preset,
+            ffmpeg=self._ffmpeg,
+            hardware=self.prefer_hardware,
+        )
+        encoder_args = encoder_arguments(
+            profile,
+            target_format,
+            preset,
+            video_codecs=media.codecs("video"),
+            audio_codecs=media.codecs("audio"),
+            threads=threads,
+        )
+        if media.codecs("video"):
+            # Extracting audio from a video; never try to mux its frames.
+            encoder_args.append("-vn")
+        return encoder_args
 
-        command = [
-            self._ffmpeg,
-            "-y",
-            "-i",
-            str(source),
-            str(target),
-        ]
-        try:
-            subprocess.run(
-                command,
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
-        except subprocess.CalledProcessError as exc:
-            raise ConversionError(exc.stderr.decode("utf-8", errors="ignore")) from exc
+    def convert(
+        self,
+        source: Path,
+        target: Path,
+        target_format: str,
+        *,
+        options: Mapping[str, Any] | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> Path:
+        self.convert_many(source, [ConversionOutput(target, target_format, options or {})], progress=progress)
         return target
 
+    def convert_many(
+        self,
+        source: Path,
+        outputs: Sequence[ConversionOutput],
+        *,
+        progress: ProgressCallback | None = None,
+    ) -> list[ConversionError | None]:
+        """Encode every output from one ffmpeg process, decoding once."""
+
+        if self._ffmpeg is None:
+            raise ConversionError("ffmpeg binary not found in PATH")
+
+        media = probe_media(self._ffprobe, source)
+        command = [self._ffmpeg, "-y", "-i", str(source)]
+        for output in outputs:
+            # The thread grant covers the whole process; split it between
+            # the encoders running side by side.
+            threads = int(output.options.get("threads") or self.threads)
+            threads = max(1, threads // len(outputs)) if threads else 0
+            command += [
+                *self._output_arguments(media, output.target_format, output.options, threads),
+                str(output.target),
+            ]
+        run_ffmpeg(
+            command,
+            duration=media.duration,
+            progress=progress,
+        )
+        return [None] * len(outputs)
@@ -2,14 +2,55 @@
 
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Protocol
+from typing import Any, Callable, Mapping, Protocol, Sequence
 
 
 class ConversionError(RuntimeError):
     """Raised when a specific conversion fails."""
 
 
+class ConversionStopped(ConversionError):
+    """Raised when a running conversion was cancelled or ran out of time."""
+
+
+@dataclass
+class ConversionProgress:
+    """Progress of a single running conversion."""
+
+    fraction: float
+    speed: float | None = None
+    fps: float | None = None
+
+
+ProgressCallback = Callable[[ConversionProgress], None]
+
+
+@dataclass
+class ConversionOutput:
+    """One file to produce from a source, for multi-output conversions."""
+
+    target: Path
+    target_format: str
+    options: Mapping[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ConversionSample:
+    """Timing and sizes of one finished conversion, for instrumentation."""
+
+    category: str
+    target_format: str
+    seconds: float
+    input_bytes: int
+    output_bytes: int
+    succeeded: bool
+
+
+ConversionObserver = Callable[[ConversionSample], None]
+
+
 class Converter(Protocol):
     """Protocol every converter implementation must follow."""
 
@@ -18,6 +59,28 @@ class Converter(Protocol):
     def can_handle(self, source: Path, target_format: str) -> bool:
         ...
 
-    def convert(self, source: Path, target: Path, target_format: str) -> Path:
+    def convert(
+        self,
+        source: Path,
+        target: Path,
+        target_format: str,
+        *,
+        options: Mapping[str, Any] | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> Path:
+        ...
+
+    def convert_many(
+        self,
+        source: Path,
+        outputs: Sequence[ConversionOutput],
+        *,
+        progress: ProgressCallback | None = None,
+    ) -> list[ConversionError | None]:
+        """Produce every output from one read of ``source``.
+
+        Returns one entry per output: ``None`` on success, or the error that
+        output failed with. Raises if the source itself cannot be read.
+        """
         ...
 
@@ -0,0 +1,310 @@
+"""Helpers for running ffmpeg and ffprobe."""
+
+from __future__ import annotations
+
+import json
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, Protocol
+
+from .base import ConversionError, ConversionProgress, ConversionStopped, ProgressCallback
+
+# Keep the tail of ffmpeg's log for error messages; the head is the banner.
+_ERROR_TAIL_BYTES = 4000
+
+
+class StoppableProcess(Protocol):
+    def terminate(self) -> None: ...
+
+    def kill(self) -> None: ...
+
+
+class ProcessGroup:
+    """The ffmpeg processes of one conversion, stopped together.
+
+    :func:`run_ffmpeg` registers every process it starts with the group
+    active in its context (see :func:`process_group`). Once stopped, running
+    processes are asked to exit, and new ones fail before they start. A
+    group with a ``parent`` is stopped with it, but can also be stopped on
+    its own.
+    """
+
+    def __init__(self, parent: ProcessGroup | None = None) -> None:
+        self.parent = parent
+        self.reason: str | None = None
+        self._processes: set[StoppableProcess] = set()
+        self._lock = threading.Lock()
+
+    def add(self, process: StoppableProcess) -> None:
+        if self.parent is not None:
+            self.parent.add(process)
+        with self._lock:
+            self._processes.add(process)
+            stopped = self.reason is not None
+        if stopped:
+            process.kill()
+
+    def discard(self, process: StoppableProcess) -> None:
+        with self._lock:
+            self._processes.discard(process)
+        if self.parent is not None:
+            self.parent.discard(process)
+
+    def check(self) -> None:
+        """Raise :class:`ConversionStopped` if this group or a parent was stopped."""
+
+        if self.parent is not None:
+            self.parent.check()
+        if self.reason is not None:
+            raise ConversionStopped(self.reason)
+
+    def stop(self, reason: str) -> None:
+        """Terminate every process; ffmpeg still gets to close its files."""
+
+        with self._lock:
+            if self.reason is None:
+                self.reason = reason
+            processes = list(self._processes)
+        for process in processes:
+            process.terminate()
+
+    def kill(self) -> None:
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            process.kill()
+
+
+_current_group: ContextVar[ProcessGroup | None] = ContextVar("converti_process_group", default=None)
+
+
+def current_process_group() -> ProcessGroup | None:
+    return _current_group.get()
+
+
+@contextmanager
+def process_group(group: ProcessGroup) -> Iterator[ProcessGroup]:
+    """Register ffmpeg processes started in this context with ``group``."""
+
+    token = _current_group.set(group)
+    try:
+        yield group
+    finally:
+        _current_group.reset(token)
+
+
+@dataclass
+class MediaStream:
+    """One stream reported by ffprobe."""
+
+    codec_type: str
+    codec_name: str
+    attached_picture: bool = False
+    width: int = 0
+    height: int = 0
+    frame_rate: float | None = None
+
+
+@dataclass
+class MediaInfo:
+    """Container-level facts about an input file.
+
+    ``error`` is set when ffprobe ran but could not read the file; an
+    empty result without it means ffprobe was unavailable.
+    """
+
+    duration: float | None = None
+    streams: list[MediaStream] = field(default_factory=list)
+    format_name: str = ""
+    bit_rate: int | None = None
+    error: str | None = None
+
+    def codecs(self, codec_type: str) -> set[str]:
+        return {
+            stream.codec_name
+            for stream in self.streams
+            if stream.codec_type == codec_type and not stream.attached_picture
+        }
+
+    def _video_streams(self) -> list[MediaStream]:
+        return [
+            stream
+            for stream in self.streams
+            if stream.codec_type == "video" and not stream.attached_picture
+        ]
+
+    @property
+    def frame_pixels(self) -> int:
+        """Pixels per frame of the largest real video stream."""
+
+        return max((stream.width * stream.height for stream in self._video_streams()), default=0)
+
+    @property
+    def frame_rate(self) -> float | None:
+        """Frame rate of the largest real video stream, if known."""
+
+        streams = sorted(self._video_streams(), key=lambda stream: stream.width * stream.height)
+        return streams[-1].frame_rate if streams else None
+
+
+def _parse_ratio(value: str | None) -> float | None:
+    """``30000/1001`` style rates; ffprobe reports ``0/0`` when unknown."""
+
+    numerator, _, denominator = (value or "").partition("/")
+    try:
+        rate = float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return rate if rate > 0 else None
+
+
+def _parse_int(value: Any) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def probe_media(ffprobe: str | None, source: Path) -> MediaInfo:
+    """Describe ``source`` via ffprobe; returns an empty result on failure."""
+
+    if ffprobe is None:
+        return MediaInfo()
+    try:
+        completed = subprocess.run(
+            [
+                ffprobe,
+                "-v",
+                "error",
+                "-show_entries",
+                (
+                    "format=duration,format_name,bit_rate"
+                    ":stream=codec_type,codec_name,width,height,avg_frame_rate"
+                    ":stream_disposition=attached_pic"
+                ),
+                "-of",
+                "json",
+                str(source),
+            ],
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        data = json.loads(completed.stdout)
+    except subprocess.CalledProcessError as exc:
+        message = exc.stderr.decode("utf-8", errors="ignore").strip()
+        return MediaInfo(error=message[-_ERROR_TAIL_BYTES:] or "ffprobe could not read the file")
+    except (OSError, ValueError):
+        return MediaInfo()
+
+    container = data.get("format", {})
+    try:
+        duration: float | None = float(container.get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+    streams = [
+        MediaStream(
+            codec_type=stream.get("codec_type", ""),
+            codec_name=stream.get("codec_name", ""),
+            attached_picture=bool(stream.get("disposition", {}).get("attached_pic")),
+            width=int(stream.get("width") or 0),
+            height=int(stream.get("height") or 0),
+            frame_rate=_parse_ratio(stream.get("avg_frame_rate")),
+        )
+        for stream in data.get("streams", [])
+    ]
+    return MediaInfo(
+        duration=duration if duration and duration > 0 else None,
+        streams=streams,
+        format_name=container.get("format_name", ""),
+        bit_rate=_parse_int(container.get("bit_rate")),
+    )
+
+
+def _parse_rate(value: str | None, suffix: str = "") -> float | None:
+    if not value:
+        return None
+    value = value.strip().removesuffix(suffix)
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def run_ffmpeg(
+    command: list[str],
+    *,
+    duration: float | None = None,
+    progress: ProgressCallback | None = None,
+) -> None:
+    """Run an ffmpeg command, reporting progress as it encodes.
+
+    ``command`` must start with the ffmpeg binary; ``-progress pipe:1`` is
+    added so ffmpeg prints machine-readable ``key=value`` blocks on stdout.
+    stderr is spooled to a temporary file so a chatty encoder can never
+    fill the pipe and stall. Raises :class:`ConversionStopped` if the
+    process group of the calling context is stopped.
+    """
+
+    group = _current_group.get()
+    if group is not None:
+        group.check()
+    command = [command[0], "-nostats", "-progress", "pipe:1", *command[1:]]
+    with tempfile.TemporaryFile() as log:
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=log,
+            text=True,
+        )
+        if group is not None:
+            group.add(process)
+        try:
+            assert process.stdout is not None
+            block: dict[str, str] = {}
+            for line in process.stdout:
+                key, _, value = line.strip().partition("=")
+                if key != "progress":
+                    block[key] = value
+                    continue
+                if progress is not None:
+                    progress(_progress_from_block(block, duration, finished=value == "end"))
+                block = {}
+            returncode = process.wait()
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            if group is not None:
+                group.discard(process)
+        if group is not None:
+            group.check()
+        if returncode != 0:
+            log.seek(0, 2)
+            log.seek(max(0, log.tell() - _ERROR_TAIL_BYTES))
+            raise ConversionError(log.read().decode("utf-8", errors="ignore"))
+
+
+def _progress_from_block(
+    block: dict[str, str],
+    duration: float | None,
+    *,
+    finished: bool,
+) -> ConversionProgress:
+    fraction = 1.0 if finished else 0.0
+    if not finished and duration:
+        # ``out_time_ms`` is in microseconds as well, despite its name.
+        out_time = block.get("out_time_us") or block.get("out_time_ms")
+        position = _parse_rate(out_time)
+        if position is not None and position > 0:
+            fraction = min(1.0, position / 1_000_000 / duration)
+    return ConversionProgress(
+        fraction=fraction,
+        speed=_parse_rate(block.get("speed"), "x"),
+        fps=_parse_rate(block.get("fps")),
+    )
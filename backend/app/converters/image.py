@@ -2,11 +2,15 @@
 
 from __future__ import annotations
 
+import math
+import shutil
 from pathlib import Path
+from typing import Any, Iterable, Iterator, Mapping, Sequence
 
-from PIL import Image, UnidentifiedImageError
+from PIL import Image, ImageOps, TiffImagePlugin, UnidentifiedImageError
 
-from .base import ConversionError
+from .base import ConversionError, ConversionOutput, ProgressCallback
+from .profiles import DEFAULT_PRESET
 
 SUPPORTED_FORMATS = {
     "png": "PNG",
@@ -17,25 +21,525 @@ SUPPORTED_FORMATS = {
     "tiff": "TIFF",
 }
 
+# Encoder arguments per Pillow format and preset. zlib's default effort
+# (level 6) makes PNG the slowest image path for little gain over level 3.
+IMAGE_PROFILES: dict[str, dict[str, dict[str, Any]]] = {
+    "PNG": {
+        "fast": {"compress_level": 1},
+        "balanced": {"compress_level": 3},
+        "small": {"optimize": True},
+    },
+    "JPEG": {
+        "fast": {"quality": 80},
+        "balanced": {"quality": 85},
+        "small": {"quality": 75, "optimize": True, "progressive": True, "subsampling": "4:2:0"},
+    },
+    "WEBP": {
+        "fast": {"quality": 80, "method": 0},
+        "balanced": {"quality": 80, "method": 4},
+        "small": {"quality": 75, "method": 6},
+    },
+    "TIFF": {
+        "fast": {},
+        "balanced": {},
+        "small": {"compression": "tiff_adobe_deflate"},
+    },
+}
+
+# Modes each encoder writes as-is; anything else is converted first. TIFF
+# accepts every mode Pillow decodes.
+_ENCODER_MODES: dict[str, frozenset[str]] = {
+    "JPEG": frozenset({"L", "RGB", "CMYK"}),
+    "PNG": frozenset({"1", "L", "LA", "I", "I;16", "P", "RGB", "RGBA"}),
+    "WEBP": frozenset({"RGB", "RGBA"}),
+    "BMP": frozenset({"1", "L", "P", "RGB", "RGBA"}),
+}
+_ALPHA_MODES = frozenset({"RGBA", "LA", "PA", "RGBa", "La"})
+
+FIT_MODES = ("contain", "cover")
+# Option keys that change the pixels or metadata; any of them rules out
+# copying the source as-is.
+_TRANSFORM_OPTIONS = ("max_width", "max_height", "strip_metadata")
+# Formats Pillow can write ICC profiles and EXIF blocks to.
+_METADATA_FORMATS = frozenset({"JPEG", "PNG", "WEBP", "TIFF"})
+# Decode and shrink in integer steps down to this multiple of the final
+# size before the final resample, as Image.thumbnail() does.
+_REDUCING_GAP = 2.0
+# Targets that can hold every frame of an animation or multi-page file;
+# the others get the first frame.
+_MULTI_FRAME_FORMATS = frozenset({"PNG", "WEBP", "TIFF"})
+# Pillow's animated WebP and APNG encoders need every frame before they
+# write anything; TIFF pages are written as they are converted.
+_BUFFERED_FRAME_FORMATS = frozenset({"PNG", "WEBP"})
+# Uncompressed TIFFs are shrunk a band of strips or tiles at a time, each
+# band about this large, instead of decoding the whole image first.
+_BAND_BYTES = 32 * 1024 * 1024
+_BAND_MODES = frozenset({"L", "RGB", "RGBA", "CMYK"})
+# Pillow keeps these modes at one or two bytes per pixel, the rest at four.
+_NARROW_MODES = {"1": 1, "L": 1, "P": 1, "I;16": 2}
+
+
+def _output_mode(image: Image.Image, desired_format: str) -> str | None:
+    """Mode to convert to before saving, decided from the header alone."""
+
+    allowed = _ENCODER_MODES.get(desired_format)
+    if allowed is None or image.mode in allowed:
+        return None
+    has_alpha = image.mode in _ALPHA_MODES or "transparency" in image.info
+    if has_alpha and "RGBA" in allowed:
+        return "RGBA"
+    return "RGB"
+
+
+def _scaled_size(
+    size: tuple[int, int],
+    max_width: int | None,
+    max_height: int | None,
+    fit: str,
+) -> tuple[int, int] | None:
+    """Output size for the bounding box, or ``None`` if nothing shrinks."""
+
+    width, height = size
+    scales = []
+    if max_width:
+        scales.append(max_width / width)
+    if max_height:
+        scales.append(max_height / height)
+    if not scales:
+        return None
+    scale = max(scales) if fit == "cover" and len(scales) == 2 else min(scales)
+    if scale >= 1:
+        return None
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _shrink(image: Image.Image, options: Mapping[str, Any]) -> Image.Image:
+    max_width = options.get("max_width")
+    max_height = options.get("max_height")
+    fit = options.get("fit") or "contain"
+    size = _scaled_size(image.size, max_width, max_height, fit)
+    if size is None:
+        return image
+    if image.mode in ("1", "P"):
+        # Palette images can only be resampled with nearest neighbour.
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+    resized = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=_REDUCING_GAP)
+    if fit == "cover" and max_width and max_height:
+        left = (size[0] - min(max_width, size[0])) // 2
+        top = (size[1] - min(max_height, size[1])) // 2
+        resized = resized.crop(
+            (left, top, left + min(max_width, size[0]), top + min(max_height, size[1])),
+        )
+    return resized
+
+
+def _frame_bytes(size: tuple[int, int], mode: str = "RGBA") -> int:
+    return size[0] * size[1] * _NARROW_MODES.get(mode, 4)
+
+
+def _kept_frames(image: Image.Image) -> int:
+    # MPO files hold alternate views of a single photo, not an animation.
+    if image.format == "MPO":
+        return 1
+    return getattr(image, "n_frames", 1)
+
+
+def _held_frames(image: Image.Image, desired_format: str) -> int:
+    """Converted frames held at once while encoding ``image`` to ``desired_format``."""
+
+    if desired_format in _BUFFERED_FRAME_FORMATS:
+        return _kept_frames(image)
+    return 1
+
+
+def frame_note(source_format: str, frames: int, target_format: str) -> str | None:
+    """Why an output holds fewer frames than its source, if it does."""
+
+    desired_format = SUPPORTED_FORMATS.get(target_format.lower())
+    if frames <= 1 or source_format.upper() == "MPO" or desired_format in _MULTI_FRAME_FORMATS:
+        return None
+    kept = ", ".join(sorted(fmt.lower() for fmt in _MULTI_FRAME_FORMATS))
+    return f"Only the first of {frames} frames was converted; use {kept} to keep them all"
+
+
+def _band_factor(image: Image.Image, options: Mapping[str, Any]) -> int:
+    """Integer shrink factor for reading ``image`` in bands, or 0 if it can't be.
+
+    Only uncompressed, single-page TIFFs qualify: Pillow reads them strip by
+    strip, while compressed ones go through libtiff as a single tile.
+    """
+
+    if (
+        image.format != "TIFF"
+        or getattr(image, "use_load_libtiff", True)
+        or image.mode not in _BAND_MODES
+        or _kept_frames(image) > 1
+    ):
+        return 0
+    size = _scaled_size(
+        image.size,
+        options.get("max_width"),
+        options.get("max_height"),
+        options.get("fit") or "contain",
+    )
+    if size is None:
+        return 0
+    factor = int(min(image.width / (size[0] * _REDUCING_GAP), image.height / (size[1] * _REDUCING_GAP)))
+    return factor if factor >= 2 else 0
+
+
+def _row_bytes(image: Image.Image) -> int:
+    bits = image.tag_v2.get(258, (8,))
+    samples = image.tag_v2.get(277, 1)
+    per_pixel = sum(bits) if len(bits) == samples else bits[0] * samples
+    return (image.width * per_pixel + 7) // 8
+
+
+def _bands(image: Image.Image, factor: int) -> list[tuple[int, int, list[Any]]]:
+    """Row ranges to read in turn, each with the strips or tiles covering it.
+
+    Neighbouring strips are grouped up to about ``_BAND_BYTES``; a single
+    strip taller than that is split, since its rows are stored contiguously.
+    """
+
+    width = image.width
+    limit = max(factor, _BAND_BYTES // _frame_bytes((width, 1), image.mode))
+    rows: dict[int, list[Any]] = {}
+    for tile in image.tile:
+        rows.setdefault(tile[1][1], []).append(tile)
+    bands: list[tuple[int, int, list[Any]]] = []
+    for top in sorted(rows):
+        tiles = rows[top]
+        bottom = max(box[3] for _, box, _, _ in tiles)
+        if bands and bottom - bands[-1][0] <= limit:
+            first, _, grouped = bands[-1]
+            bands[-1] = (first, bottom, grouped + tiles)
+            continue
+        decoder, (x0, _, x1, _), offset, args = tiles[0]
+        splittable = (
+            len(tiles) == 1
+            and decoder == "raw"
+            and (x0, x1) == (0, width)
+            and args[2] == 1
+            and getattr(image, "_planar_configuration", 1) == 1
+        )
+        if not splittable or bottom - top <= limit:
+            bands.append((top, bottom, tiles))
+            continue
+        row_bytes = args[1] or _row_bytes(image)
+        for start in range(top, bottom, limit):
+            end = min(bottom, start + limit)
+            bands.append(
+                (start, end, [(decoder, (0, start, width, end), offset + (start - top) * row_bytes, args)]),
+            )
+    return bands
+
+
+def _band_rows(image: Image.Image, factor: int) -> int:
+    return max(bottom - top for top, bottom, _ in _bands(image, factor))
+
+
+def _read_rows(source: Path, tiles: list[Any], top: int, bottom: int) -> Image.Image:
+    band = Image.open(source)
+    width = band.width
+    band.tile = [
+        (decoder, (x0, y0 - top, x1, y1 - top), offset, args)
+        for decoder, (x0, y0, x1, y1), offset, args in tiles
+    ]
+    band._size = (width, bottom - top)
+    band.load()
+    return band
+
+
+def _reduce_in_bands(image: Image.Image, source: Path, factor: int) -> Image.Image:
+    """Shrink ``image`` by ``factor`` reading only a band of rows at a time."""
+
+    width, height = image.size
+    bands = _bands(image, factor)
+    reduced = Image.new(image.mode, (math.ceil(width / factor), math.ceil(height / factor)))
+    pending: Image.Image | None = None
+    out_y = 0
+    for index, (top, bottom, tiles) in enumerate(bands):
+        band = _read_rows(source, tiles, top, bottom)
+        if pending is not None:
+            # Rows left over from the previous band that did not fill a
+            # whole block of ``factor`` rows.
+            joined = Image.new(image.mode, (width, pending.height + band.height))
+            joined.paste(pending, (0, 0))
+            joined.paste(band, (0, pending.height))
+            band = joined
+        last = index == len(bands) - 1
+        usable = band.height if last else band.height // factor * factor
+        if usable:
+            chunk = band.reduce(factor, box=(0, 0, width, usable))
+            reduced.paste(chunk, (0, out_y))
+            out_y += chunk.height
+        pending = None if usable == band.height else band.crop((0, usable, width, band.height))
+    return reduced
+
+
+def prepare_decode(image: Image.Image, options: Mapping[str, Any]) -> None:
+    """Let JPEG decode at 1/2, 1/4 or 1/8 scale when the output is smaller.
+
+    ``draft`` configures the DCT-domain scaling before any pixel is read, so
+    a large photo shrunk to a thumbnail is never decoded at full size.
+    """
+
+    size = _scaled_size(
+        image.size,
+        options.get("max_width"),
+        options.get("max_height"),
+        options.get("fit") or "contain",
+    )
+    if size is not None:
+        image.draft(None, (int(size[0] * _REDUCING_GAP), int(size[1] * _REDUCING_GAP)))
+
+
+def estimate_memory(
+    image: Image.Image,
+    options: Mapping[str, Any],
+    *,
+    formats: Iterable[str] = (),
+) -> int:
+    """Bytes converting ``image`` to each of ``formats`` holds at its peak.
+
+    Outputs are encoded one after another. Without ``formats`` the most
+    demanding target is assumed. Only the header is read; call after
+    :func:`prepare_decode` so a reduced JPEG decode is counted.
+    """
+
+    size = _scaled_size(
+        image.size,
+        options.get("max_width"),
+        options.get("max_height"),
+        options.get("fit") or "contain",
+    )
+    output = _frame_bytes(size or image.size)
+    factor = _band_factor(image, options)
+    if factor:
+        band = _frame_bytes((image.width, _band_rows(image, factor)), image.mode)
+        reduced = _frame_bytes((math.ceil(image.width / factor), math.ceil(image.height / factor)))
+        # A band, the band joined with leftover rows, and the reduced image.
+        decoded = 2 * band + reduced
+    else:
+        # The decoded frame and its converted copy.
+        decoded = 2 * _frame_bytes(image.size, image.mode)
+    held = max((_held_frames(image, fmt) for fmt in formats), default=_kept_frames(image))
+    # The converted frames an encoder holds, plus the still image shared
+    # by single-frame outputs.
+    return decoded + output * (held + 1)
+
+
+def _decode(image: Image.Image, source: Path, options: Mapping[str, Any], *, strip: bool) -> Image.Image:
+    factor = _band_factor(image, options)
+    if factor:
+        orientation = image.getexif().get(0x0112)
+        reduced = _reduce_in_bands(image, source, factor)
+        if strip and orientation:
+            exif = Image.Exif()
+            exif[0x0112] = orientation
+            reduced.info["exif"] = exif.tobytes()
+        image = reduced
+    if strip:
+        # Without the EXIF orientation tag viewers would show
+        # the image rotated, so bake the orientation in.
+        image = ImageOps.exif_transpose(image)
+    return _shrink(image, options)
+
+
+def _decode_frames(
+    image: Image.Image,
+    options: Mapping[str, Any],
+    mode: str | None,
+    *,
+    strip: bool,
+) -> Iterator[Image.Image]:
+    """Every frame converted to ``mode``, decoding one source frame at a time.
+
+    Converted frames keep their ``duration`` in ``info``. Like
+    :func:`_decode`, stripping metadata bakes the EXIF orientation into
+    each frame.
+    """
+
+    for index in range(image.n_frames):
+        image.seek(index)
+        frame = image.convert(mode) if mode else image.copy()
+        if strip:
+            frame = ImageOps.exif_transpose(frame)
+            frame.info.pop("exif", None)
+            frame.info.pop("xmp", None)
+        yield _shrink(frame, options)
+
+
+def _save_frames(
+    image: Image.Image,
+    options: Mapping[str, Any],
+    target: Path,
+    desired_format: str,
+    params: dict[str, Any],
+    *,
+    strip: bool,
+) -> None:
+    if desired_format == "TIFF":
+        # Pages keep their own mode and are written one at a time.
+        with TiffImagePlugin.AppendingTiffWriter(str(target), new=True) as tiff:
+            for frame in _decode_frames(image, options, None, strip=strip):
+                frame.save(tiff, "TIFF", **params)
+                tiff.newFrame()
+        return
+    # Animated PNG and WebP frames need one mode, and both encoders take
+    # the frames as a list.
+    frames = list(_decode_frames(image, options, "RGBA", strip=strip))
+    if any("duration" in frame.info for frame in frames):
+        params = {
+            **params,
+            "duration": [frame.info.get("duration", 0) for frame in frames],
+            "loop": image.info.get("loop", 0),
+        }
+    frames[0].save(target, desired_format, save_all=True, append_images=frames[1:], **params)
+
+
+def _metadata_params(info: Mapping[str, Any], desired_format: str, *, strip: bool) -> dict[str, Any]:
+    if desired_format not in _METADATA_FORMATS:
+        return {}
+    params: dict[str, Any] = {}
+    # The colour profile describes the pixels themselves; dropping it shifts
+    # colours, so it is kept even when metadata is stripped.
+    if info.get("icc_profile"):
+        params["icc_profile"] = info["icc_profile"]
+    if not strip and info.get("exif"):
+        params["exif"] = info["exif"]
+    return params
+
 
 class ImageConverter:
-    """Convert raster images via Pillow."""
+    """Convert raster images via Pillow.
+
+    ``max_pixels`` (per frame) and ``max_memory_bytes`` are checked against
+    the header before any pixel is decoded; zero disables a limit.
+    """
 
     category = "images"
 
+    def __init__(self, *, max_pixels: int = 0, max_memory_bytes: int = 0) -> None:
+        self.max_pixels = max_pixels
+        self.max_memory_bytes = max_memory_bytes
+
+    def _check_limits(
+        self,
+        image: Image.Image,
+        name: str,
+        options: Mapping[str, Any],
+        *,
+        formats: Iterable[str] = (),
+    ) -> None:
+        width, height = image.size
+        if self.max_pixels and width * height > self.max_pixels:
+            raise ConversionError(
+                f"{name} is {width}x{height} pixels, over the limit of {self.max_pixels:,}",
+            )
+        prepare_decode(image, options)
+        needed = estimate_memory(image, options, formats=formats)
+        if self.max_memory_bytes and needed > self.max_memory_bytes:
+            raise ConversionError(
+                f"{name} would need about {needed // (1024 * 1024)} MB to convert, "
+                f"over the limit of {self.max_memory_bytes // (1024 * 1024)} MB",
+            )
+
     def can_handle(self, source: Path, target_format: str) -> bool:
         return target_format.lower() in SUPPORTED_FORMATS
 
-    def convert(self, source: Path, target: Path, target_format: str) -> Path:
-        desired_format = SUPPORTED_FORMATS[target_format.lower()]
+    def convert(
+        self,
+        source: Path,
+        target: Path,
+        target_format: str,
+        *,
+        options: Mapping[str, Any] | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> Path:
+        [error] = self.convert_many(
+            source,
+            [ConversionOutput(target, target_format, options or {})],
+            progress=progress,
+        )
+        if error is not None:
+            raise error
+        return target
+
+    def convert_many(
+        self,
+        source: Path,
+        outputs: Sequence[ConversionOutput],
+        *,
+        progress: ProgressCallback | None = None,
+    ) -> list[ConversionError | None]:
+        """Decode ``source`` once and encode it to every output.
+
+        Outputs share resize and metadata options (those of the first
+        output); only their profiles differ.
+        """
+
+        errors: list[ConversionError | None] = [None] * len(outputs)
+        options = outputs[0].options if outputs else {}
+        strip = bool(options.get("strip_metadata"))
+        transforms = any(options.get(key) for key in _TRANSFORM_OPTIONS)
         try:
+            # Opening only parses the header, so unreadable files fail here
+            # before any pixel data is decoded.
             with Image.open(source) as img:
-                if desired_format == "JPEG" and img.mode in ("RGBA", "P"):
-                    img = img.convert("RGB")
-                img.save(target, desired_format)
+                frames = _kept_frames(img)
+                pending: list[tuple[int, ConversionOutput, str]] = []
+                for position, output in enumerate(outputs):
+                    desired_format = SUPPORTED_FORMATS[output.target_format.lower()]
+                    if img.format == desired_format and output.options.get("profile") is None and not transforms:
+                        # Same format and no explicit profile: re-encoding would
+                        # only cost time and, for JPEG, quality.
+                        shutil.copyfile(source, output.target)
+                    else:
+                        pending.append((position, output, desired_format))
+                if not pending:
+                    return errors
+
+                self._check_limits(
+                    img,
+                    source.name,
+                    options,
+                    formats=[desired_format for _, _, desired_format in pending],
+                )
+                info = dict(img.info)
+                still: Image.Image | None = None
+                for position, output, desired_format in pending:
+                    preset = output.options.get("profile")
+                    profiles = IMAGE_PROFILES.get(desired_format, {})
+                    params = {
+                        **profiles.get(preset or DEFAULT_PRESET, profiles.get(DEFAULT_PRESET, {})),
+                        **_metadata_params(info, desired_format, strip=strip),
+                    }
+                    try:
+                        if frames > 1 and desired_format in _MULTI_FRAME_FORMATS:
+                            _save_frames(img, options, output.target, desired_format, params, strip=strip)
+                            continue
+                        if still is None:
+                            # Single-image targets get the first frame.
+                            img.seek(0)
+                            still = _decode(img, source, options, strip=strip)
+                        encoded = still
+                        mode = _output_mode(still, desired_format)
+                        if mode is not None:
+                            encoded = still.convert(mode)
+                        encoded.save(output.target, desired_format, **params)
+                    except (OSError, ValueError) as exc:
+                        errors[position] = ConversionError(f"Image conversion failed: {exc}")
+        except ConversionError:
+            raise
+        except Image.DecompressionBombError as exc:
+            # Pillow refuses images over twice its limit while opening them.
+            raise ConversionError(
+                f"{source.name} is over the limit of {self.max_pixels:,} pixels",
+            ) from exc
         except UnidentifiedImageError as exc:
             raise ConversionError(f"Unsupported image file: {source.name}") from exc
-        except OSError as exc:
+        except (OSError, ValueError) as exc:
             raise ConversionError(f"Image conversion failed: {exc}") from exc
-        return target
-
+        return errors
@@ -0,0 +1,319 @@
+"""ffmpeg encoding profiles per target format."""
+
+from __future__ import annotations
+
+import subprocess
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+PRESETS = ("fast", "balanced", "small")
+DEFAULT_PRESET = "balanced"
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    """Codec choices and encoder flags for one target format and preset."""
+
+    video_codec: str | None = None
+    video_args: tuple[str, ...] = ()
+    audio_codec: str | None = None
+    audio_args: tuple[str, ...] = ()
+    output_args: tuple[str, ...] = ()
+
+    def arguments(
+        self,
+        *,
+        threads: int = 0,
+        copy_video: bool = False,
+        copy_audio: bool = False,
+    ) -> list[str]:
+        args: list[str] = []
+        if copy_video:
+            args += ["-c:v", "copy"]
+        elif self.video_codec:
+            args += ["-c:v", self.video_codec, *self.video_args]
+        if copy_audio:
+            args += ["-c:a", "copy"]
+        elif self.audio_codec:
+            args += ["-c:a", self.audio_codec, *self.audio_args]
+        if threads > 0 and not (copy_video and copy_audio):
+            args += ["-threads", str(threads)]
+        return [*args, *self.output_args]
+
+
+def _x264(preset: str, crf: int) -> dict[str, object]:
+    return {
+        "video_codec": "libx264",
+        "video_args": ("-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p"),
+    }
+
+
+def _aac(bitrate: str) -> dict[str, object]:
+    return {"audio_codec": "aac", "audio_args": ("-b:a", bitrate)}
+
+
+_FASTSTART = ("-movflags", "+faststart")
+
+VIDEO_PROFILES: dict[str, dict[str, EncodingProfile]] = {
+    "mp4": {
+        "fast": EncodingProfile(**_x264("veryfast", 23), **_aac("128k"), output_args=_FASTSTART),
+        "balanced": EncodingProfile(**_x264("medium", 21), **_aac("160k"), output_args=_FASTSTART),
+        "small": EncodingProfile(
+            video_codec="libx265",
+            video_args=("-preset", "medium", "-crf", "28", "-tag:v", "hvc1", "-pix_fmt", "yuv420p"),
+            **_aac("96k"),
+            output_args=_FASTSTART,
+        ),
+    },
+    "mov": {
+        "fast": EncodingProfile(**_x264("veryfast", 23), **_aac("128k")),
+        "balanced": EncodingProfile(**_x264("medium", 21), **_aac("160k")),
+        "small": EncodingProfile(**_x264("slow", 26), **_aac("96k")),
+    },
+    "mkv": {
+        "fast": EncodingProfile(**_x264("veryfast", 23), **_aac("128k")),
+        "balanced": EncodingProfile(**_x264("medium", 21), **_aac("160k")),
+        "small": EncodingProfile(
+            video_codec="libx265",
+            video_args=("-preset", "medium", "-crf", "28"),
+            audio_codec="libopus",
+            audio_args=("-b:a", "96k"),
+        ),
+    },
+    # libvpx defaults to the "good" deadline without row multithreading,
+    # which is by far the slowest path; always enable row-mt and pick an
+    # explicit speed.
+    "webm": {
+        "fast": EncodingProfile(
+            video_codec="libvpx-vp9",
+            video_args=(
+                "-deadline", "realtime", "-cpu-used", "8", "-row-mt", "1",
+                "-b:v", "0", "-crf", "35",
+            ),
+            audio_codec="libopus",
+            audio_args=("-b:a", "96k"),
+        ),
+        "balanced": EncodingProfile(
+            video_codec="libvpx-vp9",
+            video_args=(
+                "-deadline", "good", "-cpu-used", "4", "-row-mt", "1",
+                "-b:v", "0", "-crf", "32",
+            ),
+            audio_codec="libopus",
+            audio_args=("-b:a", "128k"),
+        ),
+        "small": EncodingProfile(
+            video_codec="libvpx-vp9",
+            video_args=(
+                "-deadline", "good", "-cpu-used", "2", "-row-mt", "1",
+                "-b:v", "0", "-crf", "38",
+            ),
+            audio_codec="libopus",
+            audio_args=("-b:a", "64k"),
+        ),
+    },
+    "avi": {
+        "fast": EncodingProfile(
+            video_codec="mpeg4",
+            video_args=("-q:v", "6"),
+            audio_codec="libmp3lame",
+            audio_args=("-q:a", "4"),
+        ),
+        "balanced": EncodingProfile(
+            video_codec="mpeg4",
+            video_args=("-q:v", "4"),
+            audio_codec="libmp3lame",
+            audio_args=("-q:a", "2"),
+        ),
+        "small": EncodingProfile(
+            video_codec="mpeg4",
+            video_args=("-q:v", "8"),
+            audio_codec="libmp3lame",
+            audio_args=("-q:a", "6"),
+        ),
+    },
+}
+
+AUDIO_PROFILES: dict[str, dict[str, EncodingProfile]] = {
+    "mp3": {
+        "fast": EncodingProfile(
+            audio_codec="libmp3lame",
+            audio_args=("-q:a", "4", "-compression_level", "9"),
+        ),
+        "balanced": EncodingProfile(audio_codec="libmp3lame", audio_args=("-q:a", "2")),
+        "small": EncodingProfile(audio_codec="libmp3lame", audio_args=("-q:a", "6")),
+    },
+    "aac": {
+        "fast": EncodingProfile(**_aac("160k")),
+        "balanced": EncodingProfile(**_aac("192k")),
+        "small": EncodingProfile(**_aac("96k")),
+    },
+    "m4a": {
+        "fast": EncodingProfile(**_aac("160k"), output_args=_FASTSTART),
+        "balanced": EncodingProfile(**_aac("192k"), output_args=_FASTSTART),
+        "small": EncodingProfile(**_aac("96k"), output_args=_FASTSTART),
+    },
+    "ogg": {
+        "fast": EncodingProfile(audio_codec="libvorbis", audio_args=("-q:a", "4")),
+        "balanced": EncodingProfile(audio_codec="libvorbis", audio_args=("-q:a", "5")),
+        "small": EncodingProfile(audio_codec="libvorbis", audio_args=("-q:a", "2")),
+    },
+    "flac": {
+        "fast": EncodingProfile(audio_codec="flac", audio_args=("-compression_level", "0")),
+        "balanced": EncodingProfile(audio_codec="flac", audio_args=("-compression_level", "5")),
+        "small": EncodingProfile(audio_codec="flac", audio_args=("-compression_level", "8")),
+    },
+    "wav": {
+        preset: EncodingProfile(audio_codec="pcm_s16le")
+        for preset in PRESETS
+    },
+}
+
+_PCM = frozenset({"pcm_s16le", "pcm_s24le", "pcm_s32le", "pcm_f32le", "pcm_u8"})
+
+# Codecs each container can carry as-is, by stream type. Streams already
+# in one of these codecs are copied instead of re-encoded.
+CONTAINER_CODECS: dict[str, dict[str, frozenset[str]]] = {
+    "mp4": {
+        "video": frozenset({"h264", "hevc", "av1", "mpeg4"}),
+        "audio": frozenset({"aac", "mp3", "ac3", "eac3", "alac"}),
+    },
+    "mov": {
+        "video": frozenset({"h264", "hevc", "mpeg4", "prores", "mjpeg"}),
+        "audio": frozenset({"aac", "mp3", "alac"}) | _PCM,
+    },
+    "mkv": {
+        "video": frozenset({"h264", "hevc", "av1", "vp8", "vp9", "mpeg4", "mpeg2video"}),
+        "audio": frozenset({"aac", "mp3", "opus", "vorbis", "flac", "ac3", "eac3", "dts"}) | _PCM,
+    },
+    "webm": {
+        "video": frozenset({"vp8", "vp9", "av1"}),
+        "audio": frozenset({"opus", "vorbis"}),
+    },
+    "avi": {
+        "video": frozenset({"mpeg4", "h264", "mjpeg"}),
+        "audio": frozenset({"mp3", "ac3"}) | _PCM,
+    },
+    "mp3": {"audio": frozenset({"mp3"})},
+    "aac": {"audio": frozenset({"aac"})},
+    "m4a": {"audio": frozenset({"aac", "alac"})},
+    "ogg": {"audio": frozenset({"vorbis", "opus", "flac"})},
+    "flac": {"audio": frozenset({"flac"})},
+    "wav": {"audio": frozenset({"pcm_s16le", "pcm_s24le", "pcm_f32le"})},
+}
+
+# Hardware H.264 encoders, in order of preference, with the flags that
+# approximate each software preset.
+_HARDWARE_H264: dict[str, dict[str, tuple[str, ...]]] = {
+    "h264_nvenc": {
+        "fast": ("-preset", "p1", "-cq", "25"),
+        "balanced": ("-preset", "p4", "-cq", "23"),
+        "small": ("-preset", "p6", "-cq", "28"),
+    },
+    "h264_qsv": {
+        "fast": ("-preset", "veryfast", "-global_quality", "25"),
+        "balanced": ("-preset", "medium", "-global_quality", "23"),
+        "small": ("-preset", "slow", "-global_quality", "28"),
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def available_encoders(ffmpeg: str) -> frozenset[str]:
+    """Names of the encoders compiled into ``ffmpeg``."""
+
+    try:
+        completed = subprocess.run(
+            [ffmpeg, "-hide_banner", "-encoders"],
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return frozenset()
+    names = set()
+    for line in completed.stdout.splitlines():
+        parts = line.split()
+        # Encoder lines look like " V....D libx264   libx264 H.264 ..."
+        if len(parts) >= 2 and len(parts[0]) == 6 and parts[0][0] in "VAS":
+            names.add(parts[1])
+    return frozenset(names)
+
+
+def resolve_profile(
+    profiles: dict[str, dict[str, EncodingProfile]],
+    target_format: str,
+    preset: str | None,
+    *,
+    ffmpeg: str,
+    hardware: bool = False,
+) -> EncodingProfile | None:
+    """Pick the profile for ``target_format``, adapted to this ffmpeg build.
+
+    With ``hardware`` enabled, libx264 is swapped for an available hardware
+    H.264 encoder. Encoders missing from the build fall back to ffmpeg's
+    own choice for the container.
+    """
+
+    by_preset = profiles.get(target_format.lower())
+    if not by_preset:
+        return None
+    if preset not in by_preset:
+        preset = DEFAULT_PRESET
+    profile = by_preset[preset]
+    encoders = available_encoders(ffmpeg)
+    if not encoders:
+        return profile
+
+    if hardware and profile.video_codec == "libx264":
+        for name, flags in _HARDWARE_H264.items():
+            if name in encoders:
+                profile = replace(profile, video_codec=name, video_args=flags[preset])
+                break
+    if profile.video_codec and profile.video_codec not in encoders:
+        profile = replace(profile, video_codec=None, video_args=())
+    if profile.audio_codec and profile.audio_codec not in encoders:
+        profile = replace(profile, audio_codec=None, audio_args=())
+    return profile
+
+
+def stream_copy(
+    target_format: str,
+    preset: str | None,
+    codec_type: str,
+    codecs: set[str],
+) -> bool:
+    """Whether ``codec_type`` streams in ``codecs`` go into the target as-is."""
+
+    if preset == "small" or not codecs:
+        return False
+    allowed = CONTAINER_CODECS.get(target_format.lower(), {})
+    return codecs <= allowed.get(codec_type, frozenset())
+
+
+def encoder_arguments(
+    profile: EncodingProfile | None,
+    target_format: str,
+    preset: str | None,
+    *,
+    video_codecs: set[str],
+    audio_codecs: set[str],
+    threads: int = 0,
+) -> list[str]:
+    """Build ffmpeg output options, copying streams the target can hold.
+
+    A stream type is copied when every input stream of that type already
+    uses a codec the container accepts. Only the ``small`` preset, which
+    asks for a smaller file, always re-encodes.
+    """
+
+    copy_video = stream_copy(target_format, preset, "video", video_codecs)
+    copy_audio = stream_copy(target_format, preset, "audio", audio_codecs)
+    if profile is None:
+        profile = EncodingProfile()
+    args = profile.arguments(threads=threads, copy_video=copy_video, copy_audio=copy_audio)
+    if copy_video and "hevc" in video_codecs and target_format.lower() in ("mp4", "mov"):
+        # Players on Apple platforms only accept HEVC tagged as hvc1.
+        args += ["-tag:v", "hvc1"]
+    return args
@@ -0,0 +1,249 @@
+"""Segmented video encoding: split at keyframes, encode in parallel, join.
+
+The video stream is cut with stream copy, which can only cut at keyframes,
+so every piece starts with one and decodes on its own. Pieces are encoded
+concurrently and joined with the concat demuxer without re-encoding; the
+audio is encoded once, while joining, so no priming gaps appear at the
+seams.
+"""
+
+from __future__ import annotations
+
+import logging
+import tempfile
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from dataclasses import replace
+from pathlib import Path
+from typing import Any
+
+from .base import ConversionError, ConversionProgress, ConversionStopped, ProgressCallback
+from .ffmpeg import ProcessGroup, current_process_group, probe_media, process_group, run_ffmpeg
+from .profiles import EncodingProfile
+
+logger = logging.getLogger("converti")
+
+# Each piece is tried this many times before the whole file fails.
+SEGMENT_ATTEMPTS = 3
+# Pieces per worker; more, shorter pieces keep workers busy when some
+# stretches of the video encode slower than others.
+PIECES_PER_WORKER = 2
+# Share of the progress bar spent encoding pieces; the rest is the join.
+_ENCODE_SHARE = 0.95
+
+
+class SplitError(ConversionError):
+    """The source could not be cut into pieces."""
+
+
+def _without_tag(args: tuple[str, ...]) -> tuple[str, tuple[str, ...]]:
+    """Split ``-tag:v`` off encoder flags; Matroska pieces cannot carry it."""
+
+    flags = list(args)
+    if "-tag:v" in flags:
+        position = flags.index("-tag:v")
+        tag = flags[position + 1]
+        del flags[position : position + 2]
+        return tag, tuple(flags)
+    return "", args
+
+
+class _Progress:
+    """Combine per-piece progress into one fraction for the whole file."""
+
+    def __init__(self, durations: list[float], progress: ProgressCallback | None) -> None:
+        self._durations = durations
+        self._total = sum(durations) or 1.0
+        self._fractions = [0.0] * len(durations)
+        self._speeds: dict[int, float] = {}
+        self._progress = progress
+        self._lock = threading.Lock()
+
+    def piece(self, index: int) -> ProgressCallback:
+        def report(update: ConversionProgress) -> None:
+            with self._lock:
+                self._fractions[index] = update.fraction
+                if update.fraction >= 1.0:
+                    self._speeds.pop(index, None)
+                elif update.speed is not None:
+                    self._speeds[index] = update.speed
+                if self._progress is None:
+                    return
+                done = sum(
+                    fraction * duration
+                    for fraction, duration in zip(self._fractions, self._durations)
+                )
+                self._progress(
+                    ConversionProgress(
+                        fraction=_ENCODE_SHARE * done / self._total,
+                        speed=sum(self._speeds.values()) or None,
+                    ),
+                )
+
+        return report
+
+    def joining(self) -> ProgressCallback | None:
+        if self._progress is None:
+            return None
+        progress = self._progress
+
+        def report(update: ConversionProgress) -> None:
+            progress(
+                ConversionProgress(
+                    fraction=_ENCODE_SHARE + (1 - _ENCODE_SHARE) * update.fraction,
+                    speed=update.speed,
+                ),
+            )
+
+        return report
+
+
+def _split(ffmpeg: str, source: Path, directory: Path, *, duration: float, pieces: int) -> list[Path]:
+    times = ",".join(f"{duration * index / pieces:.3f}" for index in range(1, pieces))
+    try:
+        run_ffmpeg(
+            [
+                ffmpeg,
+                "-y",
+                "-i",
+                str(source),
+                "-map",
+                "0:v:0",
+                "-c",
+                "copy",
+                "-f",
+                "segment",
+                "-segment_times",
+                times,
+                "-segment_format",
+                "matroska",
+                "-reset_timestamps",
+                "1",
+                str(directory / "source-%04d.mkv"),
+            ],
+        )
+    except ConversionStopped:
+        raise
+    except ConversionError as exc:
+        raise SplitError(f"Could not split {source.name}: {exc}") from exc
+    parts = sorted(directory.glob("source-*.mkv"))
+    if len(parts) < 2:
+        raise SplitError(f"{source.name} has too few keyframes to split")
+    return parts
+
+
+def _encode_piece(
+    ffmpeg: str,
+    part: Path,
+    output: Path,
+    args: list[str],
+    *,
+    duration: float | None,
+    progress: ProgressCallback,
+) -> None:
+    for attempt in range(1, SEGMENT_ATTEMPTS + 1):
+        try:
+            run_ffmpeg(
+                [ffmpeg, "-y", "-i", str(part), *args, "-an", str(output)],
+                duration=duration,
+                progress=progress,
+            )
+            return
+        except ConversionStopped:
+            raise
+        except ConversionError as exc:
+            if attempt == SEGMENT_ATTEMPTS:
+                raise ConversionError(
+                    f"Segment {part.stem} failed after {attempt} attempts: {exc}",
+                ) from exc
+            logger.warning("Retrying segment %s (attempt %s failed)", part.name, attempt)
+
+
+def _encode_in_group(group: ProcessGroup, *args: Any, **kwargs: Any) -> None:
+    # Pool threads do not inherit the caller's context, so the pieces'
+    # group is entered explicitly.
+    with process_group(group):
+        _encode_piece(*args, **kwargs)
+
+
+def encode_segmented(
+    ffmpeg: str,
+    ffprobe: str | None,
+    source: Path,
+    target: Path,
+    *,
+    profile: EncodingProfile,
+    copy_audio: bool,
+    duration: float,
+    workers: int,
+    threads: int,
+    progress: ProgressCallback | None = None,
+) -> Path:
+    """Encode ``source`` as pieces on up to ``workers`` ffmpeg processes.
+
+    ``threads`` is the thread budget for the whole file, shared between the
+    workers. Raises :class:`SplitError` if the source cannot be cut, so
+    the caller can fall back to a single encode.
+    """
+
+    tag, video_args = _without_tag(profile.video_args)
+    per_piece = max(1, threads // workers) if threads else 0
+    video = replace(profile, video_args=video_args, audio_codec=None, audio_args=(), output_args=())
+    audio = replace(profile, video_codec=None, video_args=())
+
+    with tempfile.TemporaryDirectory(prefix="converti-segments-") as workdir:
+        directory = Path(workdir)
+        parts = _split(ffmpeg, source, directory, duration=duration, pieces=workers * PIECES_PER_WORKER)
+        durations = [probe_media(ffprobe, part).duration or duration / len(parts) for part in parts]
+        outputs = [directory / f"encoded-{index:04d}.mkv" for index in range(len(parts))]
+        tracker = _Progress(durations, progress)
+        pieces = ProcessGroup(parent=current_process_group())
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="converti-segment") as pool:
+            futures = [
+                pool.submit(
+                    _encode_in_group,
+                    pieces,
+                    ffmpeg,
+                    part,
+                    output,
+                    video.arguments(threads=per_piece),
+                    duration=part_duration,
+                    progress=tracker.piece(index),
+                )
+                for index, (part, output, part_duration) in enumerate(zip(parts, outputs, durations))
+            ]
+            done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in pending:
+                future.cancel()
+            if pending:
+                # A piece failed for good; the others would be wasted work.
+                pieces.stop("Another segment failed")
+            for future in done:
+                future.result()
+
+        playlist = directory / "pieces.txt"
+        playlist.write_text("".join(f"file '{output.name}'\n" for output in outputs))
+        command = [
+            ffmpeg,
+            "-y",
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            str(playlist),
+            "-i",
+            str(source),
+            "-map",
+            "0:v:0",
+            "-map",
+            "1:a:0?",
+            "-c:v",
+            "copy",
+        ]
+        if tag:
+            command += ["-tag:v", tag]
+        command += [*audio.arguments(copy_audio=copy_audio), str(target)]
+        run_ffmpeg(command, duration=duration, progress=tracker.joining())
+    return target
@@ -2,45 +2,183 @@
 
 from __future__ import annotations
 
+import logging
+import os
 import shutil
-import subprocess
+from dataclasses import replace
 from pathlib import Path
+from typing import Any, Mapping, Sequence
 
-from .base import ConversionError
+from .base import ConversionError, ConversionOutput, ConversionProgress, ProgressCallback
+from .ffmpeg import MediaInfo, probe_media, run_ffmpeg
+from .profiles import VIDEO_PROFILES, EncodingProfile, encoder_arguments, resolve_profile, stream_copy
+from .segments import SplitError, encode_segmented
+
+logger = logging.getLogger("converti")
 
 SUPPORTED_FORMATS = {"mp4", "mkv", "webm", "avi", "mov"}
 
 
 class VideoConverter:
-    """Convert video files via ffmpeg."""
+    """Convert video files via ffmpeg.
+
+    Videos at least ``segment_min_seconds`` long whose video stream has to
+    be re-encoded are encoded in pieces by ``segment_workers`` concurrent
+    ffmpeg processes; zero for either disables this.
+    """
 
     category = "video"
 
     def __init__(self) -> None:
         self._ffmpeg = shutil.which("ffmpeg")
+        self._ffprobe = shutil.which("ffprobe")
+        self.threads = 0
+        self.prefer_hardware = False
+        self.segment_min_seconds = 0.0
+        self.segment_workers = 0
+
+    def segments_for(self, duration: float | None) -> int:
+        """Number of concurrent encoders a video of ``duration`` gets."""
+
+        if not duration or self.segment_workers < 2 or not self.segment_min_seconds:
+            return 1
+        return self.segment_workers if duration >= self.segment_min_seconds else 1
 
     def can_handle(self, source: Path, target_format: str) -> bool:
         return self._ffmpeg is not None and target_format.lower() in SUPPORTED_FORMATS
 
-    def convert(self, source: Path, target: Path, target_format: str) -> Path:
-        if self._ffmpeg is None:
-            raise ConversionError("ffmpeg binary not found in PATH")
+    def _profile(self, target_format: str, preset: str | None) -> EncodingProfile | None:
+        return resolve_profile(
+            VIDEO_PROFILES,
+            target_format,
+            preset,
+            ffmpeg=self._ffmpeg,
+            hardware=self.prefer_hardware,
+        )
 
+    def _segmented(self, media: MediaInfo, output: ConversionOutput) -> bool:
+        preset = output.options.get("profile")
+        profile = self._profile(output.target_format, preset)
+        return (
+            profile is not None
+            and bool(profile.video_codec)
+            and self.segments_for(media.duration) > 1
+            and not stream_copy(output.target_format, preset, "video", media.codecs("video"))
+        )
+
+    def _output_arguments(self, media: MediaInfo, output: ConversionOutput, threads: int) -> list[str]:
+        preset = output.options.get("profile")
+        return encoder_arguments(
+            self._profile(output.target_format, preset),
+            output.target_format,
+            preset,
+            video_codecs=media.codecs("video"),
+            audio_codecs=media.codecs("audio"),
+            threads=threads,
+        )
+
+    def _convert_one(
+        self,
+        source: Path,
+        output: ConversionOutput,
+        media: MediaInfo,
+        progress: ProgressCallback | None,
+    ) -> None:
+        preset = output.options.get("profile")
+        threads = int(output.options.get("threads") or self.threads)
+        profile = self._profile(output.target_format, preset)
+        if profile is not None and self._segmented(media, output):
+            try:
+                encode_segmented(
+                    self._ffmpeg,
+                    self._ffprobe,
+                    source,
+                    output.target,
+                    profile=profile,
+                    copy_audio=stream_copy(output.target_format, preset, "audio", media.codecs("audio")),
+                    duration=media.duration or 0.0,
+                    workers=self.segment_workers,
+                    threads=threads or os.cpu_count() or 1,
+                    progress=progress,
+                )
+                return
+            except SplitError as exc:
+                logger.info("Encoding %s in one piece: %s", source.name, exc)
         command = [
             self._ffmpeg,
             "-y",
             "-i",
             str(source),
-            str(target),
+            *self._output_arguments(media, output, threads),
+            str(output.target),
         ]
-        try:
-            subprocess.run(
+        run_ffmpeg(
+            command,
+            duration=media.duration,
+            progress=progress,
+        )
+
+    def convert(
+        self,
+        source: Path,
+        target: Path,
+        target_format: str,
+        *,
+        options: Mapping[str, Any] | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> Path:
+        if self._ffmpeg is None:
+            raise ConversionError("ffmpeg binary not found in PATH")
+
+        output = ConversionOutput(target, target_format, options or {})
+        self._convert_one(source, output, probe_media(self._ffprobe, source), progress)
+        return target
+
+    def convert_many(
+        self,
+        source: Path,
+        outputs: Sequence[ConversionOutput],
+        *,
+        progress: ProgressCallback | None = None,
+    ) -> list[ConversionError | None]:
+        """Encode every output from one ffmpeg process, decoding once.
+
+        Long videos that qualify for segmented encoding are converted one
+        output at a time instead: parallel pieces save more than a shared
+        decode.
+        """
+
+        if self._ffmpeg is None:
+            raise ConversionError("ffmpeg binary not found in PATH")
+
+        media = probe_media(self._ffprobe, source)
+        if len(outputs) > 1 and not any(self._segmented(media, output) for output in outputs):
+            command = [self._ffmpeg, "-y", "-i", str(source)]
+            for output in outputs:
+                # The thread grant covers the whole process; split it
+                # between the encoders running side by side.
+                threads = int(output.options.get("threads") or self.threads)
+                threads = max(1, threads // len(outputs)) if threads else 0
+                command += [*self._output_arguments(media, output, threads), str(output.target)]
+            run_ffmpeg(
                 command,
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+                duration=media.duration,
+                progress=progress,
             )
-        except subprocess.CalledProcessError as exc:
-            raise ConversionError(exc.stderr.decode("utf-8", errors="ignore")) from exc
-        return target
+            return [None] * len(outputs)
+
+        errors: list[ConversionError | None] = []
+        for position, output in enumerate(outputs):
+
+            def report(update: ConversionProgress, position: int = position) -> None:
+                if progress is not None:
+                    fraction = (position + update.fraction) / len(outputs)
+                    progress(replace(update, fraction=fraction))
 
+            try:
+                self._convert_one(source, output, media, report)
+            except ConversionError as exc:
+                errors.append(exc)
+            else:
+                errors.append(None)
+        return errors
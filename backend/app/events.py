@@ -0,0 +1,96 @@
+"""Change notifications for streaming job progress to clients."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from dataclasses import dataclass, field
+
+
+@dataclass
+class JobChanges:
+    """What changed on a job since the subscriber last looked."""
+
+    job: bool = False
+    files: list[int] = field(default_factory=list)
+    resync: bool = False
+
+
+class JobSubscription:
+    """Coalescing change buffer for one event-stream consumer.
+
+    Producers run on worker threads and only mark what changed; the consumer
+    reads the current state when it gets around to sending. A slow consumer
+    therefore never makes memory grow: repeated updates to the same file
+    collapse into one, and once more than ``max_pending`` files are dirty
+    the consumer is told to resync with a full snapshot instead.
+    """
+
+    def __init__(self, job_id: str, *, max_pending: int = 256) -> None:
+        self.job_id = job_id
+        self._max_pending = max(1, max_pending)
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        self._lock = threading.Lock()
+        self._job_dirty = False
+        self._files: dict[int, None] = {}
+        self._resync = False
+
+    def notify(self, index: int | None = None) -> None:
+        with self._lock:
+            if index is None:
+                self._job_dirty = True
+            elif not self._resync:
+                self._files[index] = None
+                if len(self._files) > self._max_pending:
+                    self._files.clear()
+                    self._resync = True
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # The consumer's loop is gone; it will be unsubscribed shortly.
+            pass
+
+    async def wait(self, timeout: float) -> JobChanges | None:
+        """Return pending changes, or ``None`` if nothing changed in time."""
+
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._ready.clear()
+        with self._lock:
+            changes = JobChanges(
+                job=self._job_dirty,
+                files=list(self._files),
+                resync=self._resync,
+            )
+            self._job_dirty = False
+            self._files.clear()
+            self._resync = False
+        return changes
+
+
+class JobWatch:
+    """Wakes a worker thread when a job gains files or changes state.
+
+    Updates to the first ``known`` files are ignored, so progress reports
+    from conversions already running do not wake the watcher.
+    """
+
+    def __init__(self, job_id: str, *, known: int = 0) -> None:
+        self.job_id = job_id
+        self.known = known
+        self._changed = threading.Event()
+
+    def notify(self, index: int | None = None) -> None:
+        if index is None or index >= self.known:
+            self._changed.set()
+
+    def wait(self, timeout: float) -> bool:
+        """Block until notified or ``timeout``; ``True`` if anything changed."""
+
+        changed = self._changed.wait(timeout)
+        # Cleared before the caller re-reads the job, so later changes wake it again.
+        self._changed.clear()
+        return changed
@@ -0,0 +1,185 @@
+"""Durable job queue between the API and conversion workers."""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Protocol
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    job_id TEXT PRIMARY KEY,
+    enqueued_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_token TEXT
+);
+CREATE INDEX IF NOT EXISTS queue_available_at ON queue (available_at);
+"""
+
+
+@dataclass(frozen=True)
+class Lease:
+    """A claimed queue entry; only its holder may extend, ack or release it."""
+
+    job_id: str
+    token: str
+    attempts: int
+
+
+class JobQueue(Protocol):
+    """Broker that hands queued jobs to workers.
+
+    A claimed job stays invisible to other workers for the visibility
+    timeout. Workers extend the lease while they are busy; if one dies, the
+    lease runs out and the job is handed out again.
+    """
+
+    visibility_timeout: float
+
+    def enqueue(self, job_id: str, *, head_start: float = 0.0) -> None:
+        ...
+
+    def claim(self) -> Lease | None:
+        ...
+
+    def extend(self, lease: Lease) -> bool:
+        ...
+
+    def ack(self, lease: Lease) -> None:
+        ...
+
+    def release(self, lease: Lease, *, delay: float = 0.0) -> None:
+        ...
+
+    def discard(self, job_id: str) -> bool:
+        ...
+
+    def depth(self) -> int:
+        ...
+
+    def position(self, job_id: str) -> int | None:
+        ...
+
+
+class SqliteJobQueue:
+    """Job queue in a SQLite file shared by the API and every worker."""
+
+    def __init__(self, path: Path, *, visibility_timeout: float = 300.0) -> None:
+        self.visibility_timeout = max(1.0, visibility_timeout)
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=30,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def enqueue(self, job_id: str, *, head_start: float = 0.0) -> None:
+        """Queue ``job_id``; it is ordered as if enqueued ``head_start`` seconds earlier."""
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO queue (job_id, enqueued_at, available_at) "
+                "VALUES (?, ?, ?)",
+                (job_id, now - head_start, now),
+            )
+
+    def claim(self) -> Lease | None:
+        """Lease the oldest visible job, or return ``None`` if there is none."""
+
+        now = time.time()
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT job_id, attempts FROM queue WHERE available_at <= ? "
+                    "ORDER BY enqueued_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE queue SET available_at = ?, attempts = attempts + 1, "
+                        "lease_token = ? WHERE job_id = ?",
+                        (now + self.visibility_timeout, token, row[0]),
+                    )
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        if row is None:
+            return None
+        return Lease(job_id=row[0], token=token, attempts=row[1] + 1)
+
+    def extend(self, lease: Lease) -> bool:
+        """Push the lease's deadline out; ``False`` if it was already lost."""
+
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE queue SET available_at = ? WHERE job_id = ? AND lease_token = ?",
+                (time.time() + self.visibility_timeout, lease.job_id, lease.token),
+            )
+        return cursor.rowcount > 0
+
+    def ack(self, lease: Lease) -> None:
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM queue WHERE job_id = ? AND lease_token = ?",
+                (lease.job_id, lease.token),
+            )
+
+    def release(self, lease: Lease, *, delay: float = 0.0) -> None:
+        """Give the job back so it is retried after ``delay`` seconds."""
+
+        with self._lock:
+            self._db.execute(
+                "UPDATE queue SET available_at = ?, lease_token = NULL "
+                "WHERE job_id = ? AND lease_token = ?",
+                (time.time() + delay, lease.job_id, lease.token),
+            )
+
+    def discard(self, job_id: str) -> bool:
+        """Remove a job no worker has claimed; ``False`` if it is not waiting."""
+
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM queue WHERE job_id = ? AND lease_token IS NULL",
+                (job_id,),
+            )
+        return cursor.rowcount > 0
+
+    def depth(self) -> int:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM queue").fetchone()
+        return count
+
+    def position(self, job_id: str) -> int | None:
+        """1-based place among unclaimed jobs, or ``None`` if not waiting."""
+
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT enqueued_at FROM queue WHERE job_id = ? AND lease_token IS NULL",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            (ahead,) = self._db.execute(
+                "SELECT COUNT(*) FROM queue WHERE enqueued_at < ? AND available_at <= ?",
+                (row[0], now),
+            ).fetchone()
+        return ahead + 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,357 @@
+"""SQLite-backed job registry that survives restarts."""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator
+
+from .jobs import ConversionJob, JobFileResult, JobManager, JobStatus
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at);
+CREATE TABLE IF NOT EXISTS job_files (
+    job_id TEXT NOT NULL REFERENCES jobs (job_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (job_id, position)
+);
+"""
+
+# Columns stored outside the JSON blob because they are indexed.
+_JOB_COLUMNS = ("job_id", "status", "created_at")
+_PATH_FIELDS = frozenset({"source_path", "output_path"})
+_UNFINISHED = (JobStatus.PENDING.value, JobStatus.PROCESSING.value)
+# Progress reports only touch these fields. They are written at most once
+# per PROGRESS_WRITE_SECONDS per file unless progress moved by at least
+# PROGRESS_WRITE_STEP; smaller updates stay in memory until then.
+_PROGRESS_FIELDS = frozenset({"progress", "speed", "fps"})
+PROGRESS_WRITE_SECONDS = 1.0
+PROGRESS_WRITE_STEP = 0.01
+
+
+@dataclass
+class _ProgressState:
+    """Last progress written for one file, and what has not been since."""
+
+    written_at: float
+    progress: float
+    unsaved: dict[str, Any] = field(default_factory=dict)
+
+
+def _encode(instance: Any, *, exclude: tuple[str, ...] = ()) -> str:
+    data: dict[str, Any] = {}
+    for item in dataclasses.fields(instance):
+        if item.name in exclude:
+            continue
+        value = getattr(instance, item.name)
+        if isinstance(value, JobStatus):
+            value = value.value
+        elif isinstance(value, Path):
+            value = str(value)
+        data[item.name] = value
+    return json.dumps(data)
+
+
+def _decode_result(raw: str) -> JobFileResult:
+    data = json.loads(raw)
+    known = {item.name for item in dataclasses.fields(JobFileResult)}
+    values = {key: value for key, value in data.items() if key in known}
+    for key in _PATH_FIELDS & values.keys():
+        values[key] = Path(values[key])
+    values["status"] = JobStatus(values["status"])
+    return JobFileResult(**values)
+
+
+class SqliteJobManager(JobManager):
+    """Job registry persisted in SQLite (WAL mode).
+
+    Every read goes to the database, so several processes sharing the file
+    see the same state. Job rows are indexed on status and creation time,
+    which keeps the retention sweep and restart recovery to range queries.
+    """
+
+    def __init__(self, path: Path) -> None:
+        super().__init__()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=30,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(_SCHEMA)
+        self._progress: dict[str, dict[int, _ProgressState]] = {}
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Hold the in-process lock and a write lock on the database.
+
+        ``BEGIN IMMEDIATE`` makes read-modify-write updates atomic across
+        processes sharing the file, not just across threads.
+        """
+
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _write_job(self, job: ConversionJob) -> None:
+        self._db.execute(
+            # An upsert rather than INSERT OR REPLACE: replacing would delete
+            # the row and cascade to the job's files.
+            "INSERT INTO jobs (job_id, status, created_at, data) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (job_id) DO UPDATE SET status = excluded.status, "
+            "created_at = excluded.created_at, data = excluded.data",
+            (
+                job.job_id,
+                job.status.value,
+                job.created_at,
+                _encode(job, exclude=("results", *_JOB_COLUMNS)),
+            ),
+        )
+
+    def _write_result(self, job_id: str, index: int, result: JobFileResult) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO job_files (job_id, position, data) VALUES (?, ?, ?)",
+            (job_id, index, _encode(result)),
+        )
+
+    def _load_job(self, job_id: str, *, with_results: bool = True) -> ConversionJob | None:
+        row = self._db.execute(
+            "SELECT status, created_at, data FROM jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        status, created_at, raw = row
+        known = {item.name for item in dataclasses.fields(ConversionJob)}
+        values = {key: value for key, value in json.loads(raw).items() if key in known}
+        job = ConversionJob(
+            job_id=job_id,
+            status=JobStatus(status),
+            created_at=created_at,
+            **values,
+        )
+        if with_results:
+            job.results = [
+                _decode_result(data)
+                for (data,) in self._db.execute(
+                    "SELECT data FROM job_files WHERE job_id = ? ORDER BY position",
+                    (job_id,),
+                )
+            ]
+            for index, state in self._progress.get(job_id, {}).items():
+                if index < len(job.results):
+                    for key, value in state.unsaved.items():
+                        setattr(job.results[index], key, value)
+        return job
+
+    def _require_job(self, job_id: str, *, with_results: bool = False) -> ConversionJob:
+        job = self._load_job(job_id, with_results=with_results)
+        if job is None:
+            raise KeyError(job_id)
+        return job
+
+    def create_job(
+        self,
+        *,
+        category: str,
+        target_format: str,
+        total_files: int,
+        job_id: str | None = None,
+        options: dict[str, Any] | None = None,
+        client_id: str = "",
+        input_bytes: int = 0,
+        target_formats: list[str] | None = None,
+        estimated_seconds: float = 0.0,
+        ingesting: bool = False,
+    ) -> ConversionJob:
+        job = ConversionJob(
+            job_id=job_id or uuid.uuid4().hex,
+            category=category,
+            target_format=target_format,
+            total_files=total_files,
+            options=dict(options or {}),
+            client_id=client_id,
+            input_bytes=input_bytes,
+            target_formats=list(target_formats or [target_format]),
+            estimated_seconds=estimated_seconds,
+            ingesting=ingesting,
+        )
+        with self._transaction():
+            self._write_job(job)
+        return job
+
+    def get_job(self, job_id: str) -> ConversionJob | None:
+        with self._lock:
+            return self._load_job(job_id)
+
+    def get_status(self, job_id: str) -> JobStatus | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        return JobStatus(row[0]) if row is not None else None
+
+    def add_result(self, job_id: str, result: JobFileResult) -> int:
+        with self._transaction():
+            self._require_job(job_id)
+            (count,) = self._db.execute(
+                "SELECT COUNT(*) FROM job_files WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+            self._write_result(job_id, count, result)
+            self._publish(job_id, count)
+            return count
+
+    def update_job(self, job_id: str, **updates: Any) -> ConversionJob:
+        """Apply ``updates`` to the job row; the returned job has no results."""
+
+        with self._transaction():
+            job = self._require_job(job_id)
+            for key, value in updates.items():
+                setattr(job, key, value)
+            self._write_job(job)
+            self._publish(job_id)
+            return job
+
+    def _read_result(self, job_id: str, index: int) -> JobFileResult:
+        row = self._db.execute(
+            "SELECT data FROM job_files WHERE job_id = ? AND position = ?",
+            (job_id, index),
+        ).fetchone()
+        if row is None:
+            raise KeyError(f"{job_id}/{index}")
+        return _decode_result(row[0])
+
+    def update_result(self, job_id: str, index: int, **updates: Any) -> JobFileResult:
+        now = time.monotonic()
+        if updates and updates.keys() <= _PROGRESS_FIELDS:
+            with self._lock:
+                state = self._progress.get(job_id, {}).get(index)
+                progress = updates.get("progress", state.progress if state else 0.0)
+                if (
+                    state is not None
+                    and now - state.written_at < PROGRESS_WRITE_SECONDS
+                    and abs(progress - state.progress) < PROGRESS_WRITE_STEP
+                ):
+                    # Only readers in this process see it until the next write.
+                    state.unsaved.update(updates)
+                    result = self._read_result(job_id, index)
+                    for key, value in state.unsaved.items():
+                        setattr(result, key, value)
+                    self._publish(job_id, index)
+                    return result
+
+        with self._transaction():
+            result = self._read_result(job_id, index)
+            states = self._progress.setdefault(job_id, {})
+            state = states.pop(index, None)
+            for key, value in {**(state.unsaved if state else {}), **updates}.items():
+                setattr(result, key, value)
+            if updates and updates.keys() <= _PROGRESS_FIELDS:
+                states[index] = _ProgressState(written_at=now, progress=result.progress)
+            elif not states:
+                del self._progress[job_id]
+            self._write_result(job_id, index, result)
+            self._publish(job_id, index)
+            return result
+
+    def increment_processed(self, job_id: str) -> ConversionJob:
+        with self._transaction():
+            job = self._require_job(job_id)
+            job.processed_files += 1
+            self._write_job(job)
+            self._publish(job_id)
+            return job
+
+    def delete_job(self, job_id: str) -> None:
+        with self._transaction():
+            self._db.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+            self._progress.pop(job_id, None)
+            self._publish(job_id)
+
+    def list_jobs(self) -> list[ConversionJob]:
+        with self._lock:
+            job_ids = [row[0] for row in self._db.execute("SELECT job_id FROM jobs")]
+            jobs = [self._load_job(job_id) for job_id in job_ids]
+        return [job for job in jobs if job is not None]
+
+    def cancel_job(self, job_id: str, message: str | None = None) -> ConversionJob:
+        updates: dict[str, Any] = {"status": JobStatus.CANCELLED}
+        if message:
+            updates["error"] = message
+        return self.update_job(job_id, **updates)
+
+    def expired_job_ids(self, cutoff: float) -> list[str]:
+        with self._lock:
+            return [
+                row[0]
+                for row in self._db.execute(
+                    "SELECT job_id FROM jobs WHERE created_at < ?",
+                    (cutoff,),
+                )
+            ]
+
+    def recover_unfinished(self) -> list[str]:
+        """Requeue jobs interrupted by a restart.
+
+        Files that were mid-conversion go back to pending; finished files
+        keep their results.
+        """
+
+        with self._transaction():
+            job_ids = [
+                row[0]
+                for row in self._db.execute(
+                    "SELECT job_id FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                    _UNFINISHED,
+                )
+            ]
+            for job_id in job_ids:
+                job = self._require_job(job_id, with_results=True)
+                self._reset_processing(job)
+                job.status = JobStatus.PENDING
+                self._write_job(job)
+        return job_ids
+
+    def requeue_interrupted(self, job_id: str) -> None:
+        with self._transaction():
+            job = self._load_job(job_id)
+            if job is not None:
+                self._reset_processing(job)
+
+    def _reset_processing(self, job: ConversionJob) -> None:
+        self._progress.pop(job.job_id, None)
+        for index, result in enumerate(job.results):
+            if result.status is JobStatus.PROCESSING:
+                result.status = JobStatus.PENDING
+                result.progress = 0.0
+                self._write_result(job.job_id, index, result)
+                self._publish(job.job_id, index)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
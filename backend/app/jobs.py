@@ -1,4 +1,4 @@
-"""In-memory job tracking for conversion tasks."""
+"""Job tracking for conversion tasks."""
 
 from __future__ import annotations
 
@@ -10,6 +10,8 @@ from enum import Enum
 from pathlib import Path
 from typing import Any
 
+from .events import JobSubscription, JobWatch
+
 
 class JobStatus(str, Enum):
     """Lifecycle state of a conversion job."""
@@ -23,19 +25,40 @@ class JobStatus(str, Enum):
 
 @dataclass
 class JobFileResult:
-    """Represents the outcome of converting a single file."""
+    """Represents the outcome of one output of a source file.
+
+    A job with several target formats has one result per source file and
+    format; ``target_format`` is empty for results stored before that.
+    ``metadata`` is what probing the source at ingest found, if anything;
+    ``output_digest`` is the SHA-256 of the finished output, filled in when
+    it is first downloaded, and ``note`` says what it left out of the
+    source, if anything.
+    """
 
     source_name: str
     source_path: Path
     output_name: str
     output_path: Path
+    source_digest: str = ""
+    target_format: str = ""
+    profile: str | None = None
+    metadata: dict[str, Any] | None = None
+    output_digest: str = ""
+    note: str | None = None
     status: JobStatus = JobStatus.PENDING
     error: str | None = None
+    progress: float = 0.0
+    speed: float | None = None
+    fps: float | None = None
 
 
 @dataclass
 class ConversionJob:
-    """Data model for a conversion job."""
+    """Data model for a conversion job.
+
+    A job is ``ingesting`` while its upload is still arriving: files are
+    added (and ``total_files`` grows) as they finish writing.
+    """
 
     job_id: str
     category: str
@@ -46,20 +69,61 @@ class ConversionJob:
     processed_files: int = 0
     results: list[JobFileResult] = field(default_factory=list)
     error: str | None = None
+    options: dict[str, Any] = field(default_factory=dict)
+    client_id: str = ""
+    input_bytes: int = 0
+    target_formats: list[str] = field(default_factory=list)
+    estimated_seconds: float = 0.0
+    ingesting: bool = False
 
     @property
     def progress(self) -> float:
         if self.total_files == 0:
             return 0.0
-        return min(1.0, self.processed_files / self.total_files)
+        running = sum(
+            result.progress
+            for result in self.results
+            if result.status is JobStatus.PROCESSING
+        )
+        return min(1.0, (self.processed_files + running) / self.total_files)
 
 
 class JobManager:
-    """Thread-safe job registry."""
+    """Thread-safe in-memory job registry.
+
+    Jobs are lost on restart; see :mod:`app.job_store` for a durable variant.
+    """
 
     def __init__(self) -> None:
         self._jobs: dict[str, ConversionJob] = {}
         self._lock = threading.RLock()
+        self._subscribers: dict[str, list[JobSubscription | JobWatch]] = {}
+
+    def subscribe(self, job_id: str, *, max_pending: int = 256) -> JobSubscription:
+        subscription = JobSubscription(job_id, max_pending=max_pending)
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append(subscription)
+        return subscription
+
+    def watch(self, job_id: str, *, known: int = 0) -> JobWatch:
+        """Thread-side counterpart of :meth:`subscribe`; release with :meth:`unsubscribe`."""
+
+        watch = JobWatch(job_id, known=known)
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append(watch)
+        return watch
+
+    def unsubscribe(self, subscription: JobSubscription | JobWatch) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.job_id, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.job_id, None)
+
+    def _publish(self, job_id: str, index: int | None = None) -> None:
+        for subscription in self._subscribers.get(job_id, ()):
+            subscription.notify(index)
 
     def create_job(
         self,
@@ -67,13 +131,26 @@ class JobManager:
         category: str,
         target_format: str,
         total_files: int,
+        job_id: str | None = None,
+        options: dict[str, Any] | None = None,
+        client_id: str = "",
+        input_bytes: int = 0,
+        target_formats: list[str] | None = None,
+        estimated_seconds: float = 0.0,
+        ingesting: bool = False,
     ) -> ConversionJob:
-        job_id = uuid.uuid4().hex
+        job_id = job_id or uuid.uuid4().hex
         job = ConversionJob(
             job_id=job_id,
             category=category,
             target_format=target_format,
             total_files=total_files,
+            options=dict(options or {}),
+            client_id=client_id,
+            input_bytes=input_bytes,
+            target_formats=list(target_formats or [target_format]),
+            estimated_seconds=estimated_seconds,
+            ingesting=ingesting,
         )
         with self._lock:
             self._jobs[job_id] = job
@@ -83,31 +160,78 @@ class JobManager:
         with self._lock:
             return self._jobs.get(job_id)
 
+    def get_status(self, job_id: str) -> JobStatus | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.status if job is not None else None
+
+    def add_result(self, job_id: str, result: JobFileResult) -> int:
+        with self._lock:
+            results = self._jobs[job_id].results
+            results.append(result)
+            index = len(results) - 1
+            self._publish(job_id, index)
+            return index
+
     def update_job(self, job_id: str, **updates: Any) -> ConversionJob:
         with self._lock:
             job = self._jobs[job_id]
             for key, value in updates.items():
                 setattr(job, key, value)
+            self._publish(job_id)
             return job
 
+    def update_result(self, job_id: str, index: int, **updates: Any) -> JobFileResult:
+        with self._lock:
+            result = self._jobs[job_id].results[index]
+            for key, value in updates.items():
+                setattr(result, key, value)
+            self._publish(job_id, index)
+            return result
+
     def increment_processed(self, job_id: str) -> ConversionJob:
         with self._lock:
             job = self._jobs[job_id]
             job.processed_files += 1
+            self._publish(job_id)
             return job
 
     def delete_job(self, job_id: str) -> None:
         with self._lock:
             self._jobs.pop(job_id, None)
+            self._publish(job_id)
 
     def list_jobs(self) -> list[ConversionJob]:
         with self._lock:
             return list(self._jobs.values())
 
+    def expired_job_ids(self, cutoff: float) -> list[str]:
+        with self._lock:
+            return [job.job_id for job in self._jobs.values() if job.created_at < cutoff]
+
+    def recover_unfinished(self) -> list[str]:
+        """Return jobs that were pending or running when the process stopped."""
+
+        return []
+
+    def requeue_interrupted(self, job_id: str) -> None:
+        """Put files left mid-conversion by a crashed worker back to pending."""
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for index, result in enumerate(job.results):
+                if result.status is JobStatus.PROCESSING:
+                    result.status = JobStatus.PENDING
+                    result.progress = 0.0
+                    self._publish(job_id, index)
+
     def cancel_job(self, job_id: str, message: str | None = None) -> ConversionJob:
         with self._lock:
             job = self._jobs[job_id]
             job.status = JobStatus.CANCELLED
             if message:
                 job.error = message
+            self._publish(job_id)
             return job
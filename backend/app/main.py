@@ -4,28 +4,72 @@ from __future__ import annotations
 
 import logging
 import shutil
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Iterable
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator
+import hashlib
+import json
 import threading
 import time
+import uuid
 
+from anyio import to_thread
 from fastapi import (
     BackgroundTasks,
     FastAPI,
-    File,
-    Form,
     HTTPException,
-    UploadFile,
+    Request,
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from starlette import status
 
+from .archives import stream_zip
+from .cache import CACHE_DIRNAME, file_digest
 from .config import settings
-from .converters import SUPPORTED_TARGETS, available_categories, convert_file
-from .converters.base import ConversionError
-from .jobs import JobFileResult, JobManager, JobStatus
+from .converters import SUPPORTED_PROFILES, SUPPORTED_TARGETS, available_categories
+from .converters.image import FIT_MODES
+from .events import JobChanges
+from .jobs import ConversionJob, JobFileResult, JobStatus
+from .metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    DirectorySize,
+    callback_gauge,
+    download_bytes,
+    render as render_metrics,
+    upload_bytes,
+    upload_seconds,
+    zip_seconds,
+)
+from .probing import InputMetadata, estimate_seconds
+from .processing import (
+    conversion_watchdog,
+    delete_job_artifacts,
+    drop_cancelled_job,
+    input_directory,
+    job_directory,
+    job_manager,
+    job_queue,
+    metadata_index,
+    output_directory,
+    process_job,
+    release_parked,
+    resource_budget,
+    result_cache,
+    resume_ingesting,
+    shutdown,
+    worker_budget,
+)
+from .scheduling import CLASS_HEAD_START, COST_CLASSES, JobScheduler, cost_class
+from .serving import IMMUTABLE, accel_location, file_response, not_modified, strong_etag
+from .uploads import (
+    SESSION_FILENAME,
+    UploadedFile,
+    UploadSession,
+    UploadSessions,
+    stream_multipart,
+)
 
 logger = logging.getLogger("converti")
 
@@ -39,53 +83,80 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-settings.job_storage_dir.mkdir(parents=True, exist_ok=True)
-job_manager = JobManager()
 executor = ThreadPoolExecutor(max_workers=settings.max_concurrent_jobs)
+upload_sessions = UploadSessions(settings.job_storage_dir)
 
 
-def serialize_job(job):
+def serialize_result(result: JobFileResult) -> dict[str, Any]:
+    return {
+        "sourceName": result.source_name,
+        "outputName": result.output_name,
+        "targetFormat": result.target_format or None,
+        "profile": result.profile,
+        "status": result.status.value,
+        "error": result.error,
+        "note": result.note,
+        "progress": result.progress,
+        "speed": result.speed,
+        "fps": result.fps,
+        "metadata": serialize_metadata(result.metadata),
+    }
+
+
+def serialize_metadata(metadata: dict[str, Any] | None) -> dict[str, Any] | None:
+    if metadata is None:
+        return None
+    return {
+        "format": metadata.get("format") or None,
+        "duration": metadata.get("duration"),
+        "width": metadata.get("width") or None,
+        "height": metadata.get("height") or None,
+        "frames": metadata.get("frames") or None,
+        "frameRate": metadata.get("frame_rate"),
+        "videoCodec": metadata.get("video_codec"),
+        "audioCodec": metadata.get("audio_codec"),
+        "bitRate": metadata.get("bit_rate"),
+    }
+
+
+def _queue_info(job: ConversionJob) -> tuple[int | None, float | None]:
+    if job.status is not JobStatus.PENDING:
+        return None, None
+    if job_queue is not None:
+        return job_queue.position(job.job_id), None
+    info = scheduler.queue_info(job.job_id)
+    return info if info is not None else (None, None)
+
+
+def serialize_job_summary(job: ConversionJob) -> dict[str, Any]:
+    queue_position, estimated_start = _queue_info(job)
     return {
         "jobId": job.job_id,
         "category": job.category,
         "targetFormat": job.target_format,
+        "targetFormats": job.target_formats or [job.target_format],
         "status": job.status.value,
         "progress": job.progress,
         "totalFiles": job.total_files,
         "processedFiles": job.processed_files,
         "error": job.error,
-        "results": [
-            {
-                "sourceName": result.source_name,
-                "outputName": result.output_name,
-                "status": result.status.value,
-                "error": result.error,
-            }
-            for result in job.results
-        ],
+        "options": job.options,
+        "costClass": cost_class(job.category, job.input_bytes),
+        "queuePosition": queue_position,
+        "estimatedStartAt": estimated_start,
+        "estimatedSeconds": job.estimated_seconds or None,
     }
 
 
-def _job_directory(job_id: str) -> Path:
-    base = settings.job_storage_dir / job_id
-    base.mkdir(parents=True, exist_ok=True)
-    return base
-
-
-def _input_directory(job_id: str) -> Path:
-    directory = _job_directory(job_id) / "input"
-    directory.mkdir(parents=True, exist_ok=True)
-    return directory
-
-
-def _output_directory(job_id: str) -> Path:
-    directory = _job_directory(job_id) / "output"
-    directory.mkdir(parents=True, exist_ok=True)
-    return directory
+def serialize_job(job):
+    return {
+        **serialize_job_summary(job),
+        "results": [serialize_result(result) for result in job.results],
+    }
 
 
 def _zip_path(job_id: str) -> Path:
-    return _job_directory(job_id) / "converted.zip"
+    return job_directory(job_id) / "converted.zip"
 
 
 def _unique_name(candidate: str, existing: Iterable[str]) -> str:
@@ -101,95 +172,111 @@ def _unique_name(candidate: str, existing: Iterable[str]) -> str:
         index += 1
 
 
-def _process_job(job_id: str) -> None:
-    job = job_manager.get_job(job_id)
-    if job is None:
-        logger.warning("Job %s vanished before processing", job_id)
-        return
+def _log_job_failure(future: Future[None]) -> None:
+    exc = future.exception()
+    if exc is not None:
+        logger.error("Processing job crashed", exc_info=exc)
 
-    if job.status is JobStatus.CANCELLED:
-        logger.info("Job %s cancelled before start", job_id)
-        _delete_job_artifacts(job_id)
-        job_manager.delete_job(job_id)
-        return
 
-    job_manager.update_job(job_id, status=JobStatus.PROCESSING, error=None)
-    failures = 0
-    for result in job.results:
-        if job.status is JobStatus.CANCELLED:
-            logger.info("Job %s cancelled during processing", job_id)
-            break
+def _run_in_executor(task: Callable[[], None]) -> None:
+    executor.submit(task).add_done_callback(_log_job_failure)
 
-        output_path = result.output_path
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        try:
-            convert_file(
-                job.category,
-                result.source_path,
-                output_path,
-                job.target_format,
-            )
-            result.status = JobStatus.COMPLETED
-        except ConversionError as exc:
-            failures += 1
-            result.status = JobStatus.FAILED
-            result.error = str(exc)
-            logger.warning("Conversion failed for %s: %s", result.source_name, exc)
-        except Exception as exc:  # pragma: no cover - safety net
-            failures += 1
-            result.status = JobStatus.FAILED
-            result.error = f"Unexpected error: {exc}"
-            logger.exception("Unexpected error for %s", result.source_name)
-        finally:
-            job_manager.increment_processed(job_id)
-
-    if job.status is JobStatus.CANCELLED:
-        for result in job.results:
-            if result.status in (JobStatus.PENDING, JobStatus.PROCESSING):
-                result.status = JobStatus.CANCELLED
-                result.error = "Cancelled"
-        job.error = job.error or "Cancelled by user"
-        _delete_job_artifacts(job_id)
-        job_manager.delete_job(job_id)
-        return
 
-    final_status = JobStatus.COMPLETED if failures == 0 else JobStatus.FAILED
-    error = None
-    if failures:
-        error = f"{failures} file(s) failed during conversion"
-    job_manager.update_job(job_id, status=final_status, error=error)
-    if final_status is JobStatus.FAILED and failures == len(job.results):
-        output_dir = _output_directory(job_id)
-        shutil.rmtree(output_dir, ignore_errors=True)
+scheduler = JobScheduler(
+    process_job,
+    _run_in_executor,
+    slots=settings.max_concurrent_jobs,
+    per_client_limit=settings.max_jobs_per_client,
+    reserved_slots=settings.reserved_job_slots,
+)
 
 
+def _queued_jobs() -> dict[tuple[str, ...], float]:
+    if job_queue is not None:
+        return {("all",): job_queue.depth()}
+    stats = scheduler.stats()
+    return {(name,): stats[name] for name in COST_CLASSES}
 
-def _delete_job_artifacts(job_id: str) -> None:
-    shutil.rmtree(_job_directory(job_id), ignore_errors=True)
 
+callback_gauge(
+    "converti_queued_jobs",
+    "Jobs waiting for a slot, by cost class.",
+    ("cost_class",),
+    callback=_queued_jobs,
+)
+callback_gauge(
+    "converti_running_jobs",
+    "Jobs holding a job slot.",
+    callback=lambda: scheduler.stats()["running"],
+)
+callback_gauge(
+    "converti_active_conversions",
+    "Files being converted right now.",
+    callback=lambda: worker_budget.stats()["inFlight"],
+)
+callback_gauge(
+    "converti_cpu_threads_in_use",
+    "CPU threads admitted from the resource budget.",
+    callback=lambda: resource_budget.usage()["threads"],
+)
+callback_gauge(
+    "converti_memory_bytes_in_use",
+    "Estimated memory admitted from the resource budget.",
+    callback=lambda: resource_budget.usage()["memoryBytes"],
+)
+callback_gauge(
+    "converti_storage_bytes",
+    "Disk space used under the job storage directory.",
+    callback=DirectorySize(settings.job_storage_dir),
+)
 
-def cleanup_expired_jobs() -> None:
+
+def _submit_job(job_id: str) -> None:
+    job = job_manager.get_job(job_id)
+    if job is None:
+        return
+    if job_queue is not None:
+        job_queue.enqueue(
+            job_id,
+            head_start=CLASS_HEAD_START[cost_class(job.category, job.input_bytes)],
+        )
+        return
+    scheduler.submit(
+        job_id,
+        client_id=job.client_id,
+        category=job.category,
+        input_bytes=job.input_bytes,
+        predicted=job.estimated_seconds,
+        # Its run time includes waiting for the rest of the upload.
+        learn=not job.ingesting,
+    )
+
+
+def cleanup_expired_jobs(*, scan_orphans: bool = False) -> None:
     retention_days = max(0, settings.job_retention_days)
     if retention_days <= 0:
         return
 
     settings.job_storage_dir.mkdir(parents=True, exist_ok=True)
     cutoff = time.time() - retention_days * 86400
-    keep_ids: set[str] = set()
 
-    for existing_job in list(job_manager.list_jobs()):
-        if existing_job.created_at < cutoff:
-            logger.info("Removing expired job %s", existing_job.job_id)
-            job_manager.delete_job(existing_job.job_id)
-            _delete_job_artifacts(existing_job.job_id)
-        else:
-            keep_ids.add(existing_job.job_id)
+    for job_id in job_manager.expired_job_ids(cutoff):
+        logger.info("Removing expired job %s", job_id)
+        job_manager.delete_job(job_id)
+        delete_job_artifacts(job_id)
+
+    if not scan_orphans:
+        return
 
+    # Directories left behind by jobs the registry no longer knows about,
+    # e.g. from an in-memory registry before a restart.
     for job_dir in settings.job_storage_dir.iterdir():
-        if not job_dir.is_dir():
+        if not job_dir.is_dir() or job_dir.name == CACHE_DIRNAME:
+            continue
+        if job_manager.get_status(job_dir.name) is not None:
             continue
-        job_id = job_dir.name
-        if job_id in keep_ids:
+        if (job_dir / SESSION_FILENAME).exists():
+            # Unfinished uploads expire in cleanup_abandoned_uploads.
             continue
         try:
             mtime = job_dir.stat().st_mtime
@@ -200,20 +287,49 @@ def cleanup_expired_jobs() -> None:
             shutil.rmtree(job_dir, ignore_errors=True)
 
 
+def cleanup_abandoned_uploads() -> None:
+    if settings.upload_session_hours <= 0:
+        return
+    cutoff = time.time() - settings.upload_session_hours * 3600
+    for upload_id in list(upload_sessions.expired(cutoff)):
+        logger.info("Removing abandoned upload %s", upload_id)
+        upload_sessions.close(upload_id)
+        delete_job_artifacts(upload_id)
+
+
 def _retention_worker() -> None:
     while True:
         try:
             cleanup_expired_jobs()
+            cleanup_abandoned_uploads()
+            metadata_index.prune()
         except Exception as exc:  # pragma: no cover
             logger.exception("Job retention cleanup failed: %s", exc)
         interval_hours = max(6, settings.job_retention_days)
         time.sleep(interval_hours * 3600)
 @app.on_event("startup")
 async def on_startup() -> None:
-    cleanup_expired_jobs()
-    if settings.job_retention_days > 0:
+    cleanup_expired_jobs(scan_orphans=True)
+    # Queued jobs are recovered by the workers through their expired leases.
+    if job_queue is None:
+        for job_id in job_manager.recover_unfinished():
+            job = job_manager.get_job(job_id)
+            if job is not None and job.ingesting:
+                # Its upload died with the process; the client never got the id.
+                logger.info("Removing job %s whose upload was interrupted", job_id)
+                job_manager.delete_job(job_id)
+                delete_job_artifacts(job_id)
+                continue
+            logger.info("Resuming job %s interrupted by restart", job_id)
+            _submit_job(job_id)
+    if settings.job_retention_days > 0 or settings.upload_session_hours > 0:
         thread = threading.Thread(target=_retention_worker, daemon=True)
         thread.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    shutdown()
 @app.get(f"{settings.api_prefix}/health")
 async def health_check() -> dict[str, str]:
     return {"status": "ok"}
@@ -224,73 +340,665 @@ async def list_categories() -> dict[str, list[str]]:
     return {category: SUPPORTED_TARGETS[category] for category in available_categories()}
 
 
-@app.post(f"{settings.api_prefix}/convert")
-async def convert_files(
-    background_tasks: BackgroundTasks,
-    category: str = Form(...),
-    target_format: str = Form(...),
-    files: list[UploadFile] = File(...),
-) -> JSONResponse:
+@app.get(f"{settings.api_prefix}/profiles")
+async def list_profiles() -> dict[str, dict[str, list[str]]]:
+    return {category: SUPPORTED_PROFILES[category] for category in available_categories()}
+
+
+@app.get(f"{settings.api_prefix}/cache")
+async def cache_stats() -> dict[str, int]:
+    return result_cache.stats()
+
+
+@app.get(f"{settings.api_prefix}/metrics")
+def metrics() -> Response:
+    # Plain def: FastAPI runs it in the threadpool, so the storage walk in
+    # the DirectorySize gauge never blocks the event loop.
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get(f"{settings.api_prefix}/load")
+async def load_stats() -> dict[str, Any]:
+    return {
+        "resources": resource_budget.usage(),
+        "queued": scheduler.stats() if job_queue is None else {"queued": job_queue.depth()},
+    }
+
+
+_CONVERT_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["category", "target_format", "files"],
+                    "properties": {
+                        "category": {"type": "string"},
+                        "target_format": {
+                            "type": "string",
+                            "description": "One format, or several separated by commas",
+                        },
+                        "profile": {
+                            "type": "string",
+                            "description": "One profile, or one per target format separated by commas",
+                        },
+                        "max_width": {"type": "integer", "minimum": 1},
+                        "max_height": {"type": "integer", "minimum": 1},
+                        "fit": {"type": "string", "enum": list(FIT_MODES)},
+                        "strip_metadata": {"type": "boolean"},
+                        "files": {
+                            "type": "array",
+                            "items": {"type": "string", "format": "binary"},
+                        },
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+def _validate_category(category: str) -> None:
     if category not in SUPPORTED_TARGETS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Unsupported category '{category}'",
         )
 
-    target_format = target_format.lower()
-    if target_format not in SUPPORTED_TARGETS[category]:
+
+def _validate_target_format(category: str, target_format: str) -> None:
+    if target_format.lower() not in SUPPORTED_TARGETS[category]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Unsupported target format '{target_format}'",
+            detail=f"Unsupported target format '{target_format.lower()}'",
         )
 
-    if not files:
+
+def _validate_profile(category: str, target_format: str, profile: str) -> None:
+    if profile not in SUPPORTED_PROFILES[category].get(target_format.lower(), []):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No files were provided for conversion",
+            detail=f"Unsupported profile '{profile}' for {target_format.lower()}",
         )
 
-    job = job_manager.create_job(
-        category=category,
-        target_format=target_format,
-        total_files=len(files),
+
+_IMAGE_FIELDS = ("max_width", "max_height", "fit", "strip_metadata")
+_MAX_DIMENSION = 65535
+
+
+def _dimension(fields: dict[str, str], name: str) -> int | None:
+    value = fields.get(name)
+    if not value:
+        return None
+    try:
+        dimension = int(value)
+    except ValueError:
+        dimension = 0
+    if not 1 <= dimension <= _MAX_DIMENSION:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"'{name}' must be a whole number between 1 and {_MAX_DIMENSION}",
+        )
+    return dimension
+
+
+def _image_options(category: str, fields: dict[str, str]) -> dict[str, Any]:
+    """Resize and metadata options from the form, validated."""
+
+    given = [name for name in _IMAGE_FIELDS if fields.get(name)]
+    if not given:
+        return {}
+    if category != "images":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"'{given[0]}' is only supported for images",
+        )
+    options: dict[str, Any] = {}
+    for name in ("max_width", "max_height"):
+        dimension = _dimension(fields, name)
+        if dimension is not None:
+            options[name] = dimension
+    fit = fields.get("fit")
+    if fit:
+        if fit not in FIT_MODES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unsupported fit '{fit}'",
+            )
+        options["fit"] = fit
+    strip = fields.get("strip_metadata", "").lower()
+    if strip in ("1", "true", "yes", "on"):
+        options["strip_metadata"] = True
+    elif strip not in ("", "0", "false", "no", "off"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'strip_metadata' must be true or false",
+        )
+    return options
+
+
+def _targets(category: str, fields: dict[str, str]) -> list[tuple[str, str | None]]:
+    """Target formats and their profiles from the form.
+
+    ``target_format`` may list several formats separated by commas;
+    ``profile`` is then either one profile for all of them or one per
+    format, in the same order (an empty entry means the default).
+    """
+
+    formats = [
+        part.strip().lower()
+        for part in _required_field(fields, "target_format").split(",")
+        if part.strip()
+    ]
+    if not formats:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Missing form field 'target_format'",
+        )
+    if len(set(formats)) != len(formats):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Each target format may only be listed once",
+        )
+    for target_format in formats:
+        _validate_target_format(category, target_format)
+
+    profiles: list[str | None] = [None] * len(formats)
+    if fields.get("profile"):
+        given = [part.strip() or None for part in fields["profile"].split(",")]
+        if len(given) == 1:
+            profiles = given * len(formats)
+        elif len(given) == len(formats):
+            profiles = given
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Give one profile, or one per target format",
+            )
+    for target_format, profile in zip(formats, profiles):
+        if profile:
+            _validate_profile(category, target_format, profile)
+    return list(zip(formats, profiles))
+
+
+def _client_id(request: Request) -> str:
+    """Identify who submitted a job, for fair scheduling between clients."""
+
+    api_key = request.headers.get("x-api-key")
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+def _required_field(fields: dict[str, str], name: str) -> str:
+    value = fields.get(name)
+    if not value:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Missing form field '{name}'",
+        )
+    return value
+
+
+def _overloaded(status_code: int, detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status_code,
+        detail=detail,
+        headers={"Retry-After": str(max(1, min(3600, round(retry_after))))},
     )
 
-    input_dir = _input_directory(job.job_id)
-    output_dir = _output_directory(job.job_id)
-    existing_output_names: set[str] = set()
 
-    for index, upload in enumerate(files):
-        filename = upload.filename or f"file_{index}"
-        safe_name = Path(filename).name or f"file_{index}"
-        input_path = input_dir / safe_name
-        output_name_candidate = f"{Path(safe_name).stem}.{target_format}"
-        output_name = _unique_name(output_name_candidate, existing_output_names)
-        existing_output_names.add(output_name)
-        output_path = output_dir / output_name
+def _check_admission(client_id: str) -> None:
+    """Shed load before reading the upload instead of queuing without limit."""
 
-        with input_path.open("wb") as destination:
-            shutil.copyfileobj(upload.file, destination)
+    if job_queue is not None:
+        if settings.max_queued_jobs and job_queue.depth() >= settings.max_queued_jobs:
+            raise _overloaded(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "Too many jobs are waiting; try again later",
+                settings.queue_visibility_timeout,
+            )
+        return
+
+    if settings.max_queued_jobs_per_client:
+        queued, drain = scheduler.backlog(client_id)
+        if queued >= settings.max_queued_jobs_per_client:
+            raise _overloaded(
+                status.HTTP_429_TOO_MANY_REQUESTS,
+                "Too many of your jobs are waiting; try again later",
+                drain,
+            )
+    if settings.max_queued_jobs:
+        queued, drain = scheduler.backlog()
+        if queued >= settings.max_queued_jobs:
+            raise _overloaded(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "Too many jobs are waiting; try again later",
+                drain,
+            )
 
-        upload.file.close()
 
-        job.results.append(
+def _job_settings(fields: dict[str, str]) -> tuple[str, list[tuple[str, str | None]], dict[str, Any]]:
+    """Category, targets and job options from the form, validated."""
+
+    category = _required_field(fields, "category")
+    _validate_category(category)
+    targets = _targets(category, fields)
+    options: dict[str, Any] = {}
+    shared_profiles = {profile for _, profile in targets}
+    if len(shared_profiles) == 1 and None not in shared_profiles:
+        # One profile for every output is a job option, as before.
+        options["profile"] = shared_profiles.pop()
+        targets = [(target_format, None) for target_format, _ in targets]
+    options.update(_image_options(category, fields))
+    return category, targets, options
+
+
+def _probe_files(category: str, files: list[UploadedFile]) -> list[InputMetadata | None]:
+    return [metadata_index.probe(category, stored.path, stored.digest) for stored in files]
+
+
+def _add_results(
+    job: ConversionJob,
+    targets: list[tuple[str, str | None]],
+    stored: UploadedFile,
+    metadata: InputMetadata | None,
+    output_names: set[str],
+) -> None:
+    """Add the outputs of one stored file; failed already if it is unusable."""
+
+    output_dir = output_directory(job.job_id)
+    error = metadata.error if metadata is not None else None
+    for target_format, profile in targets:
+        output_name = _unique_name(f"{Path(stored.filename).stem}.{target_format}", output_names)
+        output_names.add(output_name)
+        job_manager.add_result(
+            job.job_id,
             JobFileResult(
-                source_name=safe_name,
-                source_path=input_path,
+                source_name=stored.filename,
+                source_path=stored.path,
                 output_name=output_name,
-                output_path=output_path,
+                output_path=output_dir / output_name,
+                source_digest=stored.digest,
+                target_format=target_format,
+                profile=profile,
+                metadata=metadata.to_json() if metadata is not None and not error else None,
+                status=JobStatus.FAILED if error else JobStatus.PENDING,
+                error=error,
             ),
         )
+        if error:
+            job_manager.increment_processed(job.job_id)
+
+
+async def _create_job(
+    job_id: str,
+    client_id: str,
+    fields: dict[str, str],
+    files: list[UploadedFile],
+) -> ConversionJob:
+    """Register a job for files already stored in its input directory.
+
+    Every file is probed first. Files that cannot be converted fail right
+    away, and the request is refused if none can.
+    """
+
+    category, targets, options = _job_settings(fields)
+    probed = await to_thread.run_sync(_probe_files, category, files)
+    unusable = [metadata for metadata in probed if metadata is not None and metadata.error]
+    if len(unusable) == len(files):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=unusable[0].error,
+        )
 
-    background_tasks.add_task(executor.submit, _process_job, job.job_id)
+    input_bytes = sum(stored.size for stored in files)
+    upload_bytes.inc(input_bytes)
+    job = job_manager.create_job(
+        category=category,
+        target_format=targets[0][0],
+        total_files=len(files) * len(targets),
+        job_id=job_id,
+        options=options,
+        client_id=client_id,
+        input_bytes=input_bytes,
+        target_formats=[target_format for target_format, _ in targets],
+        estimated_seconds=sum(
+            estimate_seconds(category, metadata, stored.size, outputs=len(targets))
+            for stored, metadata in zip(files, probed)
+            if metadata is None or not metadata.error
+        ),
+    )
+
+    output_names: set[str] = set()
+    for stored, metadata in zip(files, probed):
+        _add_results(job, targets, stored, metadata, output_names)
+    return job
+
+
+@dataclass
+class _PipelinedJob:
+    """A job whose files are converted while the rest of the upload arrives."""
+
+    job_id: str
+    category: str
+    targets: list[tuple[str, str | None]]
+    output_names: set[str] = field(default_factory=set)
+    files: int = 0
+    usable: int = 0
+    input_bytes: int = 0
+    estimated_seconds: float = 0.0
+    first_error: str | None = None
+    submitted: bool = False
+
+    @classmethod
+    def start(cls, job_id: str, client_id: str, fields: dict[str, str]) -> "_PipelinedJob":
+        category, targets, options = _job_settings(fields)
+        job_manager.create_job(
+            category=category,
+            target_format=targets[0][0],
+            total_files=0,
+            job_id=job_id,
+            options=options,
+            client_id=client_id,
+            target_formats=[target_format for target_format, _ in targets],
+            ingesting=True,
+        )
+        return cls(job_id, category, targets)
+
+    async def add(self, stored: UploadedFile) -> None:
+        """Probe a file that just finished writing and queue its outputs."""
+
+        (metadata,) = await to_thread.run_sync(_probe_files, self.category, [stored])
+        self.files += 1
+        self.input_bytes += stored.size
+        upload_bytes.inc(stored.size)
+        if metadata is not None and metadata.error:
+            self.first_error = self.first_error or metadata.error
+        else:
+            self.usable += 1
+            self.estimated_seconds += estimate_seconds(
+                self.category,
+                metadata,
+                stored.size,
+                outputs=len(self.targets),
+            )
+        job = job_manager.update_job(
+            self.job_id,
+            total_files=self.files * len(self.targets),
+            input_bytes=self.input_bytes,
+            estimated_seconds=self.estimated_seconds,
+        )
+        _add_results(job, self.targets, stored, metadata, self.output_names)
+        if self.usable:
+            resume_ingesting(self.job_id, _submit_job)
+            self.submitted = True
+
+
+def _cancel_job(job_id: str, message: str) -> None:
+    job_manager.cancel_job(job_id, message)
+    if job_queue is not None:
+        discarded = job_queue.discard(job_id)
+    else:
+        discarded = scheduler.discard(job_id) or release_parked(job_id)
+        # Workers in this process stop their ffmpeg now rather than at the
+        # watchdog's next check.
+        conversion_watchdog.cancel(job_id)
+    if discarded:
+        drop_cancelled_job(job_id)
+
+
+@app.post(f"{settings.api_prefix}/convert", openapi_extra=_CONVERT_REQUEST_BODY)
+async def convert_files(
+    request: Request,
+    background_tasks: BackgroundTasks,
+) -> JSONResponse:
+    client_id = _client_id(request)
+    _check_admission(client_id)
+    job_id = uuid.uuid4().hex
+    fields: dict[str, str] = {}
+    # Queue-mode workers could not tell an upload that is still arriving
+    # from one whose API process died, so only local jobs are pipelined.
+    pipelining = settings.pipelined_uploads and job_queue is None
+    pipelined: _PipelinedJob | None = None
+    waiting: list[UploadedFile] = []
+
+    def check_field(name: str, value: str) -> None:
+        if pipelined is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Form fields must come before the files",
+            )
+        fields[name] = value
+        if name == "category":
+            _validate_category(value)
+        if "category" in fields and "target_format" in fields:
+            _targets(fields["category"], fields)
+
+    async def on_file(stored: UploadedFile) -> None:
+        nonlocal pipelined
+        if pipelined is None:
+            try:
+                _job_settings(fields)
+            except HTTPException:
+                # Not every setting has arrived yet.
+                waiting.append(stored)
+                return
+            pipelined = _PipelinedJob.start(job_id, client_id, fields)
+        for item in (*waiting, stored):
+            await pipelined.add(item)
+        waiting.clear()
+
+    try:
+        with upload_seconds.time():
+            upload = await stream_multipart(
+                request,
+                input_directory(job_id),
+                max_file_bytes=settings.max_upload_file_mb * 1024 * 1024,
+                max_request_bytes=settings.max_upload_request_mb * 1024 * 1024,
+                on_field=check_field,
+                on_file=on_file if pipelining else None,
+            )
+        _job_settings(upload.fields)
+        if not upload.files:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No files were provided for conversion",
+            )
+        if pipelined is not None and not pipelined.usable:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail=pipelined.first_error,
+            )
+    except BaseException:
+        if pipelined is not None and pipelined.submitted:
+            _cancel_job(job_id, "Upload failed")
+        else:
+            job_manager.delete_job(job_id)
+            delete_job_artifacts(job_id)
+        raise
+
+    if pipelined is not None:
+        job_manager.update_job(job_id, ingesting=False)
+        # Finishes the job if it parked after converting the last file.
+        resume_ingesting(job_id, _submit_job)
+    else:
+        try:
+            job = await _create_job(job_id, client_id, upload.fields, upload.files)
+        except BaseException:
+            delete_job_artifacts(job_id)
+            raise
+        background_tasks.add_task(_submit_job, job.job_id)
 
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"jobId": job_id},
+    )
+
+
+def _serialize_upload(session: UploadSession) -> dict[str, Any]:
+    return {
+        "uploadId": session.upload_id,
+        "files": [
+            {"index": index, "name": item.filename, "size": item.size, "offset": item.offset}
+            for index, item in enumerate(session.files)
+        ],
+    }
+
+
+def _upload_session(upload_id: str) -> UploadSession:
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+    return session
+
+
+def _form_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _declared_files(body: dict[str, Any]) -> list[tuple[str, int]]:
+    entries = body.get("files")
+    if not isinstance(entries, list) or not entries:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No files were provided for conversion",
+        )
+    max_file_bytes = settings.max_upload_file_mb * 1024 * 1024
+    files: list[tuple[str, int]] = []
+    for entry in entries:
+        name = entry.get("name") if isinstance(entry, dict) else None
+        size = entry.get("size") if isinstance(entry, dict) else None
+        if not isinstance(name, str) or not isinstance(size, int) or isinstance(size, bool) or size < 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Each file needs a 'name' and a non-negative integer 'size'",
+            )
+        if max_file_bytes and size > max_file_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"{Path(name).name} exceeds the maximum file size",
+            )
+        files.append((name, size))
+    max_request_bytes = settings.max_upload_request_mb * 1024 * 1024
+    if max_request_bytes and sum(size for _, size in files) > max_request_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Upload exceeds the maximum request size",
+        )
+    return files
+
+
+@app.post(f"{settings.api_prefix}/uploads")
+async def create_upload(request: Request) -> JSONResponse:
+    """Start a resumable upload.
+
+    The JSON body holds the ``/convert`` form fields plus ``files``, a list
+    of ``{"name": ..., "size": ...}``; each file is then sent in chunks.
+    """
+
+    client_id = _client_id(request)
+    _check_admission(client_id)
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Expected a JSON object",
+        )
+    fields = {
+        name: _form_value(value)
+        for name, value in body.items()
+        if name != "files" and value is not None
+    }
+    _job_settings(fields)
+    files = _declared_files(body)
+
+    upload_id = uuid.uuid4().hex
+    try:
+        session = upload_sessions.create(
+            upload_id,
+            input_directory(upload_id),
+            client_id=client_id,
+            fields=fields,
+            files=files,
+        )
+    except BaseException:
+        delete_job_artifacts(upload_id)
+        raise
+    return JSONResponse(status_code=status.HTTP_201_CREATED, content=_serialize_upload(session))
+
+
+@app.get(f"{settings.api_prefix}/uploads/{{upload_id}}")
+async def get_upload(upload_id: str) -> dict[str, Any]:
+    return _serialize_upload(_upload_session(upload_id))
+
+
+@app.patch(f"{settings.api_prefix}/uploads/{{upload_id}}/files/{{index}}")
+async def upload_chunk(upload_id: str, index: int, request: Request) -> Response:
+    """Append one chunk, starting at the ``Upload-Offset`` header.
+
+    A mismatched offset is answered with 409 and the stored offset in
+    ``Upload-Offset``; ``Upload-Checksum: <md5|sha1|sha256> <base64>`` makes
+    the chunk all or nothing.
+    """
+
+    session = _upload_session(upload_id)
+    offset = request.headers.get("upload-offset", "")
+    if not offset.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Missing or invalid Upload-Offset header",
+        )
+    new_offset = await upload_sessions.write_chunk(
+        request,
+        session,
+        index,
+        int(offset),
+        checksum=request.headers.get("upload-checksum"),
+    )
+    return Response(
+        status_code=status.HTTP_204_NO_CONTENT,
+        headers={"Upload-Offset": str(new_offset)},
+    )
+
+
+@app.post(f"{settings.api_prefix}/uploads/{{upload_id}}/finalize")
+async def finalize_upload(upload_id: str, background_tasks: BackgroundTasks) -> JSONResponse:
+    session = _upload_session(upload_id)
+    files = await upload_sessions.finalize(session)
+    try:
+        _check_admission(session.client_id)
+        job = await _create_job(upload_id, session.client_id, session.fields, files)
+    except BaseException:
+        upload_sessions.reopen(upload_id)
+        raise
+    upload_sessions.close(upload_id)
+    background_tasks.add_task(_submit_job, job.job_id)
     return JSONResponse(
         status_code=status.HTTP_202_ACCEPTED,
         content={"jobId": job.job_id},
     )
 
 
+@app.delete(f"{settings.api_prefix}/uploads/{{upload_id}}")
+async def delete_upload(upload_id: str):
+    _upload_session(upload_id)
+    if upload_sessions.in_use(upload_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Upload is still receiving data",
+        )
+    upload_sessions.close(upload_id)
+    delete_job_artifacts(upload_id)
+    return {"deleted": True}
+
+
 @app.get(f"{settings.api_prefix}/jobs/{{job_id}}")
 async def get_job(job_id: str):
     job = job_manager.get_job(job_id)
@@ -299,8 +1007,124 @@ async def get_job(job_id: str):
     return serialize_job(job)
 
 
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+_TERMINAL_STATUSES = (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED)
+EVENT_STREAM_KEEPALIVE_SECONDS = 15.0
+
+
+@app.get(f"{settings.api_prefix}/jobs/{{job_id}}/events")
+async def stream_job_events(job_id: str):
+    job = job_manager.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+
+    subscription = job_manager.subscribe(
+        job_id,
+        max_pending=settings.event_stream_max_pending,
+    )
+
+    # Queue workers run in other processes and cannot notify this
+    # subscription, so in queue mode the stream also polls the job store.
+    wait_seconds = EVENT_STREAM_KEEPALIVE_SECONDS
+    if job_queue is not None:
+        wait_seconds = min(wait_seconds, max(0.1, settings.queue_poll_interval))
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            snapshot = serialize_job(job)
+            yield _sse("snapshot", snapshot)
+            current = job
+            quiet = 0.0
+            while current.status not in _TERMINAL_STATUSES:
+                changes = await subscription.wait(wait_seconds)
+                if changes is None:
+                    quiet += wait_seconds
+                    if job_queue is None:
+                        yield ": keep-alive\n\n"
+                        continue
+                    changes = JobChanges(resync=True)
+                latest = job_manager.get_job(job_id)
+                if latest is None:
+                    yield _sse("deleted", {"jobId": job_id})
+                    return
+                current = latest
+                if changes.resync:
+                    latest_snapshot = serialize_job(current)
+                    if latest_snapshot != snapshot:
+                        snapshot = latest_snapshot
+                        quiet = 0.0
+                        yield _sse("snapshot", snapshot)
+                    elif quiet >= EVENT_STREAM_KEEPALIVE_SECONDS:
+                        quiet = 0.0
+                        yield ": keep-alive\n\n"
+                    continue
+                quiet = 0.0
+                for index in changes.files:
+                    payload = {"index": index, **serialize_result(current.results[index])}
+                    yield _sse("file", payload)
+                # File progress moves the job's aggregate progress as well.
+                if changes.job or changes.files or current.status in _TERMINAL_STATUSES:
+                    yield _sse("job", serialize_job_summary(current))
+        finally:
+            job_manager.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _measured_zip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    started = time.perf_counter()
+    for chunk in chunks:
+        download_bytes.inc(len(chunk))
+        yield chunk
+    zip_seconds.observe(time.perf_counter() - started)
+
+
+def _accel_redirect(path: Path) -> str | None:
+    if not settings.accel_redirect_prefix:
+        return None
+    return accel_location(path, settings.job_storage_dir, settings.accel_redirect_prefix)
+
+
+def _output_digest(job_id: str, index: int, result: JobFileResult) -> str:
+    """SHA-256 of a finished output, hashed and stored on first use."""
+
+    if not result.output_digest:
+        try:
+            digest = file_digest(result.output_path)
+        except FileNotFoundError:
+            return ""
+        job_manager.update_result(job_id, index, output_digest=digest)
+        result.output_digest = digest
+    return result.output_digest
+
+
+def _archive_etag(job: ConversionJob) -> str | None:
+    """Strong ETag of a job's ZIP, from the hashes of what goes into it.
+
+    The archive is built the same way from the same files every time, so
+    equal output hashes mean equal archive bytes.
+    """
+
+    outputs = sorted(
+        (result.output_name, _output_digest(job.job_id, index, result))
+        for index, result in enumerate(job.results)
+        if result.status is JobStatus.COMPLETED
+    )
+    if not outputs or any(not digest for _, digest in outputs):
+        return None
+    payload = "\n".join(f"{name}:{digest}" for name, digest in outputs)
+    return strong_etag(hashlib.sha256(payload.encode("utf-8")).hexdigest())
+
+
 @app.get(f"{settings.api_prefix}/jobs/{{job_id}}/download")
-async def download_job(job_id: str):
+async def download_job(job_id: str, request: Request):
     job = job_manager.get_job(job_id)
     if job is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
@@ -310,41 +1134,62 @@ async def download_job(job_id: str):
             detail="Job is not completed yet",
         )
 
+    archive_name = f"{settings.app_name.lower()}_{job_id}.zip"
+    etag = await to_thread.run_sync(_archive_etag, job)
     zip_path = _zip_path(job_id)
-    if not zip_path.exists():
-        output_dir = _output_directory(job_id)
-        if not output_dir.exists():
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Converted files not found",
-            )
-        archive_path = shutil.make_archive(str(zip_path.with_suffix("")), "zip", output_dir)
-        zip_path = Path(archive_path)
+    if zip_path.exists():
+        return file_response(
+            request,
+            zip_path,
+            media_type="application/zip",
+            filename=archive_name,
+            etag=etag,
+            cache_control=IMMUTABLE,
+            accel_redirect=_accel_redirect(zip_path),
+        )
 
-    return FileResponse(
-        zip_path,
+    headers = {"Cache-Control": IMMUTABLE}
+    if etag is not None:
+        headers["ETag"] = etag
+    if not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    output_dir = job_directory(job_id) / "output"
+    if not output_dir.exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Converted files not found",
+        )
+    return StreamingResponse(
+        _measured_zip(
+            stream_zip(output_dir, cache_path=zip_path if settings.cache_zip_archives else None),
+        ),
         media_type="application/zip",
-        filename=f"{settings.app_name.lower()}_{job_id}.zip",
+        headers={"Content-Disposition": f'attachment; filename="{archive_name}"', **headers},
     )
 
 
 @app.get(f"{settings.api_prefix}/jobs/{{job_id}}/files/{{filename}}")
-async def download_single_file(job_id: str, filename: str):
+async def download_single_file(job_id: str, filename: str, request: Request):
     job = job_manager.get_job(job_id)
     if job is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
 
     normalized = Path(filename).name
-    for result in job.results:
+    for index, result in enumerate(job.results):
         if result.output_name == normalized and result.status is JobStatus.COMPLETED:
             if not result.output_path.exists():
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Converted file missing",
                 )
-            return FileResponse(
+            digest = await to_thread.run_sync(_output_digest, job_id, index, result)
+            return file_response(
+                request,
                 result.output_path,
                 filename=result.output_name,
+                etag=strong_etag(digest) if digest else None,
+                cache_control=IMMUTABLE,
+                accel_redirect=_accel_redirect(result.output_path),
             )
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
@@ -359,11 +1204,11 @@ async def delete_job(job_id: str):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
 
     if job.status in (JobStatus.COMPLETED, JobStatus.FAILED, JobStatus.CANCELLED):
-        _delete_job_artifacts(job_id)
+        delete_job_artifacts(job_id)
         job_manager.delete_job(job_id)
         return {"deleted": True}
 
-    job_manager.cancel_job(job_id, "Cancelled by user")
+    _cancel_job(job_id, "Cancelled by user")
     return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"cancelled": True})
 
 
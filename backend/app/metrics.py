@@ -0,0 +1,229 @@
+"""Prometheus metrics, collected with ``prometheus_client``.
+
+With ``PROMETHEUS_MULTIPROC_DIR`` set for the API and every worker, counters
+and histograms are shared through that directory, so the API also reports
+conversions done by queue-mode workers. The directory must be emptied
+before the processes start.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Mapping, Sequence
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    disable_created_metrics,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+
+from .converters import ConversionSample, add_conversion_observer
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+THROUGHPUT_BUCKETS = tuple(float(1 << shift) for shift in range(16, 32, 2))
+
+LabelValues = tuple[str, ...]
+
+disable_created_metrics()
+registry = CollectorRegistry()
+_callbacks: list[Collector] = []
+
+
+class _CallbackGauge(Collector):
+    """Gauge read at scrape time from ``callback``.
+
+    ``callback`` returns either a single number or a mapping from label
+    values to numbers. It runs in the process serving the scrape only.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        callback: Callable[[], float | Mapping[LabelValues, float]],
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = list(labelnames)
+        self.callback = callback
+
+    def collect(self) -> Iterable[Metric]:
+        family = GaugeMetricFamily(self.name, self.documentation, labels=self.labelnames)
+        current = self.callback()
+        values = current if isinstance(current, Mapping) else {(): current}
+        for key, value in sorted(values.items()):
+            family.add_metric(list(key), value)
+        yield family
+
+
+def callback_gauge(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    *,
+    callback: Callable[[], float | Mapping[LabelValues, float]],
+) -> None:
+    """Register a gauge whose value ``callback`` supplies at scrape time."""
+
+    collector = _CallbackGauge(name, documentation, labelnames, callback)
+    _callbacks.append(collector)
+    registry.register(collector)
+
+
+def render() -> bytes:
+    """Every metric in the Prometheus text format."""
+
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(registry)
+    combined = CollectorRegistry()
+    multiprocess.MultiProcessCollector(combined)
+    for collector in _callbacks:
+        combined.register(collector)
+    return generate_latest(combined)
+
+
+upload_seconds = Histogram(
+    "converti_upload_seconds",
+    "Time spent receiving and storing an upload.",
+    buckets=DEFAULT_BUCKETS,
+    registry=registry,
+)
+upload_bytes = Counter(
+    "converti_upload_bytes_total",
+    "Bytes of uploaded source files.",
+    registry=registry,
+)
+queue_wait_seconds = Histogram(
+    "converti_queue_wait_seconds",
+    "Time between a job being created and starting to process.",
+    buckets=DEFAULT_BUCKETS,
+    registry=registry,
+)
+conversion_seconds = Histogram(
+    "converti_conversion_seconds",
+    "Time spent converting one file.",
+    ("category", "target_format"),
+    buckets=DEFAULT_BUCKETS,
+    registry=registry,
+)
+conversion_input_bytes = Counter(
+    "converti_conversion_input_bytes_total",
+    "Bytes read by converters.",
+    ("category",),
+    registry=registry,
+)
+conversion_output_bytes = Counter(
+    "converti_conversion_output_bytes_total",
+    "Bytes written by converters.",
+    ("category",),
+    registry=registry,
+)
+conversion_throughput = Histogram(
+    "converti_conversion_input_bytes_per_second",
+    "Input bytes per second of each converted file.",
+    ("category",),
+    buckets=THROUGHPUT_BUCKETS,
+    registry=registry,
+)
+files_total = Counter(
+    "converti_files_total",
+    "Converted files by outcome.",
+    ("category", "status"),
+    registry=registry,
+)
+jobs_total = Counter(
+    "converti_jobs_total",
+    "Finished jobs by outcome.",
+    ("status",),
+    registry=registry,
+)
+result_cache_lookups = Counter(
+    "converti_result_cache_lookups_total",
+    "Result cache lookups by outcome.",
+    ("outcome",),
+    registry=registry,
+)
+result_cache_evictions = Counter(
+    "converti_result_cache_evictions_total",
+    "Results evicted from the cache to stay within its budget.",
+    registry=registry,
+)
+zip_seconds = Histogram(
+    "converti_zip_seconds",
+    "Time spent building a job's ZIP archive.",
+    buckets=DEFAULT_BUCKETS,
+    registry=registry,
+)
+download_bytes = Counter(
+    "converti_download_bytes_total",
+    "Bytes of ZIP archives streamed to clients.",
+    registry=registry,
+)
+
+
+def _record_conversion(sample: ConversionSample) -> None:
+    status = "completed" if sample.succeeded else "failed"
+    files_total.labels(category=sample.category, status=status).inc()
+    if not sample.succeeded:
+        return
+    conversion_seconds.labels(
+        category=sample.category,
+        target_format=sample.target_format,
+    ).observe(sample.seconds)
+    conversion_input_bytes.labels(category=sample.category).inc(sample.input_bytes)
+    conversion_output_bytes.labels(category=sample.category).inc(sample.output_bytes)
+    if sample.seconds > 0:
+        conversion_throughput.labels(category=sample.category).observe(
+            sample.input_bytes / sample.seconds,
+        )
+
+
+add_conversion_observer(_record_conversion)
+
+
+def _directory_size(path: Path) -> int:
+    total = 0
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                total += _directory_size(Path(entry.path))
+            elif entry.is_file(follow_symlinks=False):
+                total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            continue
+    return total
+
+
+class DirectorySize:
+    """Size of a directory tree, recomputed at most every ``max_age`` seconds."""
+
+    def __init__(self, path: Path, *, max_age: float = 60.0) -> None:
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._value = 0
+        self._measured_at = -math.inf
+
+    def __call__(self) -> float:
+        with self._lock:
+            if time.monotonic() - self._measured_at >= self.max_age:
+                self._value = _directory_size(self.path)
+                self._measured_at = time.monotonic()
+            return self._value
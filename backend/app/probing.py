@@ -0,0 +1,240 @@
+"""Input inspection at ingest: what a file is, and what converting it costs."""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import shutil
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from PIL import Image, UnidentifiedImageError
+
+from .converters.ffmpeg import probe_media
+
+_FFPROBE = shutil.which("ffprobe")
+
+# Rough single-output conversion cost, in seconds per unit of work: pixels
+# for images, seconds of audio, and pixels per frame times frames for
+# video. Only meant to rank jobs and give ETAs; the scheduler corrects it
+# against observed run times.
+_SECONDS_PER_IMAGE_PIXEL = 2e-8
+_SECONDS_PER_AUDIO_SECOND = 0.02
+_SECONDS_PER_VIDEO_PIXEL = 2e-8
+_DEFAULT_FRAME_RATE = 30.0
+# Files whose content could not be measured fall back to their size.
+_SECONDS_PER_BYTE = {"images": 1e-7, "audio": 2e-7, "video": 1e-6}
+_MIN_SECONDS = 0.01
+
+
+@dataclass
+class InputMetadata:
+    """What probing learned about one input file.
+
+    ``error`` names why the file cannot be converted at all; such files are
+    failed at ingest instead of reaching a converter.
+    """
+
+    format: str = ""
+    duration: float | None = None
+    width: int = 0
+    height: int = 0
+    frames: int = 1
+    frame_rate: float | None = None
+    video_codec: str | None = None
+    audio_codec: str | None = None
+    bit_rate: int | None = None
+    error: str | None = None
+
+    def to_json(self) -> dict[str, Any]:
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> "InputMetadata":
+        known = {item.name for item in dataclasses.fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+
+def _probe_image(source: Path) -> InputMetadata:
+    try:
+        with Image.open(source) as image:
+            return InputMetadata(
+                format=(image.format or "").lower(),
+                width=image.width,
+                height=image.height,
+                frames=getattr(image, "n_frames", 1),
+            )
+    except UnidentifiedImageError:
+        return InputMetadata(error="Not an image file in a supported format")
+    except Exception as exc:
+        return InputMetadata(error=f"Unreadable image file: {exc}")
+
+
+def _first(codecs: set[str]) -> str | None:
+    return min(codecs) if codecs else None
+
+
+def probe_input(category: str, source: Path) -> InputMetadata | None:
+    """Read ``source``'s header; ``None`` if it cannot be inspected here.
+
+    Images are read with Pillow, which never decodes pixels for this;
+    audio and video with ffprobe, when it is installed.
+    """
+
+    if category == "images":
+        return _probe_image(source)
+
+    media = probe_media(_FFPROBE, source)
+    if media.error is not None:
+        # Results are shared by every upload of the same content; keep this
+        # upload's path out of the message.
+        message = media.error.replace(f"{source}: ", "")
+        return InputMetadata(error=f"Unreadable media file: {message}")
+    if not media.streams:
+        return None
+    video_codec = _first(media.codecs("video"))
+    audio_codec = _first(media.codecs("audio"))
+    error = None
+    if category == "video" and video_codec is None:
+        error = "No video stream found"
+    elif category == "audio" and audio_codec is None:
+        error = "No audio stream found"
+    width, height = 0, 0
+    for stream in media.streams:
+        if stream.codec_type == "video" and not stream.attached_picture:
+            if stream.width * stream.height > width * height:
+                width, height = stream.width, stream.height
+    return InputMetadata(
+        format=media.format_name,
+        duration=media.duration,
+        width=width,
+        height=height,
+        frames=0,
+        frame_rate=media.frame_rate,
+        video_codec=video_codec,
+        audio_codec=audio_codec,
+        bit_rate=media.bit_rate,
+        error=error,
+    )
+
+
+def estimate_seconds(
+    category: str,
+    metadata: InputMetadata | None,
+    size: int,
+    *,
+    outputs: int = 1,
+) -> float:
+    """Expected conversion time of one file into ``outputs`` formats."""
+
+    seconds = 0.0
+    if metadata is not None and metadata.error is None:
+        if category == "images":
+            seconds = metadata.width * metadata.height * max(1, metadata.frames) * _SECONDS_PER_IMAGE_PIXEL
+        elif category == "audio" and metadata.duration:
+            seconds = metadata.duration * _SECONDS_PER_AUDIO_SECOND
+        elif category == "video" and metadata.duration and metadata.width:
+            frames = metadata.duration * (metadata.frame_rate or _DEFAULT_FRAME_RATE)
+            seconds = metadata.width * metadata.height * frames * _SECONDS_PER_VIDEO_PIXEL
+    if not seconds:
+        seconds = size * _SECONDS_PER_BYTE.get(category, _SECONDS_PER_BYTE["video"])
+    return max(_MIN_SECONDS, seconds) * max(1, outputs)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    digest TEXT NOT NULL,
+    category TEXT NOT NULL,
+    used_at REAL NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (digest, category)
+);
+CREATE INDEX IF NOT EXISTS metadata_used_at ON metadata (used_at);
+"""
+
+_PRUNE_INTERVAL = 1000
+
+
+class MetadataIndex:
+    """Probe results keyed on content hash, kept in SQLite.
+
+    The same upload is only probed once, across jobs, restarts and every
+    process sharing the file. The least recently used entries beyond
+    ``max_entries`` are dropped by :meth:`prune`, which runs every
+    ``_PRUNE_INTERVAL`` inserts and from the retention sweep.
+    """
+
+    def __init__(self, path: Path, *, max_entries: int = 100_000) -> None:
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._inserts = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=30,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def get(self, digest: str, category: str) -> InputMetadata | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM metadata WHERE digest = ? AND category = ?",
+                (digest, category),
+            ).fetchone()
+            if row is not None:
+                self._db.execute(
+                    "UPDATE metadata SET used_at = ? WHERE digest = ? AND category = ?",
+                    (time.time(), digest, category),
+                )
+        return InputMetadata.from_json(json.loads(row[0])) if row is not None else None
+
+    def put(self, digest: str, category: str, metadata: InputMetadata) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO metadata (digest, category, used_at, data) "
+                "VALUES (?, ?, ?, ?)",
+                (digest, category, time.time(), json.dumps(metadata.to_json())),
+            )
+            self._inserts += 1
+            due = self._inserts % _PRUNE_INTERVAL == 0
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """Drop the least recently used entries beyond ``max_entries``."""
+
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM metadata").fetchone()
+            excess = count - self.max_entries
+            if excess <= 0:
+                return 0
+            self._db.execute(
+                "DELETE FROM metadata WHERE rowid IN (SELECT rowid FROM metadata "
+                "ORDER BY used_at LIMIT ?)",
+                (excess,),
+            )
+        return excess
+
+    def probe(self, category: str, source: Path, digest: str = "") -> InputMetadata | None:
+        """Cached metadata for ``digest``, probing ``source`` on a miss."""
+
+        if digest:
+            cached = self.get(digest, category)
+            if cached is not None:
+                return cached
+        metadata = probe_input(category, source)
+        if digest and metadata is not None:
+            self.put(digest, category, metadata)
+        return metadata
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,454 @@
+"""Conversion runtime shared by the API process and standalone workers."""
+
+from __future__ import annotations
+
+import logging
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from .cache import CACHE_DIRNAME, ResultCache
+from .config import settings
+from .converters import configure_ffmpeg, configure_images
+from .converters.base import ConversionError, ConversionOutput, ConversionProgress, ConversionStopped
+from .converters.image import frame_note
+from .job_queue import JobQueue, SqliteJobQueue
+from .job_store import SqliteJobManager
+from .jobs import ConversionJob, JobFileResult, JobManager, JobStatus
+from .metrics import jobs_total, queue_wait_seconds
+from .probing import InputMetadata, MetadataIndex
+from .resources import ResourceBudget, ResourceCost, estimate_cost
+from .workers import (
+    ConversionBackend,
+    ConversionWatchdog,
+    InlineBackend,
+    ProcessPoolBackend,
+    WorkerBudget,
+)
+
+logger = logging.getLogger("converti")
+
+# New files wake a job that is still being uploaded; this only bounds how long
+# it goes without re-reading the job if a notification never comes.
+INGEST_WAIT_SECONDS = 5.0
+
+# A pipelined job gives up its job slot whenever it runs out of files to
+# convert, and is submitted again when the next one arrives. Job id ->
+# "scheduled" (queued or running), "again" (running, and files arrived that
+# its run may have missed) or "parked" (holding no slot).
+_ingest_lock = threading.Lock()
+_ingest_runs: dict[str, str] = {}
+
+settings.job_storage_dir.mkdir(parents=True, exist_ok=True)
+configure_ffmpeg(
+    threads=settings.ffmpeg_threads,
+    prefer_hardware=settings.ffmpeg_hardware_encoding,
+    segment_min_seconds=settings.video_segment_min_seconds,
+    segment_workers=settings.video_segment_workers,
+)
+configure_images(
+    max_pixels=settings.image_max_pixels,
+    max_memory_bytes=settings.image_max_memory_mb * 1024 * 1024,
+)
+job_manager: JobManager
+if settings.job_store == "sqlite":
+    job_manager = SqliteJobManager(
+        settings.job_store_path or settings.job_storage_dir / "jobs.sqlite3",
+    )
+else:
+    job_manager = JobManager()
+job_queue: JobQueue | None = None
+if settings.execution_mode == "queue":
+    job_queue = SqliteJobQueue(
+        settings.queue_path or settings.job_storage_dir / "queue.sqlite3",
+        visibility_timeout=settings.queue_visibility_timeout,
+    )
+worker_budget = WorkerBudget(settings.max_conversion_workers)
+resource_budget = ResourceBudget(
+    settings.cpu_thread_budget,
+    settings.memory_budget_mb * 1024 * 1024,
+)
+metadata_index = MetadataIndex(settings.job_storage_dir / "metadata.sqlite3")
+result_cache = ResultCache(
+    settings.job_storage_dir / CACHE_DIRNAME,
+    settings.result_cache_max_mb * 1024 * 1024,
+)
+inline_backend = InlineBackend()
+backends: dict[str, ConversionBackend] = {}
+if settings.image_executor == "process":
+    backends["images"] = ProcessPoolBackend(
+        settings.max_conversion_workers,
+        max_tasks_per_child=settings.image_worker_max_tasks,
+        memory_limit_mb=settings.image_worker_memory_limit_mb,
+    )
+
+
+def job_directory(job_id: str) -> Path:
+    base = settings.job_storage_dir / job_id
+    base.mkdir(parents=True, exist_ok=True)
+    return base
+
+
+def input_directory(job_id: str) -> Path:
+    directory = job_directory(job_id) / "input"
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def output_directory(job_id: str) -> Path:
+    directory = job_directory(job_id) / "output"
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+def delete_job_artifacts(job_id: str) -> None:
+    shutil.rmtree(job_directory(job_id), ignore_errors=True)
+
+
+def _is_cancelled(job_id: str) -> bool:
+    return job_manager.get_status(job_id) is JobStatus.CANCELLED
+
+
+conversion_watchdog = ConversionWatchdog(
+    _is_cancelled,
+    timeout=settings.conversion_timeout_seconds,
+)
+
+
+def _output_format(job: ConversionJob, result: JobFileResult) -> str:
+    return result.target_format or job.target_format
+
+
+def _output_options(job: ConversionJob, result: JobFileResult) -> dict[str, Any]:
+    if result.profile:
+        return {**job.options, "profile": result.profile}
+    return dict(job.options)
+
+
+def _group_cost(category: str, costs: list[ResourceCost]) -> ResourceCost:
+    if category == "images":
+        # One decode shared by every output; encodes run one after another.
+        return ResourceCost(
+            threads=max(cost.threads for cost in costs),
+            memory_bytes=max(cost.memory_bytes for cost in costs),
+        )
+    # ffmpeg runs one encoder per output side by side.
+    return ResourceCost(
+        threads=sum(cost.threads for cost in costs),
+        memory_bytes=sum(cost.memory_bytes for cost in costs),
+    )
+
+
+def _run_conversion(
+    job: ConversionJob,
+    results: list[JobFileResult],
+    progress: Callable[[ConversionProgress], None],
+) -> list[ConversionError | None]:
+    """Convert one source file to the outputs in ``results`` in one pass."""
+
+    source = results[0].source_path
+    cost = _group_cost(
+        job.category,
+        [
+            estimate_cost(
+                job.category,
+                _output_format(job, result),
+                source,
+                ffmpeg_threads=settings.ffmpeg_threads,
+                options=_output_options(job, result),
+                metadata=InputMetadata.from_json(result.metadata) if result.metadata else None,
+            )
+            for result in results
+        ],
+    )
+    grant = resource_budget.acquire(cost, should_stop=lambda: _is_cancelled(job.job_id))
+    if grant is None:
+        raise ConversionStopped("Cancelled")
+    backend = backends.get(job.category, inline_backend)
+    try:
+        with conversion_watchdog.watch(job.job_id):
+            if len(results) == 1:
+                result = results[0]
+                backend.convert(
+                    job.category,
+                    source,
+                    result.output_path,
+                    _output_format(job, result),
+                    # ffmpeg gets exactly the threads it was admitted with.
+                    options={**_output_options(job, result), "threads": grant.threads},
+                    progress=progress,
+                )
+                return [None]
+            return backend.convert_many(
+                job.category,
+                source,
+                [
+                    ConversionOutput(
+                        result.output_path,
+                        _output_format(job, result),
+                        {**_output_options(job, result), "threads": grant.threads},
+                    )
+                    for result in results
+                ],
+                progress=progress,
+            )
+    finally:
+        resource_budget.release(grant)
+
+
+def _fail(job: ConversionJob, index: int, result: JobFileResult, message: str) -> None:
+    job_manager.update_result(job.job_id, index, status=JobStatus.FAILED, error=message)
+    logger.warning("Conversion failed for %s: %s", result.output_name, message)
+
+
+def _note(job: ConversionJob, result: JobFileResult) -> str | None:
+    if job.category != "images" or not result.metadata:
+        return None
+    return frame_note(
+        result.metadata.get("format", ""),
+        result.metadata.get("frames", 1),
+        _output_format(job, result),
+    )
+
+
+def _complete(job: ConversionJob, index: int, result: JobFileResult) -> None:
+    # The output is hashed for its ETag when it is first downloaded, not
+    # here: most outputs are fetched once, some never.
+    job_manager.update_result(
+        job.job_id,
+        index,
+        status=JobStatus.COMPLETED,
+        progress=1.0,
+        note=_note(job, result),
+    )
+
+
+def _convert_source(job: ConversionJob, indices: list[int]) -> int:
+    """Produce the outputs at ``indices``, all of one source file.
+
+    Returns how many of them failed.
+    """
+
+    if _is_cancelled(job.job_id):
+        # Submitted before the cancel landed; leave them pending so they
+        # are marked cancelled together with the rest of the job.
+        return 0
+
+    failures = 0
+    todo: list[tuple[int, JobFileResult, str | None]] = []
+    for index in indices:
+        result = job_manager.update_result(job.job_id, index, status=JobStatus.PROCESSING)
+        result.output_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_key = None
+        if result.source_digest and result_cache.enabled:
+            cache_key = ResultCache.key(
+                result.source_digest,
+                job.category,
+                _output_format(job, result),
+                _output_options(job, result),
+            )
+        if cache_key is not None and result_cache.fetch(cache_key, result.output_path):
+            _complete(job, index, result)
+            job_manager.increment_processed(job.job_id)
+            continue
+        todo.append((index, result, cache_key))
+    if not todo:
+        return 0
+
+    def report_progress(update: ConversionProgress) -> None:
+        for index, _, _ in todo:
+            job_manager.update_result(
+                job.job_id,
+                index,
+                progress=update.fraction,
+                speed=update.speed,
+                fps=update.fps,
+            )
+
+    try:
+        errors = _run_conversion(job, [result for _, result, _ in todo], report_progress)
+    except ConversionError as exc:
+        errors = [exc] * len(todo)
+    except Exception as exc:  # pragma: no cover - safety net
+        logger.exception("Unexpected error for %s", todo[0][1].source_name)
+        errors = [ConversionError(f"Unexpected error: {exc}")] * len(todo)
+
+    for (index, result, cache_key), error in zip(todo, errors):
+        try:
+            if isinstance(error, ConversionStopped) and _is_cancelled(job.job_id):
+                # Marked cancelled with the rest of the job.
+                continue
+            if error is not None:
+                _fail(job, index, result, str(error))
+                failures += 1
+                continue
+            if cache_key is not None:
+                result_cache.store(cache_key, result.output_path)
+            _complete(job, index, result)
+        finally:
+            job_manager.increment_processed(job.job_id)
+    return failures
+
+
+def resume_ingesting(job_id: str, submit: Callable[[str], None]) -> None:
+    """Have a run of pipelined ``job_id`` pick up the files added so far.
+
+    Submits the job unless a run is already queued or going, which is then
+    told to look again before it lets go of its slot.
+    """
+
+    with _ingest_lock:
+        if _ingest_runs.get(job_id) in ("scheduled", "again"):
+            _ingest_runs[job_id] = "again"
+            return
+        _ingest_runs[job_id] = "scheduled"
+    submit(job_id)
+
+
+def release_parked(job_id: str) -> bool:
+    """Forget a pipelined job holding no slot; ``False`` if it is queued or running."""
+
+    with _ingest_lock:
+        if _ingest_runs.get(job_id) != "parked":
+            return False
+        del _ingest_runs[job_id]
+        return True
+
+
+def _park(job_id: str) -> bool:
+    """Let an ingesting job without work go; ``False`` if it must look again."""
+
+    with _ingest_lock:
+        if _ingest_runs.get(job_id) == "again" or _is_cancelled(job_id):
+            _ingest_runs[job_id] = "scheduled"
+            return False
+        _ingest_runs[job_id] = "parked"
+        return True
+
+
+def drop_cancelled_job(job_id: str) -> None:
+    """Forget a job that was cancelled before any of it ran."""
+
+    with _ingest_lock:
+        _ingest_runs.pop(job_id, None)
+    jobs_total.labels(status=JobStatus.CANCELLED.value).inc()
+    delete_job_artifacts(job_id)
+    job_manager.delete_job(job_id)
+
+
+def _pending_sources(job: ConversionJob) -> Iterator[list[int]]:
+    """Indices of pending outputs, grouped by source file.
+
+    Results that already finished (before a restart) keep their outcome.
+    Outputs of the same source are converted together, decoding it once.
+    While the job is ingesting, files that arrive before the ones handed
+    out have finished are yielded too; once nothing is left in flight the
+    iterator ends, so the job does not sit in its slot waiting for uploads.
+    """
+
+    seen: set[int] = set()
+    watch = None
+    if job.ingesting:
+        watch = job_manager.watch(job.job_id, known=len(job.results))
+        # Files added before the watch was registered would not wake it.
+        job = job_manager.get_job(job.job_id) or job
+    try:
+        while True:
+            # Read before scanning, so files added meanwhile are not missed.
+            ingesting = job.ingesting
+            by_source: dict[Path, list[int]] = {}
+            for index, result in enumerate(job.results):
+                if index not in seen and result.status is JobStatus.PENDING:
+                    seen.add(index)
+                    by_source.setdefault(result.source_path, []).append(index)
+            yield from by_source.values()
+            if not ingesting or watch is None:
+                return
+            current = job_manager.get_job(job.job_id)
+            if current is None or current.status is JobStatus.CANCELLED:
+                return
+            unfinished = (JobStatus.PENDING, JobStatus.PROCESSING)
+            if not any(current.results[index].status in unfinished for index in seen):
+                return
+            # Woken by a new file, or when one handed out finishes.
+            watch.wait(INGEST_WAIT_SECONDS)
+            current = job_manager.get_job(job.job_id)
+            if current is None or current.status is JobStatus.CANCELLED:
+                return
+            job = current
+            watch.known = len(job.results)
+    finally:
+        if watch is not None:
+            job_manager.unsubscribe(watch)
+
+
+def process_job(job_id: str) -> None:
+    """Convert every pending file of ``job_id`` and record the outcome."""
+
+    job = job_manager.get_job(job_id)
+    if job is None:
+        logger.warning("Job %s vanished before processing", job_id)
+        return
+
+    if job.status is JobStatus.CANCELLED:
+        logger.info("Job %s cancelled before start", job_id)
+        drop_cancelled_job(job_id)
+        return
+
+    if job.status is JobStatus.PENDING and job.processed_files == 0:
+        queue_wait_seconds.observe(max(0.0, time.time() - job.created_at))
+    job_manager.update_job(job_id, status=JobStatus.PROCESSING, error=None)
+    while True:
+        for future in worker_budget.run(
+            job_id,
+            _pending_sources(job),
+            lambda indices: _convert_source(job, indices),
+            should_stop=lambda: _is_cancelled(job_id),
+        ):
+            future.result()
+
+        job = job_manager.get_job(job_id)
+        if job is None or not job.ingesting or job.status is JobStatus.CANCELLED:
+            break
+        if _park(job_id):
+            # Submitted again by resume_ingesting when the next file arrives.
+            return
+
+    with _ingest_lock:
+        _ingest_runs.pop(job_id, None)
+    if job is None:
+        return
+    if job.status is JobStatus.CANCELLED:
+        logger.info("Job %s cancelled during processing", job_id)
+        for index, result in enumerate(job.results):
+            if result.status in (JobStatus.PENDING, JobStatus.PROCESSING):
+                job_manager.update_result(
+                    job_id,
+                    index,
+                    status=JobStatus.CANCELLED,
+                    error="Cancelled",
+                )
+        job_manager.update_job(job_id, error=job.error or "Cancelled by user")
+        jobs_total.labels(status=JobStatus.CANCELLED.value).inc()
+        delete_job_artifacts(job_id)
+        job_manager.delete_job(job_id)
+        return
+
+    failures = sum(1 for result in job.results if result.status is JobStatus.FAILED)
+    final_status = JobStatus.COMPLETED if failures == 0 else JobStatus.FAILED
+    error = None
+    if failures:
+        error = f"{failures} file(s) failed during conversion"
+    job_manager.update_job(job_id, status=final_status, error=error)
+    jobs_total.labels(status=final_status.value).inc()
+    if final_status is JobStatus.FAILED and failures == len(job.results):
+        shutil.rmtree(output_directory(job_id), ignore_errors=True)
+
+
+def shutdown() -> None:
+    conversion_watchdog.shutdown()
+    worker_budget.shutdown()
+    for backend in backends.values():
+        backend.shutdown()
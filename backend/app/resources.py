@@ -0,0 +1,162 @@
+"""Per-conversion resource estimates and the machine-wide budget."""
+
+from __future__ import annotations
+
+import shutil
+import threading
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Mapping
+
+from PIL import Image
+
+from .converters import video_segments
+from .converters.ffmpeg import probe_media
+from .converters.image import SUPPORTED_FORMATS, estimate_memory, prepare_decode
+from .probing import InputMetadata
+
+_MB = 1024 * 1024
+_FFPROBE = shutil.which("ffprobe")
+
+# Encoders keep a window of frames in flight (lookahead, reference frames);
+# this is a rough upper bound on how many full frames they hold.
+_FRAMES_IN_FLIGHT = 48
+_FFMPEG_BASE_MEMORY = 64 * _MB
+
+
+@dataclass(frozen=True)
+class ResourceCost:
+    """CPU threads and memory one conversion is expected to use."""
+
+    threads: int = 1
+    memory_bytes: int = 0
+
+
+def _video_threads(frame_pixels: int) -> int:
+    if frame_pixels <= 1280 * 720:
+        return 2
+    if frame_pixels <= 1920 * 1080:
+        return 4
+    return 8
+
+
+def estimate_cost(
+    category: str,
+    target_format: str,
+    source: Path,
+    *,
+    ffmpeg_threads: int = 0,
+    options: Mapping[str, Any] | None = None,
+    metadata: InputMetadata | None = None,
+) -> ResourceCost:
+    """Estimate what converting ``source`` will need from its header.
+
+    Images are sized from their dimensions without decoding, at the reduced
+    scale a resize lets JPEG decode at; audio and video from ffprobe, or
+    from ``metadata`` probed at ingest. ``ffmpeg_threads`` pins the thread
+    count when set.
+    """
+
+    if category == "images":
+        try:
+            with Image.open(source) as image:
+                prepare_decode(image, options or {})
+                memory = estimate_memory(
+                    image,
+                    options or {},
+                    formats=[SUPPORTED_FORMATS.get(target_format.lower(), "")],
+                )
+        except Exception:
+            return ResourceCost(memory_bytes=source.stat().st_size * 10)
+        return ResourceCost(threads=1, memory_bytes=memory)
+
+    if category == "audio":
+        return ResourceCost(threads=ffmpeg_threads or 1, memory_bytes=_FFMPEG_BASE_MEMORY)
+
+    if metadata is not None and metadata.width:
+        pixels, duration = metadata.width * metadata.height, metadata.duration
+    else:
+        media = probe_media(_FFPROBE, source)
+        pixels, duration = media.frame_pixels, media.duration
+    memory = _FFMPEG_BASE_MEMORY + int(pixels * 1.5) * _FRAMES_IN_FLIGHT
+    if target_format.lower() == "webm":
+        # libvpx keeps a larger frame buffer than libx264.
+        memory += int(pixels * 1.5) * 16
+    # Long videos are encoded in pieces by several ffmpeg processes at once.
+    segments = video_segments(duration)
+    return ResourceCost(
+        threads=(ffmpeg_threads or _video_threads(pixels)) * segments,
+        memory_bytes=memory * segments,
+    )
+
+
+class ResourceBudget:
+    """Admit conversions against a fixed number of CPU threads and bytes.
+
+    Requests are served first come, first served so a large conversion is
+    not overtaken forever by a stream of small ones. A request larger than
+    the whole budget is clamped to it and therefore runs alone.
+    """
+
+    def __init__(self, threads: int, memory_bytes: int = 0) -> None:
+        self.threads = max(1, threads)
+        self.memory_bytes = max(0, memory_bytes)
+        self._condition = threading.Condition()
+        self._threads_used = 0
+        self._memory_used = 0
+        self._waiting: deque[object] = deque()
+
+    def clamp(self, cost: ResourceCost) -> ResourceCost:
+        memory = cost.memory_bytes
+        if self.memory_bytes:
+            memory = min(memory, self.memory_bytes)
+        return ResourceCost(threads=max(1, min(cost.threads, self.threads)), memory_bytes=memory)
+
+    def _fits(self, grant: ResourceCost) -> bool:
+        if self._threads_used + grant.threads > self.threads:
+            return False
+        if self.memory_bytes and self._memory_used + grant.memory_bytes > self.memory_bytes:
+            return False
+        return True
+
+    def acquire(
+        self,
+        cost: ResourceCost,
+        *,
+        should_stop: Callable[[], bool] | None = None,
+        poll_interval: float = 1.0,
+    ) -> ResourceCost | None:
+        """Block until ``cost`` fits; ``None`` if ``should_stop`` fired first."""
+
+        grant = self.clamp(cost)
+        ticket = object()
+        with self._condition:
+            self._waiting.append(ticket)
+            try:
+                while self._waiting[0] is not ticket or not self._fits(grant):
+                    if should_stop is not None and should_stop():
+                        return None
+                    self._condition.wait(poll_interval)
+                self._threads_used += grant.threads
+                self._memory_used += grant.memory_bytes
+            finally:
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+        return grant
+
+    def release(self, grant: ResourceCost) -> None:
+        with self._condition:
+            self._threads_used -= grant.threads
+            self._memory_used -= grant.memory_bytes
+            self._condition.notify_all()
+
+    def usage(self) -> dict[str, int]:
+        with self._condition:
+            return {
+                "threads": self._threads_used,
+                "threadBudget": self.threads,
+                "memoryBytes": self._memory_used,
+                "memoryBudgetBytes": self.memory_bytes,
+                "waiting": len(self._waiting),
+            }
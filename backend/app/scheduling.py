@@ -0,0 +1,294 @@
+"""Cost-class and per-client fair scheduling of conversion jobs."""
+
+from __future__ import annotations
+
+import heapq
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Callable
+
+COST_CLASSES = ("small", "medium", "large")
+# Share of dispatches each class gets while several have work waiting.
+CLASS_WEIGHTS = {"small": 4, "medium": 2, "large": 1}
+# Queue-mode head start (seconds) so small jobs are claimed first without
+# starving large ones.
+CLASS_HEAD_START = {"small": 600.0, "medium": 120.0, "large": 0.0}
+
+# Rough conversion throughput in seconds per input byte, for jobs without a
+# probed estimate; refined from finished jobs, as is the probed estimate.
+_DEFAULT_SECONDS_PER_BYTE = {"images": 1e-7, "audio": 2e-7, "video": 1e-6}
+_LEARNING_RATE = 0.2
+
+_MB = 1024 * 1024
+
+
+def cost_class(category: str, input_bytes: int) -> str:
+    """Bucket a job by how long it is likely to hold a slot."""
+
+    if category == "video":
+        return "medium" if input_bytes <= 100 * _MB else "large"
+    if category == "audio":
+        return "small" if input_bytes <= 20 * _MB else "medium"
+    return "small" if input_bytes <= 50 * _MB else "medium"
+
+
+@dataclass
+class _Entry:
+    job_id: str
+    client_id: str
+    category: str
+    input_bytes: int
+    cost_class: str
+    estimate: float
+    predicted: float = 0.0
+    learn: bool = True
+    started_at: float = 0.0
+
+
+@dataclass
+class _ClassQueue:
+    weight: int
+    # Stride-scheduling pass value; the class with the lowest goes next.
+    pass_value: float = 0.0
+    clients: OrderedDict[str, deque[_Entry]] = field(default_factory=OrderedDict)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.clients.values())
+
+
+class JobScheduler:
+    """Decides which queued job gets the next free job slot.
+
+    Jobs are split into cost classes, and classes are served by weighted
+    stride scheduling so small jobs keep flowing while large batches run.
+    Within a class, clients take turns, and a client only gets more than
+    ``per_client_limit`` slots when nobody else is waiting. Large jobs never
+    take the last ``reserved_slots`` slots.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[str], None],
+        submit: Callable[[Callable[[], None]], object],
+        *,
+        slots: int,
+        per_client_limit: int = 0,
+        reserved_slots: int = 1,
+    ) -> None:
+        self._run = run
+        self._submit = submit
+        self.slots = max(1, slots)
+        self.per_client_limit = max(0, per_client_limit)
+        self.reserved_slots = min(max(0, reserved_slots), self.slots - 1)
+        self._lock = threading.Lock()
+        self._classes = {name: _ClassQueue(CLASS_WEIGHTS[name]) for name in COST_CLASSES}
+        self._running: dict[str, _Entry] = {}
+        self._client_running: dict[str, int] = {}
+        self._seconds_per_byte = dict(_DEFAULT_SECONDS_PER_BYTE)
+        # Observed run time over predicted run time, per category.
+        self._correction: dict[str, float] = {}
+
+    def estimate(self, category: str, input_bytes: int, predicted: float = 0.0) -> float:
+        """Expected seconds in a slot, from a probed prediction or the size."""
+
+        if predicted > 0:
+            return max(1.0, predicted * self._correction.get(category, 1.0))
+        rate = self._seconds_per_byte.get(category, _DEFAULT_SECONDS_PER_BYTE["video"])
+        return max(1.0, input_bytes * rate)
+
+    def submit(
+        self,
+        job_id: str,
+        *,
+        client_id: str,
+        category: str,
+        input_bytes: int,
+        predicted: float = 0.0,
+        learn: bool = True,
+    ) -> None:
+        """Queue a job; ``learn=False`` keeps its run time out of the estimates."""
+
+        entry = _Entry(
+            job_id=job_id,
+            client_id=client_id,
+            category=category,
+            input_bytes=input_bytes,
+            cost_class=cost_class(category, input_bytes),
+            estimate=self.estimate(category, input_bytes, predicted),
+            predicted=predicted,
+            learn=learn,
+        )
+        with self._lock:
+            queue = self._classes[entry.cost_class]
+            if not len(queue):
+                # An idle class re-enters at the current virtual time instead
+                # of cashing in the turns it skipped.
+                active = [q.pass_value for q in self._classes.values() if len(q)]
+                queue.pass_value = max(queue.pass_value, min(active, default=0.0))
+            queue.clients.setdefault(client_id, deque()).append(entry)
+        self._dispatch()
+
+    def discard(self, job_id: str) -> bool:
+        """Remove a job that has not started yet; ``False`` if it is not queued."""
+
+        with self._lock:
+            for queue in self._classes.values():
+                for client, entries in queue.clients.items():
+                    for entry in entries:
+                        if entry.job_id == job_id:
+                            entries.remove(entry)
+                            if not entries:
+                                del queue.clients[client]
+                            return True
+        return False
+
+    def _eligible(self, entry: _Entry, *, waiting_clients: set[str]) -> bool:
+        if entry.cost_class == "large" and self.reserved_slots:
+            running_large = sum(1 for item in self._running.values() if item.cost_class == "large")
+            if running_large >= self.slots - self.reserved_slots:
+                return False
+        if not self.per_client_limit:
+            return True
+        if self._client_running.get(entry.client_id, 0) < self.per_client_limit:
+            return True
+        # Work-conserving: the cap only applies while others are waiting.
+        return waiting_clients <= {entry.client_id}
+
+    def _pick(self) -> _Entry | None:
+        waiting_clients = {
+            client
+            for queue in self._classes.values()
+            for client, entries in queue.clients.items()
+            if entries
+        }
+        for queue in sorted(
+            (queue for queue in self._classes.values() if len(queue)),
+            key=lambda queue: queue.pass_value,
+        ):
+            for client, entries in queue.clients.items():
+                if not self._eligible(entries[0], waiting_clients=waiting_clients):
+                    continue
+                entry = entries.popleft()
+                del queue.clients[client]
+                if entries:
+                    # Round-robin: the client moves to the back of the line.
+                    queue.clients[client] = entries
+                queue.pass_value += 1 / queue.weight
+                return entry
+        return None
+
+    def _dispatch(self) -> None:
+        started: list[_Entry] = []
+        with self._lock:
+            while len(self._running) < self.slots:
+                entry = self._pick()
+                if entry is None:
+                    break
+                entry.started_at = time.time()
+                self._running[entry.job_id] = entry
+                self._client_running[entry.client_id] = (
+                    self._client_running.get(entry.client_id, 0) + 1
+                )
+                started.append(entry)
+        for entry in started:
+            self._submit(lambda entry=entry: self._execute(entry))
+
+    def _execute(self, entry: _Entry) -> None:
+        try:
+            self._run(entry.job_id)
+        finally:
+            elapsed = time.time() - entry.started_at
+            with self._lock:
+                self._running.pop(entry.job_id, None)
+                remaining = self._client_running.get(entry.client_id, 1) - 1
+                if remaining:
+                    self._client_running[entry.client_id] = remaining
+                else:
+                    self._client_running.pop(entry.client_id, None)
+                if entry.learn and entry.predicted > 0:
+                    observed = elapsed / entry.predicted
+                    current = self._correction.get(entry.category, 1.0)
+                    self._correction[entry.category] = (
+                        current + _LEARNING_RATE * (observed - current)
+                    )
+                elif entry.learn and entry.input_bytes > 0:
+                    observed = elapsed / entry.input_bytes
+                    current = self._seconds_per_byte.get(entry.category, observed)
+                    self._seconds_per_byte[entry.category] = (
+                        current + _LEARNING_RATE * (observed - current)
+                    )
+            self._dispatch()
+
+    def _planned_order(self) -> list[_Entry]:
+        """Queued entries in the order they would be dispatched right now.
+
+        Per-client caps and the large-job reserve depend on which jobs finish
+        first, so the plan ignores them.
+        """
+
+        classes = {
+            name: (queue.pass_value, [deque(entries) for entries in queue.clients.values()])
+            for name, queue in self._classes.items()
+        }
+        heap = [
+            (pass_value, COST_CLASSES.index(name), name)
+            for name, (pass_value, clients) in classes.items()
+            if any(clients)
+        ]
+        heapq.heapify(heap)
+        order: list[_Entry] = []
+        while heap:
+            pass_value, rank, name = heapq.heappop(heap)
+            clients = classes[name][1]
+            entries = clients.pop(0)
+            order.append(entries.popleft())
+            if entries:
+                clients.append(entries)
+            if clients:
+                heapq.heappush(heap, (pass_value + 1 / CLASS_WEIGHTS[name], rank, name))
+        return order
+
+    def queue_info(self, job_id: str) -> tuple[int, float] | None:
+        """Queue position (1-based) and estimated start time of a queued job."""
+
+        with self._lock:
+            if job_id in self._running:
+                return None
+            order = self._planned_order()
+            now = time.time()
+            free_at = [
+                max(now, entry.started_at + entry.estimate)
+                for entry in self._running.values()
+            ]
+            free_at += [now] * (self.slots - len(free_at))
+        heapq.heapify(free_at)
+        for position, entry in enumerate(order, start=1):
+            start = heapq.heappop(free_at)
+            if entry.job_id == job_id:
+                return position, start
+            heapq.heappush(free_at, start + entry.estimate)
+        return None
+
+    def backlog(self, client_id: str | None = None) -> tuple[int, float]:
+        """Queued jobs (of one client, or overall) and seconds to drain them."""
+
+        with self._lock:
+            entries = [
+                entry
+                for queue in self._classes.values()
+                for client, queued in queue.clients.items()
+                if client_id is None or client == client_id
+                for entry in queued
+            ]
+            slots = self.slots
+            if client_id is not None and self.per_client_limit:
+                slots = min(slots, self.per_client_limit)
+        return len(entries), sum(entry.estimate for entry in entries) / slots
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            counts = {name: len(queue) for name, queue in self._classes.items()}
+            counts["running"] = len(self._running)
+        return counts
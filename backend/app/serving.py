@@ -0,0 +1,216 @@
+"""File responses with HTTP Range, ETag and X-Accel-Redirect support."""
+
+from __future__ import annotations
+
+import os
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+import anyio
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from starlette import status
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 1024 * 1024
+# Job outputs never change once written, and job ids are never reused.
+IMMUTABLE = "private, max-age=31536000, immutable"
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Return the inclusive byte range requested, or ``None`` if invalid.
+
+    Only single ranges are supported; multi-range requests are answered
+    with the full file, which RFC 9110 allows.
+    """
+
+    match = _RANGE_PATTERN.match(header.strip())
+    if match is None:
+        raise ValueError(header)
+    first, last = match.groups()
+    if not first and not last:
+        raise ValueError(header)
+    if not first:
+        length = int(last)
+        if length == 0:
+            return None
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return None
+    return start, end
+
+
+def strong_etag(digest: str) -> str:
+    return f'"{digest}"'
+
+
+def not_modified(request: Request, etag: str | None) -> bool:
+    """Whether ``If-None-Match`` already names ``etag``."""
+
+    header = request.headers.get("if-none-match")
+    if not header or etag is None:
+        return False
+    # If-None-Match compares weakly: a W/ prefix still matches.
+    candidates = (item.strip() for item in header.split(","))
+    return any(item == "*" or item.removeprefix("W/") == etag for item in candidates)
+
+
+def accel_location(path: Path, root: Path, prefix: str) -> str | None:
+    """URI under ``prefix`` that maps to ``path`` in ``root``, for nginx.
+
+    ``None`` if ``path`` lies outside ``root``.
+    """
+
+    try:
+        relative = path.resolve().relative_to(root.resolve())
+    except ValueError:
+        return None
+    return f"{prefix.rstrip('/')}/{quote(relative.as_posix())}"
+
+
+class _FileRangeResponse(Response):
+    """206 response with bytes ``start``-``end`` of ``path`` as its body.
+
+    Sent with the ASGI ``http.response.zerocopysend`` extension (the server
+    ``sendfile``s straight from the file) where the server offers it, and
+    read in chunks off the event loop otherwise.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        start: int,
+        end: int,
+        *,
+        media_type: str | None,
+        headers: dict[str, str],
+    ) -> None:
+        super().__init__(
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=media_type,
+            headers=headers,
+        )
+        self.path = path
+        self.start = start
+        self.count = end - start + 1
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in scope.get("extensions", {}):
+            with self.path.open("rb") as handle:
+                await send(
+                    {
+                        "type": "http.response.zerocopysend",
+                        "file": handle.fileno(),
+                        "offset": self.start,
+                        "count": self.count,
+                        "more_body": False,
+                    }
+                )
+        else:
+            async with await anyio.open_file(self.path, "rb") as handle:
+                await handle.seek(self.start)
+                remaining = self.count
+                while remaining > 0:
+                    chunk = await handle.read(min(CHUNK_SIZE, remaining))
+                    remaining -= len(chunk)
+                    more_body = bool(chunk) and remaining > 0
+                    await send(
+                        {"type": "http.response.body", "body": chunk, "more_body": more_body}
+                    )
+                    if not chunk:
+                        break
+
+
+def file_response(
+    request: Request,
+    path: Path,
+    *,
+    media_type: str | None = None,
+    filename: str | None = None,
+    etag: str | None = None,
+    cache_control: str | None = None,
+    accel_redirect: str | None = None,
+) -> Response:
+    """Serve ``path``, answering ``Range`` requests with 206 Partial Content.
+
+    With ``etag`` a matching ``If-None-Match`` gets 304 and ``If-Range``
+    is honoured. With ``accel_redirect`` the body is left to the reverse
+    proxy, which sends the file itself (``sendfile``, ranges and all).
+    Otherwise the file goes out through :class:`FileResponse`, which hands
+    it to the server with ``http.response.pathsend`` where supported, and
+    ranges through the ``http.response.zerocopysend`` extension.
+    """
+
+    response = FileResponse(path, media_type=media_type, filename=filename)
+    response.headers["Accept-Ranges"] = "bytes"
+    if etag is not None:
+        response.headers["ETag"] = etag
+    if cache_control is not None:
+        response.headers["Cache-Control"] = cache_control
+    validators = {
+        key: value
+        for key, value in response.headers.items()
+        if key.lower() in ("etag", "cache-control")
+    }
+
+    if not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators)
+
+    if accel_redirect is not None:
+        headers = {
+            key: value
+            for key, value in response.headers.items()
+            if key.lower() != "content-length"
+        }
+        headers["X-Accel-Redirect"] = accel_redirect
+        return Response(headers=headers)
+
+    range_header = request.headers.get("range")
+    if not range_header or request.method != "GET":
+        return response
+    if_range = request.headers.get("if-range")
+    if if_range is not None and (etag is None or if_range.strip() != etag):
+        # The client's copy is of a different version (or one we cannot
+        # vouch for); send it the whole file.
+        return response
+
+    size = os.stat(path).st_size
+    try:
+        requested = _parse_range(range_header, size)
+    except ValueError:
+        return response
+    if requested is None:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{size}", "Accept-Ranges": "bytes", **validators},
+        )
+
+    start, end = requested
+    headers = {
+        key: value
+        for key, value in response.headers.items()
+        if key.lower() not in ("content-length", "content-type")
+    }
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return _FileRangeResponse(
+        path,
+        start,
+        end,
+        media_type=response.media_type,
+        headers=headers,
+    )
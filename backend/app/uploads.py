@@ -0,0 +1,542 @@
+"""Streaming ingestion of multipart and resumable uploads."""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any, Awaitable, Callable, Iterator
+
+import multipart
+from anyio import to_thread
+from fastapi import HTTPException, Request
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import parse_options_header
+from starlette import status
+
+from .cache import file_digest
+
+WRITE_BUFFER_BYTES = 1024 * 1024
+MAX_FIELD_BYTES = 64 * 1024
+SESSION_FILENAME = "upload.json"
+CHECKSUM_ALGORITHMS = ("md5", "sha1", "sha256")
+
+_UPLOAD_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+@dataclass
+class UploadedFile:
+    """A file part that has been written to disk."""
+
+    field_name: str
+    filename: str
+    path: Path
+    size: int = 0
+    digest: str = ""
+
+
+@dataclass
+class MultipartUpload:
+    """Form fields and stored files of one multipart request."""
+
+    fields: dict[str, str] = field(default_factory=dict)
+    files: list[UploadedFile] = field(default_factory=list)
+
+
+class _OpenFile:
+    def __init__(self, upload: UploadedFile) -> None:
+        self.upload = upload
+        self.handle: IO[bytes] | None = None
+        self.hasher = hashlib.sha256()
+        self.buffer = bytearray()
+
+    def open(self) -> None:
+        self.handle = self.upload.path.open("wb")
+
+    def flush(self, data: bytes) -> None:
+        assert self.handle is not None
+        self.hasher.update(data)
+        self.handle.write(data)
+
+    def close(self) -> None:
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+def _too_large(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=detail,
+    )
+
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def _unique_path(directory: Path, name: str, taken: set[str]) -> Path:
+    candidate = name
+    index = 1
+    while candidate in taken:
+        candidate = f"{Path(name).stem}_{index}{Path(name).suffix}"
+        index += 1
+    taken.add(candidate)
+    return directory / candidate
+
+
+async def stream_multipart(
+    request: Request,
+    destination: Path,
+    *,
+    max_file_bytes: int = 0,
+    max_request_bytes: int = 0,
+    on_field: Callable[[str, str], None] | None = None,
+    on_file: Callable[[UploadedFile], Awaitable[None]] | None = None,
+) -> MultipartUpload:
+    """Stream a multipart body straight into ``destination``.
+
+    File parts are hashed and written in chunks on worker threads, so the
+    event loop never blocks on disk I/O. Size limits of ``0`` are disabled;
+    otherwise the request is rejected with 413 as soon as a limit is crossed
+    (or up front when ``Content-Length`` already exceeds it). ``on_field`` is
+    called for every form field as soon as it is complete and may raise to
+    abort the upload early; ``on_file`` likewise for every file once it is
+    fully on disk.
+    """
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise _bad_request("Expected a multipart/form-data request")
+    charset = params.get(b"charset", b"utf-8").decode("latin-1")
+
+    content_length = request.headers.get("content-length")
+    if max_request_bytes and content_length and content_length.isdigit():
+        if int(content_length) > max_request_bytes:
+            raise _too_large("Upload exceeds the maximum request size")
+
+    upload = MultipartUpload()
+    taken: set[str] = set()
+    events: list[tuple[str, object]] = []
+    header_name = bytearray()
+    header_value = bytearray()
+    disposition = b""
+
+    def on_part_begin() -> None:
+        nonlocal disposition
+        disposition = b""
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        header_name.extend(data[start:end])
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        header_value.extend(data[start:end])
+
+    def on_header_end() -> None:
+        nonlocal disposition
+        if bytes(header_name).lower() == b"content-disposition":
+            disposition = bytes(header_value)
+        header_name.clear()
+        header_value.clear()
+
+    def on_headers_finished() -> None:
+        _, options = parse_options_header(disposition)
+        if b"name" not in options:
+            raise _bad_request('Multipart part is missing its "name"')
+        name = options[b"name"].decode(charset, errors="replace")
+        if b"filename" in options:
+            filename = options[b"filename"].decode(charset, errors="replace")
+            events.append(("file", (name, filename)))
+        else:
+            events.append(("field", name))
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        events.append(("data", data[start:end]))
+
+    def on_part_end() -> None:
+        events.append(("end", None))
+
+    parser = multipart.MultipartParser(
+        params[b"boundary"],
+        {
+            "on_part_begin": on_part_begin,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+        },
+    )
+
+    current_file: _OpenFile | None = None
+    field_name: str | None = None
+    field_data = bytearray()
+    received = 0
+
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if max_request_bytes and received > max_request_bytes:
+                raise _too_large("Upload exceeds the maximum request size")
+            try:
+                parser.write(chunk)
+            except MultipartParseError as exc:
+                raise _bad_request(f"Malformed multipart body: {exc}") from exc
+
+            for kind, payload in events:
+                if kind == "file":
+                    name, filename = payload  # type: ignore[misc]
+                    index = len(upload.files)
+                    safe_name = Path(filename).name or f"file_{index}"
+                    stored = UploadedFile(
+                        field_name=name,
+                        filename=safe_name,
+                        path=_unique_path(destination, safe_name, taken),
+                    )
+                    current_file = _OpenFile(stored)
+                    await to_thread.run_sync(current_file.open)
+                elif kind == "field":
+                    field_name = payload  # type: ignore[assignment]
+                    field_data.clear()
+                elif kind == "data":
+                    data: bytes = payload  # type: ignore[assignment]
+                    if current_file is not None:
+                        current_file.upload.size += len(data)
+                        if max_file_bytes and current_file.upload.size > max_file_bytes:
+                            raise _too_large(
+                                f"{current_file.upload.filename} exceeds the maximum file size",
+                            )
+                        current_file.buffer.extend(data)
+                        if len(current_file.buffer) >= WRITE_BUFFER_BYTES:
+                            pending = bytes(current_file.buffer)
+                            current_file.buffer.clear()
+                            await to_thread.run_sync(current_file.flush, pending)
+                    else:
+                        field_data.extend(data)
+                        if len(field_data) > MAX_FIELD_BYTES:
+                            raise _too_large("Form field is too large")
+                elif kind == "end":
+                    if current_file is not None:
+                        await to_thread.run_sync(current_file.flush, bytes(current_file.buffer))
+                        await to_thread.run_sync(current_file.close)
+                        current_file.upload.digest = current_file.hasher.hexdigest()
+                        upload.files.append(current_file.upload)
+                        current_file = None
+                        if on_file is not None:
+                            await on_file(upload.files[-1])
+                    elif field_name is not None:
+                        value = field_data.decode(charset, errors="replace")
+                        upload.fields[field_name] = value
+                        if on_field is not None:
+                            on_field(field_name, value)
+                        field_name = None
+            events.clear()
+
+        try:
+            parser.finalize()
+        except MultipartParseError as exc:
+            raise _bad_request(f"Malformed multipart body: {exc}") from exc
+    finally:
+        if current_file is not None:
+            await to_thread.run_sync(current_file.close)
+
+    return upload
+
+
+@dataclass
+class PendingFile:
+    """A file of a resumable upload; complete once its offset reaches ``size``."""
+
+    filename: str
+    path: Path
+    size: int
+
+    @property
+    def offset(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+
+@dataclass
+class UploadSession:
+    """A resumable upload that becomes a job when it is finalized."""
+
+    upload_id: str
+    client_id: str
+    fields: dict[str, str]
+    files: list[PendingFile]
+    created_at: float = field(default_factory=time.time)
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "upload_id": self.upload_id,
+            "client_id": self.client_id,
+            "fields": self.fields,
+            "files": [
+                {"filename": item.filename, "path": str(item.path), "size": item.size}
+                for item in self.files
+            ],
+            "created_at": self.created_at,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict[str, Any]) -> "UploadSession":
+        return cls(
+            upload_id=data["upload_id"],
+            client_id=data["client_id"],
+            fields=data["fields"],
+            files=[
+                PendingFile(item["filename"], Path(item["path"]), item["size"])
+                for item in data["files"]
+            ],
+            created_at=data["created_at"],
+        )
+
+
+def _conflict(detail: str, offset: int | None = None) -> HTTPException:
+    headers = {"Upload-Offset": str(offset)} if offset is not None else None
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail, headers=headers)
+
+
+def _parse_checksum(header: str) -> tuple[str, bytes]:
+    """``Upload-Checksum: <algorithm> <base64 digest>``, as in tus."""
+
+    algorithm, _, encoded = header.strip().partition(" ")
+    algorithm = algorithm.lower()
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise _bad_request(f"Unsupported checksum algorithm '{algorithm}'")
+    try:
+        return algorithm, base64.b64decode(encoded.strip(), validate=True)
+    except binascii.Error as exc:
+        raise _bad_request("Upload-Checksum must be '<algorithm> <base64 digest>'") from exc
+
+
+def _truncate(path: Path, size: int) -> None:
+    os.truncate(path, size)
+
+
+class UploadSessions:
+    """Resumable uploads written chunk by chunk into a job's input directory.
+
+    The bytes already on disk are a file's offset: a chunk must start there,
+    and a dropped chunk keeps what arrived, so a retry only sends the rest.
+    A chunk sent with ``Upload-Checksum`` is all or nothing instead. Sessions
+    are stored as JSON under ``root/<upload id>`` and survive restarts; the
+    SHA-256 the result cache needs is carried from chunk to chunk and only
+    recomputed from disk when that chain was broken (e.g. by a restart).
+
+    Chunks of one file and finalizing are serialized within this process.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._busy: set[tuple[str, int]] = set()
+        self._closing: set[str] = set()
+        self._hashers: dict[tuple[str, int], tuple[int, Any]] = {}
+
+    def _session_path(self, upload_id: str) -> Path:
+        return self.root / upload_id / SESSION_FILENAME
+
+    def _save(self, session: UploadSession) -> None:
+        path = self._session_path(session.upload_id)
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(session.to_json()))
+        temporary.replace(path)
+
+    def create(
+        self,
+        upload_id: str,
+        destination: Path,
+        *,
+        client_id: str,
+        fields: dict[str, str],
+        files: list[tuple[str, int]],
+    ) -> UploadSession:
+        """Start an upload of ``files`` (name and size) into ``destination``."""
+
+        taken: set[str] = set()
+        pending = []
+        for index, (name, size) in enumerate(files):
+            safe_name = Path(name).name or f"file_{index}"
+            path = _unique_path(destination, safe_name, taken)
+            path.touch()
+            pending.append(PendingFile(safe_name, path, size))
+        session = UploadSession(upload_id, client_id, fields, pending)
+        self._save(session)
+        return session
+
+    def get(self, upload_id: str) -> UploadSession | None:
+        if not _UPLOAD_ID.match(upload_id):
+            return None
+        try:
+            data = json.loads(self._session_path(upload_id).read_text())
+        except FileNotFoundError:
+            return None
+        return UploadSession.from_json(data)
+
+    def _pending(self, session: UploadSession, index: int) -> PendingFile:
+        if not 0 <= index < len(session.files):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found in this upload")
+        if session.upload_id in self._closing:
+            raise _conflict("Upload is being finalized")
+        if (session.upload_id, index) in self._busy:
+            raise _conflict("Another chunk of this file is still being written")
+        return session.files[index]
+
+    async def write_chunk(
+        self,
+        request: Request,
+        session: UploadSession,
+        index: int,
+        offset: int,
+        *,
+        checksum: str | None = None,
+    ) -> int:
+        """Append the request body to file ``index`` at ``offset``.
+
+        Returns the file's new offset. A body running past the declared
+        size is rejected with 413 and a checksum mismatch with 400. Bytes
+        received before a failure are kept unless the chunk has a checksum.
+        """
+
+        pending = self._pending(session, index)
+        stored = pending.offset
+        if offset != stored:
+            raise _conflict(f"Chunk starts at {offset} but {stored} bytes are stored", stored)
+        expected = _parse_checksum(checksum) if checksum else None
+
+        key = (session.upload_id, index)
+        # Claimed before the first await, so a second chunk for the same
+        # offset is turned away instead of appending as well.
+        self._busy.add(key)
+        known = self._hashers.pop(key, None)
+        hasher = known[1] if known is not None and known[0] == offset else None
+        if hasher is None and offset == 0:
+            hasher = hashlib.sha256()
+        before = hasher.copy() if hasher is not None and expected else None
+        chunk_hasher = hashlib.new(expected[0]) if expected else None
+        handle: IO[bytes] | None = None
+
+        def flush(data: bytes) -> None:
+            if hasher is not None:
+                hasher.update(data)
+            if chunk_hasher is not None:
+                chunk_hasher.update(data)
+            handle.write(data)  # type: ignore[union-attr]
+
+        buffer = bytearray()
+        started = completed = False
+        try:
+            handle = await to_thread.run_sync(pending.path.open, "ab")
+            # Checked again on the open file: another process may have
+            # appended meanwhile.
+            stored = os.fstat(handle.fileno()).st_size
+            if stored != offset:
+                raise _conflict(f"Chunk starts at {offset} but {stored} bytes are stored", stored)
+            started = True
+            remaining = pending.size - stored
+            async for data in request.stream():
+                remaining -= len(data)
+                if remaining < 0:
+                    raise _too_large("Chunk runs past the declared file size")
+                buffer.extend(data)
+                if len(buffer) >= WRITE_BUFFER_BYTES:
+                    pending_bytes = bytes(buffer)
+                    buffer.clear()
+                    await to_thread.run_sync(flush, pending_bytes)
+            await to_thread.run_sync(flush, bytes(buffer))
+            buffer.clear()
+            if expected is not None and chunk_hasher is not None:
+                if chunk_hasher.digest() != expected[1]:
+                    raise _bad_request("Chunk does not match its Upload-Checksum")
+            completed = True
+        finally:
+            if started and not completed and expected is None:
+                # Keep whatever arrived; the client resumes after it.
+                await to_thread.run_sync(flush, bytes(buffer))
+            if handle is not None:
+                await to_thread.run_sync(handle.close)
+            if started and not completed and expected is not None:
+                await to_thread.run_sync(_truncate, pending.path, offset)
+                hasher = before
+            self._busy.discard(key)
+            new_offset = pending.offset
+            if started and hasher is not None:
+                self._hashers[key] = (new_offset, hasher)
+            elif not started and known is not None:
+                self._hashers[key] = known
+            os.utime(self._session_path(session.upload_id))
+        return new_offset
+
+    async def finalize(self, session: UploadSession) -> list[UploadedFile]:
+        """The finished files of ``session``, hashed, ready to become a job.
+
+        The session stays locked until :meth:`close` or :meth:`reopen`.
+        """
+
+        if session.upload_id in self._closing:
+            raise _conflict("Upload is being finalized")
+        for index, pending in enumerate(session.files):
+            self._pending(session, index)
+            if pending.offset != pending.size:
+                raise _conflict(
+                    f"{pending.filename} has {pending.offset} of {pending.size} bytes",
+                    pending.offset,
+                )
+        self._closing.add(session.upload_id)
+        try:
+            uploaded = []
+            for index, pending in enumerate(session.files):
+                known = self._hashers.get((session.upload_id, index))
+                if known is not None and known[0] == pending.size:
+                    digest = known[1].hexdigest()
+                else:
+                    digest = await to_thread.run_sync(file_digest, pending.path)
+                uploaded.append(
+                    UploadedFile(
+                        field_name="files",
+                        filename=pending.filename,
+                        path=pending.path,
+                        size=pending.size,
+                        digest=digest,
+                    ),
+                )
+        except BaseException:
+            self.reopen(session.upload_id)
+            raise
+        return uploaded
+
+    def reopen(self, upload_id: str) -> None:
+        self._closing.discard(upload_id)
+
+    def close(self, upload_id: str) -> None:
+        """Forget the session; its files stay where they are."""
+
+        self._session_path(upload_id).unlink(missing_ok=True)
+        self._closing.discard(upload_id)
+        for key in [key for key in self._hashers if key[0] == upload_id]:
+            del self._hashers[key]
+
+    def in_use(self, upload_id: str) -> bool:
+        return upload_id in self._closing or any(key[0] == upload_id for key in self._busy)
+
+    def expired(self, cutoff: float) -> Iterator[str]:
+        """Uploads that have not received a chunk since ``cutoff``."""
+
+        for path in self.root.glob(f"*/{SESSION_FILENAME}"):
+            upload_id = path.parent.name
+            try:
+                idle = path.stat().st_mtime < cutoff
+            except FileNotFoundError:
+                continue
+            if idle and not self.in_use(upload_id):
+                yield upload_id
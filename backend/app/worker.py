@@ -0,0 +1,148 @@
+"""Standalone conversion worker (``converti-worker`` or ``python -m app.worker``).
+
+Pulls jobs from the shared queue, converts them with the same pipeline the
+API uses in local mode and writes progress to the shared job store. Run as
+many workers as the workload needs on the API's host: the SQLite queue and
+job store run in WAL mode, which needs shared memory on one machine and is
+not safe on network filesystems. Spreading workers over several machines
+needs a network-safe :class:`~app.job_queue.JobQueue` and job store.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import signal
+import threading
+
+from .config import settings
+from .jobs import JobStatus
+from .job_queue import JobQueue, Lease
+from .processing import job_manager, job_queue, process_job, shutdown
+
+logger = logging.getLogger("converti")
+
+RETRY_DELAY_SECONDS = 30.0
+
+
+class Worker:
+    """Runs up to ``concurrency`` queued jobs at a time until stopped."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        *,
+        concurrency: int,
+        poll_interval: float,
+        max_attempts: int,
+    ) -> None:
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = max(0.1, poll_interval)
+        self.max_attempts = max(1, max_attempts)
+        self._stopping = threading.Event()
+
+    def run(self) -> None:
+        threads = [
+            threading.Thread(target=self._loop, name=f"converti-worker-{slot}")
+            for slot in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def stop(self) -> None:
+        """Stop claiming new jobs; jobs already running are finished first."""
+
+        self._stopping.set()
+
+    def _loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                lease = self.queue.claim()
+            except Exception:
+                logger.exception("Could not claim a job from the queue")
+                lease = None
+            if lease is None:
+                self._stopping.wait(self.poll_interval)
+                continue
+            self._handle(lease)
+
+    def _handle(self, lease: Lease) -> None:
+        if lease.attempts > self.max_attempts:
+            logger.error("Job %s failed after %d attempts", lease.job_id, lease.attempts - 1)
+            if job_manager.get_status(lease.job_id) is not None:
+                job_manager.update_job(
+                    lease.job_id,
+                    status=JobStatus.FAILED,
+                    error="Conversion worker crashed repeatedly",
+                )
+            self.queue.ack(lease)
+            return
+
+        if lease.attempts > 1:
+            logger.info("Retrying job %s (attempt %d)", lease.job_id, lease.attempts)
+            job_manager.requeue_interrupted(lease.job_id)
+
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat,
+            args=(lease, done),
+            name=f"converti-lease-{lease.job_id}",
+            daemon=True,
+        )
+        heartbeat.start()
+        try:
+            process_job(lease.job_id)
+        except Exception:
+            logger.exception("Processing job %s crashed", lease.job_id)
+            self.queue.release(lease, delay=RETRY_DELAY_SECONDS)
+        else:
+            self.queue.ack(lease)
+        finally:
+            done.set()
+            heartbeat.join()
+
+    def _heartbeat(self, lease: Lease, done: threading.Event) -> None:
+        interval = self.queue.visibility_timeout / 3
+        while not done.wait(interval):
+            if not self.queue.extend(lease):
+                logger.warning("Lost the lease on job %s", lease.job_id)
+                return
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="converti-worker", description=__doc__)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.max_concurrent_jobs,
+        help="jobs processed at the same time (default: CONVERTI_MAX_CONCURRENT_JOBS)",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    if job_queue is None:
+        parser.error("set CONVERTI_EXECUTION_MODE=queue to run standalone workers")
+
+    worker = Worker(
+        job_queue,
+        concurrency=args.concurrency,
+        poll_interval=settings.queue_poll_interval,
+        max_attempts=settings.queue_max_attempts,
+    )
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: worker.stop())
+    logger.info("Worker started with %d slot(s)", worker.concurrency)
+    try:
+        worker.run()
+    finally:
+        shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,523 @@
+"""Shared worker budget and execution backends for per-file conversions."""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import uuid
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    CancelledError,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Mapping, Protocol, Sequence, TypeVar
+
+from .converters import configure_images, convert_file, convert_outputs, image_limits, observe_conversion
+from .converters.base import ConversionError, ConversionOutput, ConversionStopped, ProgressCallback
+from .converters.ffmpeg import ProcessGroup, current_process_group, process_group
+
+logger = logging.getLogger("converti")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Seconds a stopped ffmpeg gets to exit on SIGTERM before it is killed.
+KILL_GRACE_SECONDS = 5.0
+
+
+class WorkerBudget:
+    """Pool of conversion workers shared by every running job.
+
+    Each job may keep at most ``max_workers // active_jobs`` files in flight,
+    so a single large batch can use every core while it runs alone but has to
+    make room as soon as other jobs start.
+    """
+
+    def __init__(self, max_workers: int) -> None:
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="converti-file",
+        )
+        self._lock = threading.Lock()
+        self._active_jobs: set[str] = set()
+        self._in_flight = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"activeJobs": len(self._active_jobs), "inFlight": self._in_flight}
+
+    def _finished(self, _: Future[Any]) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def fair_share(self) -> int:
+        with self._lock:
+            active = max(1, len(self._active_jobs))
+        return max(1, self.max_workers // active)
+
+    def run(
+        self,
+        job_id: str,
+        items: Iterable[T],
+        task: Callable[[T], R],
+        *,
+        should_stop: Callable[[], bool],
+    ) -> Iterator[Future[R]]:
+        """Run ``task`` for each item and yield futures as they complete.
+
+        No new items are submitted once ``should_stop`` returns true; items
+        already running are allowed to finish and are still yielded.
+        """
+
+        pending = iter(items)
+        in_flight: set[Future[R]] = set()
+        exhausted = False
+        with self._lock:
+            self._active_jobs.add(job_id)
+        try:
+            while True:
+                while not exhausted and len(in_flight) < self.fair_share():
+                    if should_stop():
+                        exhausted = True
+                        break
+                    try:
+                        item = next(pending)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    future = self._executor.submit(task, item)
+                    with self._lock:
+                        self._in_flight += 1
+                    future.add_done_callback(self._finished)
+                    in_flight.add(future)
+                if not in_flight:
+                    return
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                yield from done
+        finally:
+            with self._lock:
+                self._active_jobs.discard(job_id)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+@dataclass(eq=False)
+class _Watched:
+    job_id: str
+    group: ProcessGroup
+    started_at: float
+    stopped_at: float | None = None
+
+
+class ConversionWatchdog:
+    """Stops conversions that were cancelled or have run for too long.
+
+    Conversions run inside :meth:`watch`, which collects their ffmpeg
+    processes. A background thread checks every ``interval`` seconds, so a
+    cancellation made by another process (queue mode) is noticed as well;
+    :meth:`cancel` stops a job's conversions at once. Image conversions in
+    the calling thread cannot be interrupted and only stop between files;
+    :class:`ProcessPoolBackend` kills the worker running them instead.
+    """
+
+    def __init__(
+        self,
+        is_cancelled: Callable[[str], bool],
+        *,
+        timeout: float = 0.0,
+        interval: float = 1.0,
+    ) -> None:
+        self.timeout = max(0.0, timeout)
+        self.interval = max(0.1, interval)
+        self._is_cancelled = is_cancelled
+        self._lock = threading.Lock()
+        self._watched: list[_Watched] = []
+        self._thread: threading.Thread | None = None
+        self._stopping = threading.Event()
+
+    @contextmanager
+    def watch(self, job_id: str) -> Iterator[ProcessGroup]:
+        entry = _Watched(job_id, ProcessGroup(), time.monotonic())
+        with self._lock:
+            self._watched.append(entry)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="converti-watchdog",
+                    daemon=True,
+                )
+                self._thread.start()
+        try:
+            with process_group(entry.group):
+                yield entry.group
+        finally:
+            with self._lock:
+                self._watched.remove(entry)
+
+    def cancel(self, job_id: str) -> None:
+        with self._lock:
+            entries = [entry for entry in self._watched if entry.job_id == job_id]
+        for entry in entries:
+            self._stop(entry, "Cancelled")
+
+    def _stop(self, entry: _Watched, reason: str) -> None:
+        if entry.stopped_at is None:
+            entry.stopped_at = time.monotonic()
+        entry.group.stop(reason)
+
+    def check(self) -> None:
+        """Stop what is due; ffmpeg that ignored SIGTERM is killed."""
+
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._watched)
+        cancelled: dict[str, bool] = {}
+        for entry in entries:
+            if entry.stopped_at is not None:
+                if now - entry.stopped_at >= KILL_GRACE_SECONDS:
+                    entry.group.kill()
+                continue
+            if entry.job_id not in cancelled:
+                cancelled[entry.job_id] = self._is_cancelled(entry.job_id)
+            if cancelled[entry.job_id]:
+                self._stop(entry, "Cancelled")
+            elif self.timeout and now - entry.started_at >= self.timeout:
+                self._stop(entry, f"Timed out after {self.timeout:g} seconds")
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            try:
+                self.check()
+            except Exception:  # pragma: no cover - keep watching
+                logger.exception("Conversion watchdog check failed")
+
+    def shutdown(self) -> None:
+        self._stopping.set()
+
+
+class ConversionBackend(Protocol):
+    """Runs a single file conversion on behalf of a worker thread."""
+
+    def convert(
+        self,
+        category: str,
+        source: Path,
+        target: Path,
+        target_format: str,
+        *,
+        options: Mapping[str, Any] | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> Path:
+        ...
+
+    def convert_many(
+        self,
+        category: str,
+        source: Path,
+        outputs: Sequence[ConversionOutput],
+        *,
+        progress: ProgressCallback | None = None,
+    ) -> list[ConversionError | None]:
+        ...
+
+    def shutdown(self) -> None:
+        ...
+
+
+class InlineBackend:
+    """Convert in the calling worker thread."""
+
+    def convert(
+        self,
+        category: str,
+        source: Path,
+        target: Path,
+        target_format: str,
+        *,
+        options: Mapping[str, Any] | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> Path:
+        return convert_file(
+            category,
+            source,
+            target,
+            target_format,
+            options=options,
+            progress=progress,
+        )
+
+    def convert_many(
+        self,
+        category: str,
+        source: Path,
+        outputs: Sequence[ConversionOutput],
+        *,
+        progress: ProgressCallback | None = None,
+    ) -> list[ConversionError | None]:
+        return convert_outputs(category, source, outputs, progress=progress)
+
+    def shutdown(self) -> None:
+        return None
+
+
+# Set in pool workers: where they announce which task they are running.
+_task_started: Any = None
+
+
+def _warm_worker(memory_limit_bytes: int, limits: Mapping[str, int], started: Any) -> None:
+    global _task_started
+    _task_started = started
+    if memory_limit_bytes > 0:
+        try:
+            import resource
+        except ImportError:  # pragma: no cover - non-POSIX platforms
+            pass
+        else:
+            resource.setrlimit(
+                resource.RLIMIT_AS,
+                (memory_limit_bytes, memory_limit_bytes),
+            )
+
+    from PIL import Image
+
+    Image.init()
+    configure_images(**limits)
+
+
+def _announce(task_id: str) -> None:
+    if _task_started is not None:
+        _task_started.put((task_id, os.getpid()))
+
+
+def _convert_in_worker(
+    task_id: str,
+    category: str,
+    source: Path,
+    target: Path,
+    target_format: str,
+    options: Mapping[str, Any] | None,
+) -> Path:
+    _announce(task_id)
+    try:
+        return convert_file(category, source, target, target_format, options=options)
+    except MemoryError as exc:
+        raise ConversionError(
+            f"{source.name} exceeds the worker memory limit",
+        ) from exc
+
+
+def _convert_many_in_worker(
+    task_id: str,
+    category: str,
+    source: Path,
+    outputs: list[ConversionOutput],
+) -> list[ConversionError | None]:
+    _announce(task_id)
+    try:
+        return convert_outputs(category, source, outputs)
+    except MemoryError as exc:
+        raise ConversionError(
+            f"{source.name} exceeds the worker memory limit",
+        ) from exc
+
+
+class _PoolTask:
+    """Stands in for a process in a :class:`ProcessGroup`.
+
+    Stopping it cancels the task if it has not started yet, otherwise it
+    signals the pool worker running it.
+    """
+
+    def __init__(
+        self,
+        backend: ProcessPoolBackend,
+        pool: ProcessPoolExecutor,
+        task_id: str,
+        future: Future[Any],
+    ) -> None:
+        self._backend = backend
+        self._pool = pool
+        self._task_id = task_id
+        self._future = future
+
+    def terminate(self) -> None:
+        self._signal(signal.SIGTERM)
+
+    def kill(self) -> None:
+        self._signal(signal.SIGKILL)
+
+    def _signal(self, signum: int) -> None:
+        if self._future.done() or self._future.cancel():
+            return
+        # Not announced yet: the watchdog kills again after the grace period.
+        pid = self._backend._worker_pid(self._task_id)
+        if pid is None:
+            return
+        self._backend._sacrifice(self._pool)
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+class ProcessPoolBackend:
+    """Convert in warm worker processes, outside the API's GIL.
+
+    Workers are replaced after ``max_tasks_per_child`` conversions so memory
+    fragmentation from very large images does not accumulate, and a worker
+    killed mid-conversion only fails the file it was working on.
+
+    Conversions take part in the :class:`ConversionWatchdog` through the
+    process group of the calling thread: when one is cancelled or times
+    out, the worker running it is killed. That breaks the whole pool, so it
+    is replaced and the other conversions it was running are retried once.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        *,
+        max_tasks_per_child: int,
+        memory_limit_mb: int,
+    ) -> None:
+        self._max_workers = max(1, max_workers)
+        self._max_tasks_per_child = max_tasks_per_child if max_tasks_per_child > 0 else None
+        self._memory_limit_bytes = max(0, memory_limit_mb) * 1024 * 1024
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._worker_pids: dict[str, int] = {}
+        # Pools broken on purpose to stop a conversion.
+        self._sacrificed: set[ProcessPoolExecutor] = set()
+        self._pool, self._started = self._create_pool()
+
+    def _create_pool(self) -> tuple[ProcessPoolExecutor, Any]:
+        started = self._context.SimpleQueue()
+        pool = ProcessPoolExecutor(
+            max_workers=self._max_workers,
+            mp_context=self._context,
+            initializer=_warm_worker,
+            initargs=(self._memory_limit_bytes, image_limits(), started),
+            max_tasks_per_child=self._max_tasks_per_child,
+        )
+        return pool, started
+
+    def convert(
+        self,
+        category: str,
+        source: Path,
+        target: Path,
+        target_format: str,
+        *,
+        options: Mapping[str, Any] | None = None,
+        progress: ProgressCallback | None = None,
+    ) -> Path:
+        # Callbacks cannot cross the process boundary; the caller marks the
+        # file complete once the worker returns.
+        # Workers have no observers of their own; time them from here.
+        with observe_conversion(category, source, target, target_format):
+            return self._run(
+                source,
+                _convert_in_worker,
+                category,
+                source,
+                target,
+                target_format,
+                dict(options or {}),
+            )
+
+    def convert_many(
+        self,
+        category: str,
+        source: Path,
+        outputs: Sequence[ConversionOutput],
+        *,
+        progress: ProgressCallback | None = None,
+    ) -> list[ConversionError | None]:
+        targets = [output.target for output in outputs]
+        formats = [output.target_format for output in outputs]
+        with observe_conversion(category, source, targets, formats):
+            return self._run(
+                source,
+                _convert_many_in_worker,
+                category,
+                source,
+                [replace(output, options=dict(output.options)) for output in outputs],
+            )
+
+    def _run(self, source: Path, fn: Callable[..., R], *args: Any) -> R:
+        group = current_process_group()
+        for attempt in range(2):
+            with self._lock:
+                pool = self._pool
+            task_id = uuid.uuid4().hex
+            task: _PoolTask | None = None
+            try:
+                future = pool.submit(fn, task_id, *args)
+                task = _PoolTask(self, pool, task_id, future)
+                if group is not None:
+                    group.add(task)
+                return future.result()
+            except CancelledError:
+                # Only a stopped group cancels tasks that have not started.
+                if group is not None:
+                    group.check()
+                raise ConversionStopped("Cancelled") from None
+            except BrokenProcessPool as exc:
+                with self._lock:
+                    sacrificed = pool in self._sacrificed
+                self._replace_pool(pool)
+                if group is not None:
+                    group.check()
+                if sacrificed and attempt == 0:
+                    continue
+                raise ConversionError(
+                    f"Worker process died while converting {source.name}",
+                ) from exc
+            finally:
+                if group is not None and task is not None:
+                    group.discard(task)
+                with self._lock:
+                    self._drain_started()
+                    self._worker_pids.pop(task_id, None)
+        raise AssertionError("unreachable")
+
+    def _drain_started(self) -> None:
+        while not self._started.empty():
+            task_id, pid = self._started.get()
+            self._worker_pids[task_id] = pid
+
+    def _worker_pid(self, task_id: str) -> int | None:
+        with self._lock:
+            self._drain_started()
+            return self._worker_pids.get(task_id)
+
+    def _sacrifice(self, pool: ProcessPoolExecutor) -> None:
+        with self._lock:
+            self._sacrificed.add(pool)
+
+    def _replace_pool(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._pool is not broken:
+                return
+            logger.warning("Image worker pool broke; starting a new one")
+            self._pool, self._started = self._create_pool()
+            self._sacrificed.discard(broken)
+            self._worker_pids.clear()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._pool.shutdown(wait=False, cancel_futures=True)
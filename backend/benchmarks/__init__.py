@@ -0,0 +1 @@
+"""Performance benchmarks for the converters and the job pipeline."""
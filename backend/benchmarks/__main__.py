@@ -0,0 +1,188 @@
+"""Benchmark converters and the HTTP job pipeline.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks --output baseline.json
+    python -m benchmarks --compare baseline.json
+
+Inputs are generated on the fly (Pillow images, ffmpeg test sources), so
+runs are reproducible on any machine with the backend's dependencies.
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from .inputs import IMAGE_SIZES, BenchmarkInput, image_inputs, media_inputs
+from .runner import BenchmarkResult, compare, measure
+
+# Targets that only differ from another target by name.
+_ALIASES = {"jpg"}
+
+
+Benchmarks = dict[str, tuple[Callable[[], None], int]]
+
+
+def _converter_benchmarks(inputs: list[BenchmarkInput], work: Path) -> Benchmarks:
+    from app.converters import SUPPORTED_TARGETS, convert_file
+
+    tasks: Benchmarks = {}
+    for item in inputs:
+        for target in SUPPORTED_TARGETS[item.category]:
+            if target in _ALIASES:
+                continue
+            output = work / f"{item.name}.{target}"
+
+            def task(item: BenchmarkInput = item, target: str = target, output: Path = output) -> None:
+                convert_file(item.category, item.path, output, target)
+
+            tasks[f"convert/{item.category}/{item.name}->{target}"] = (task, item.size)
+    return tasks
+
+
+def _pipeline_benchmarks(inputs: list[BenchmarkInput]) -> Benchmarks:
+    """Upload, convert and download through the ASGI app, in-process."""
+
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    client = TestClient(app)
+    client.__enter__()
+    atexit.register(client.__exit__, None, None, None)
+
+    def run_job(category: str, target: str, files: list[BenchmarkInput]) -> None:
+        payload = [("files", (item.path.name, item.path.read_bytes())) for item in files]
+        response = client.post(
+            "/api/convert",
+            data={"category": category, "target_format": target},
+            files=payload,
+        )
+        response.raise_for_status()
+        job_id = response.json()["jobId"]
+        while True:
+            job = client.get(f"/api/jobs/{job_id}").json()
+            if job["status"] in ("completed", "failed", "cancelled"):
+                break
+            time.sleep(0.01)
+        if job["status"] != "completed":
+            raise RuntimeError(f"job {job_id} ended as {job['status']}: {job['error']}")
+        archive = client.get(f"/api/jobs/{job_id}/download")
+        archive.raise_for_status()
+        client.delete(f"/api/jobs/{job_id}")
+
+    by_category: dict[str, list[BenchmarkInput]] = {}
+    for item in inputs:
+        by_category.setdefault(item.category, []).append(item)
+
+    def job(category: str, target: str, files: list[BenchmarkInput]) -> tuple[Callable[[], None], int]:
+        return (lambda: run_job(category, target, files), sum(item.size for item in files))
+
+    tasks: Benchmarks = {}
+    images = [item for item in by_category.get("images", []) if item.name.endswith("-png")]
+    if images:
+        tasks[f"pipeline/images-{len(images)}x-png->webp"] = job("images", "webp", images)
+    if by_category.get("audio"):
+        tasks["pipeline/audio->mp3"] = job("audio", "mp3", by_category["audio"])
+    if by_category.get("video"):
+        tasks["pipeline/video->webm"] = job("video", "webm", by_category["video"][:1])
+    return tasks
+
+
+def _metadata() -> dict[str, Any]:
+    return {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("--iterations", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per benchmark")
+    parser.add_argument("--quick", action="store_true", help="small inputs and short media only")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--skip-pipeline", action="store_true", help="only benchmark converters")
+    parser.add_argument("--output", type=Path, help="write results as JSON to this file")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="allowed slowdown against the baseline, as a fraction (default 0.10)",
+    )
+    args = parser.parse_args(argv)
+
+    work = Path(tempfile.mkdtemp(prefix="converti-bench-"))
+    atexit.register(shutil.rmtree, work, ignore_errors=True)
+    # The pipeline must do real work on every iteration, and needs somewhere
+    # to keep its jobs; set before app.main reads its settings.
+    os.environ["CONVERTI_JOB_STORAGE_DIR"] = str(work / "jobs")
+    os.environ["CONVERTI_RESULT_CACHE_MAX_MB"] = "0"
+    os.environ.setdefault("CONVERTI_JOB_RETENTION_DAYS", "0")
+
+    sources = work / "sources"
+    sources.mkdir()
+    sizes = {"small": IMAGE_SIZES["small"]} if args.quick else IMAGE_SIZES
+    inputs = image_inputs(sources, sizes=sizes) + media_inputs(sources, seconds=2 if args.quick else 5)
+    outputs = work / "outputs"
+    outputs.mkdir()
+
+    tasks = _converter_benchmarks(inputs, outputs)
+    if not args.skip_pipeline:
+        tasks.update(_pipeline_benchmarks(inputs))
+    results: dict[str, dict[str, Any]] = {}
+    for name, (task, input_bytes) in tasks.items():
+        if args.filter and args.filter not in name:
+            continue
+        try:
+            result: BenchmarkResult = measure(
+                task,
+                iterations=args.iterations,
+                warmup=args.warmup,
+                input_bytes=input_bytes,
+            )
+        except Exception as exc:
+            results[name] = {"error": str(exc)}
+            print(f"{name:56} failed: {exc}", file=sys.stderr)
+            continue
+        results[name] = result.to_json()
+        print(
+            f"{name:56} p50 {result.p50 * 1000:9.1f}ms  p95 {result.p95 * 1000:9.1f}ms  "
+            f"{result.throughput_per_second:8.2f}/s",
+            file=sys.stderr,
+        )
+
+    report = {"meta": _metadata(), "benchmarks": results}
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())["benchmarks"]
+        succeeded = {name: value for name, value in results.items() if "error" not in value}
+        usable = {name: value for name, value in baseline.items() if "error" not in value}
+        lines, regressions = compare(usable, succeeded, threshold=args.threshold)
+        print("\n".join(lines), file=sys.stderr)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
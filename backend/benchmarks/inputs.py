@@ -0,0 +1,100 @@
+"""Synthetic benchmark inputs generated on the fly."""
+
+from __future__ import annotations
+
+import shutil
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+IMAGE_SIZES = {
+    "small": (640, 480),
+    "medium": (1920, 1080),
+    "large": (4000, 3000),
+}
+IMAGE_MODES = ("RGB", "RGBA", "L")
+
+
+@dataclass(frozen=True)
+class BenchmarkInput:
+    """One generated source file."""
+
+    name: str
+    category: str
+    path: Path
+
+    @property
+    def size(self) -> int:
+        return self.path.stat().st_size
+
+
+def _image(mode: str, size: tuple[int, int]) -> Image.Image:
+    # Gradients plus shapes compress like photos/screenshots rather than
+    # like a flat colour, which would make every encoder look instant.
+    width, height = size
+    gradient = Image.linear_gradient("L").resize(size)
+    image = Image.merge(
+        "RGB",
+        (gradient, gradient.transpose(Image.Transpose.ROTATE_90).resize(size), gradient.rotate(45)),
+    )
+    draw = ImageDraw.Draw(image)
+    for step in range(0, min(width, height) // 2, max(1, min(width, height) // 20)):
+        draw.ellipse((step, step, width - step, height - step), outline=(step % 256, 80, 160))
+    if mode == "RGBA":
+        image = image.convert("RGBA")
+        image.putalpha(gradient)
+        return image
+    return image.convert(mode)
+
+
+def image_inputs(directory: Path, *, sizes: dict[str, tuple[int, int]]) -> list[BenchmarkInput]:
+    inputs = []
+    for label, size in sizes.items():
+        for mode in IMAGE_MODES:
+            image = _image(mode, size)
+            formats = ["png"] if mode == "RGBA" else ["png", "jpeg"]
+            for fmt in formats:
+                path = directory / f"{label}_{mode.lower()}.{fmt}"
+                image.save(path, fmt.upper())
+                inputs.append(BenchmarkInput(f"{label}-{mode.lower()}-{fmt}", "images", path))
+    return inputs
+
+
+def _lavfi(ffmpeg: str, output: Path, *sources: str, extra: tuple[str, ...] = ()) -> None:
+    command = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y"]
+    for source in sources:
+        command += ["-f", "lavfi", "-i", source]
+    subprocess.run([*command, *extra, str(output)], check=True)
+
+
+def media_inputs(directory: Path, *, seconds: int) -> list[BenchmarkInput]:
+    """Audio and video sources from ffmpeg's test generators, if available."""
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return []
+    audio = directory / "tone.wav"
+    _lavfi(ffmpeg, audio, f"sine=frequency=440:sample_rate=48000:duration={seconds}")
+    video_sd = directory / "testsrc_480p.mp4"
+    _lavfi(
+        ffmpeg,
+        video_sd,
+        f"testsrc2=size=854x480:rate=30:duration={seconds}",
+        f"sine=frequency=440:duration={seconds}",
+        extra=("-shortest", "-pix_fmt", "yuv420p"),
+    )
+    video_hd = directory / "testsrc_1080p.mkv"
+    _lavfi(
+        ffmpeg,
+        video_hd,
+        f"testsrc2=size=1920x1080:rate=30:duration={seconds}",
+        f"sine=frequency=440:duration={seconds}",
+        extra=("-shortest", "-pix_fmt", "yuv420p", "-c:v", "mpeg4", "-q:v", "3"),
+    )
+    return [
+        BenchmarkInput("tone-wav", "audio", audio),
+        BenchmarkInput("testsrc-480p-mp4", "video", video_sd),
+        BenchmarkInput("testsrc-1080p-mkv", "video", video_hd),
+    ]
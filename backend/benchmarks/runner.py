@@ -0,0 +1,200 @@
+"""Timing, statistics and memory sampling for the benchmarks."""
+
+from __future__ import annotations
+
+import os
+import resource
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    """Linearly interpolated percentile of ``samples`` (``fraction`` in 0..1)."""
+
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _current_rss() -> int | None:
+    try:
+        with open("/proc/self/statm", "rb") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _max_rss(who: int) -> int:
+    value = resource.getrusage(who).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return value if sys.platform == "darwin" else value * 1024
+
+
+def _child_pids() -> list[int]:
+    parent = os.getpid()
+    pids = []
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat", "rb") as stat:
+                # Fields after the command name, which may contain spaces:
+                # state, then the parent pid.
+                fields = stat.read().rsplit(b")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == parent:
+            pids.append(int(entry.name))
+    return pids
+
+
+def _peak_rss_of(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status", "rb") as status:
+            for line in status:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+class RssSampler:
+    """Peak resident set size of this process while the sampler runs.
+
+    Falls back to the lifetime high-water mark where ``/proc`` is missing.
+    ffmpeg runs as a child process, so its peak is reported separately as
+    ``child_peak``: the largest ``VmHWM`` of the children seen while
+    sampling, or the children's lifetime maximum if it rose meanwhile,
+    which only a child of this run can have done.
+    """
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.peak = 0
+        self.child_peak = 0
+        self._children_before = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while True:
+            rss = _current_rss()
+            if rss is None:
+                return
+            self.peak = max(self.peak, rss)
+            for pid in _child_pids():
+                self.child_peak = max(self.child_peak, _peak_rss_of(pid))
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self) -> "RssSampler":
+        self._children_before = _max_rss(resource.RUSAGE_CHILDREN)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._stop.set()
+        self._thread.join()
+        if self.peak == 0:
+            self.peak = _max_rss(resource.RUSAGE_SELF)
+        children = _max_rss(resource.RUSAGE_CHILDREN)
+        if children > self._children_before:
+            self.child_peak = max(self.child_peak, children)
+
+
+@dataclass
+class BenchmarkResult:
+    """Summary of one benchmark; latencies are in seconds."""
+
+    iterations: int
+    bytes_per_iteration: int
+    throughput_per_second: float
+    bytes_per_second: float
+    mean: float
+    p50: float
+    p95: float
+    p99: float
+    peak_rss_bytes: int
+    peak_child_rss_bytes: int
+
+    def to_json(self) -> dict[str, float | int]:
+        return asdict(self)
+
+
+def measure(
+    task: Callable[[], None],
+    *,
+    iterations: int,
+    warmup: int = 1,
+    input_bytes: int = 0,
+) -> BenchmarkResult:
+    """Run ``task`` ``warmup`` times untimed, then ``iterations`` times timed."""
+
+    for _ in range(warmup):
+        task()
+    latencies: list[float] = []
+    with RssSampler() as sampler:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            begin = time.perf_counter()
+            task()
+            latencies.append(time.perf_counter() - begin)
+        elapsed = time.perf_counter() - started
+    return BenchmarkResult(
+        iterations=iterations,
+        bytes_per_iteration=input_bytes,
+        throughput_per_second=iterations / elapsed if elapsed else 0.0,
+        bytes_per_second=input_bytes * iterations / elapsed if elapsed else 0.0,
+        mean=sum(latencies) / len(latencies),
+        p50=percentile(latencies, 0.50),
+        p95=percentile(latencies, 0.95),
+        p99=percentile(latencies, 0.99),
+        peak_rss_bytes=sampler.peak,
+        peak_child_rss_bytes=sampler.child_peak,
+    )
+
+
+def compare(
+    baseline: dict[str, dict[str, float]],
+    current: dict[str, dict[str, float]],
+    *,
+    threshold: float,
+) -> tuple[list[str], list[str]]:
+    """Return a report and the names of benchmarks that regressed.
+
+    A benchmark regresses when its median latency grows, or its throughput
+    drops, by more than ``threshold`` (a fraction) against the baseline.
+    """
+
+    lines = [f"{'benchmark':48} {'p50 base':>10} {'p50 now':>10} {'change':>8}"]
+    regressions = []
+    for name in sorted(current):
+        if name not in baseline:
+            lines.append(f"{name:48} {'-':>10} {current[name]['p50'] * 1000:>8.1f}ms {'new':>8}")
+            continue
+        before, after = baseline[name], current[name]
+        change = after["p50"] / before["p50"] - 1 if before["p50"] else 0.0
+        slower = change > threshold
+        if before["throughput_per_second"]:
+            drop = 1 - after["throughput_per_second"] / before["throughput_per_second"]
+            slower = slower or drop > threshold
+        marker = "  REGRESSED" if slower else ""
+        lines.append(
+            f"{name:48} {before['p50'] * 1000:>8.1f}ms {after['p50'] * 1000:>8.1f}ms "
+            f"{change:>+7.1%}{marker}",
+        )
+        if slower:
+            regressions.append(name)
+    for name in sorted(set(baseline) - set(current)):
+        lines.append(f"{name:48} {'(not run)':>10}")
+    return lines, regressions
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Settings are read when the app is imported; keep jobs out of the tree.
+os.environ.setdefault("CONVERTI_JOB_STORAGE_DIR", tempfile.mkdtemp(prefix="converti-tests-"))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,50 @@
+from pathlib import Path
+
+from app.cache import ResultCache
+
+
+def _produce(directory: Path, name: str, size: int) -> Path:
+    path = directory / name
+    path.write_bytes(name.encode()[:1] * size)
+    return path
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=250)
+    for name in ("a", "b"):
+        cache.store(name * 64, _produce(tmp_path, name, 100))
+    assert cache.fetch("a" * 64, tmp_path / "a-copy")
+
+    cache.store("c" * 64, _produce(tmp_path, "c", 100))
+
+    assert cache.fetch("a" * 64, tmp_path / "a-again")
+    assert not cache.fetch("b" * 64, tmp_path / "b-copy")
+    assert cache.stats()["bytes"] == 200
+    assert cache.stats()["evictions"] == 1
+
+
+def test_processes_sharing_a_directory_share_one_budget(tmp_path):
+    directory = tmp_path / "cache"
+    api = ResultCache(directory, max_bytes=250)
+    worker = ResultCache(directory, max_bytes=250)
+    api.store("a" * 64, _produce(tmp_path, "a", 100))
+    worker.store("b" * 64, _produce(tmp_path, "b", 100))
+    worker.store("c" * 64, _produce(tmp_path, "c", 100))
+
+    assert api.stats()["bytes"] == 200
+    assert not api.fetch("a" * 64, tmp_path / "a-copy")
+    assert api.fetch("c" * 64, tmp_path / "c-copy")
+    assert sum(1 for path in directory.glob("??/*") if path.is_file()) == 2
+
+
+def test_a_smaller_budget_is_enforced_on_restart(tmp_path):
+    directory = tmp_path / "cache"
+    cache = ResultCache(directory, max_bytes=1000)
+    for name in ("a", "b", "c"):
+        cache.store(name * 64, _produce(tmp_path, name, 100))
+
+    restarted = ResultCache(directory, max_bytes=150)
+
+    stats = restarted.stats()
+    assert (stats["entries"], stats["bytes"]) == (1, 100)
+    assert restarted.fetch("c" * 64, tmp_path / "c-copy")
@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import io
+
+import httpx
+from PIL import Image
+
+from app.main import app
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.effect_noise((64, 64), 40).convert("RGB").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+async def _converted(client: httpx.AsyncClient) -> tuple[str, str]:
+    created = await client.post(
+        "/api/convert",
+        data={"category": "images", "target_format": "webp"},
+        files=[("files", ("photo.png", _png(), "image/png"))],
+    )
+    job_id = created.json()["jobId"]
+    for _ in range(400):
+        job = (await client.get(f"/api/jobs/{job_id}")).json()
+        if job["status"] in ("completed", "failed"):
+            break
+        await asyncio.sleep(0.05)
+    assert job["status"] == "completed"
+    return job_id, f"/api/jobs/{job_id}/files/photo.webp"
+
+
+async def _file_requests() -> dict[str, httpx.Response]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        _, url = await _converted(client)
+        full = await client.get(url)
+        etag = full.headers["etag"]
+        size = len(full.content)
+        return {
+            "full": full,
+            "not_modified": await client.get(url, headers={"If-None-Match": etag}),
+            "range": await client.get(url, headers={"Range": "bytes=10-19"}),
+            "suffix": await client.get(url, headers={"Range": "bytes=-5"}),
+            "if_range": await client.get(url, headers={"Range": "bytes=10-19", "If-Range": etag}),
+            "stale_if_range": await client.get(
+                url, headers={"Range": "bytes=10-19", "If-Range": '"stale"'}
+            ),
+            "unsatisfiable": await client.get(url, headers={"Range": f"bytes={size}-"}),
+        }
+
+
+def test_single_file_downloads_support_etags_and_ranges():
+    responses = asyncio.run(_file_requests())
+    full = responses["full"]
+    body = full.content
+    assert full.status_code == 200
+    assert full.headers["etag"] == f'"{hashlib.sha256(body).hexdigest()}"'
+    assert full.headers["accept-ranges"] == "bytes"
+
+    assert responses["not_modified"].status_code == 304
+    assert responses["not_modified"].content == b""
+
+    ranged = responses["range"]
+    assert ranged.status_code == 206
+    assert ranged.headers["content-range"] == f"bytes 10-19/{len(body)}"
+    assert ranged.content == body[10:20]
+    assert responses["suffix"].content == body[-5:]
+    assert responses["if_range"].status_code == 206
+
+    stale = responses["stale_if_range"]
+    assert stale.status_code == 200
+    assert stale.content == body
+
+    unsatisfiable = responses["unsatisfiable"]
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(body)}"
+
+
+async def _archive_requests() -> tuple[httpx.Response, httpx.Response]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        job_id, _ = await _converted(client)
+        url = f"/api/jobs/{job_id}/download"
+        archive = await client.get(url)
+        cached = await client.get(url, headers={"If-None-Match": archive.headers["etag"]})
+    return archive, cached
+
+
+def test_archive_download_is_not_sent_again_when_unchanged():
+    archive, cached = asyncio.run(_archive_requests())
+    assert archive.status_code == 200
+    assert archive.headers["etag"]
+    assert cached.status_code == 304
@@ -0,0 +1,73 @@
+from app import job_queue
+from app.job_queue import SqliteJobQueue
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _queue(tmp_path, monkeypatch) -> tuple[SqliteJobQueue, _Clock]:
+    clock = _Clock()
+    monkeypatch.setattr(job_queue.time, "time", clock)
+    return SqliteJobQueue(tmp_path / "queue.sqlite3", visibility_timeout=30), clock
+
+
+def test_expired_lease_is_handed_out_again(tmp_path, monkeypatch):
+    queue, clock = _queue(tmp_path, monkeypatch)
+    queue.enqueue("job")
+    first = queue.claim()
+    assert first.attempts == 1
+    assert queue.claim() is None
+
+    clock.now += 31
+    second = queue.claim()
+    assert second.job_id == "job"
+    assert second.attempts == 2
+    # The worker that lost the lease can neither keep nor finish the job.
+    assert not queue.extend(first)
+    queue.ack(first)
+    assert queue.depth() == 1
+
+    queue.ack(second)
+    assert queue.depth() == 0
+    queue.close()
+
+
+def test_extended_lease_stays_claimed(tmp_path, monkeypatch):
+    queue, clock = _queue(tmp_path, monkeypatch)
+    queue.enqueue("job")
+    lease = queue.claim()
+    clock.now += 20
+    assert queue.extend(lease)
+    clock.now += 20
+    assert queue.claim() is None
+    queue.close()
+
+
+def test_released_job_is_retried_after_the_delay(tmp_path, monkeypatch):
+    queue, clock = _queue(tmp_path, monkeypatch)
+    queue.enqueue("job")
+    queue.release(queue.claim(), delay=10)
+    assert queue.claim() is None
+
+    clock.now += 10
+    retry = queue.claim()
+    assert retry.job_id == "job"
+    assert retry.attempts == 2
+    queue.close()
+
+
+def test_head_start_orders_claims_and_claimed_jobs_cannot_be_discarded(tmp_path, monkeypatch):
+    queue, _ = _queue(tmp_path, monkeypatch)
+    queue.enqueue("large")
+    queue.enqueue("small", head_start=600)
+    assert queue.position("small") == 1
+    lease = queue.claim()
+    assert lease.job_id == "small"
+    assert not queue.discard("small")
+    assert queue.discard("large")
+    queue.close()
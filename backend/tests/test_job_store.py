@@ -0,0 +1,58 @@
+from pathlib import Path
+
+from app.job_store import SqliteJobManager
+from app.jobs import JobFileResult, JobStatus
+
+
+def _result(tmp_path: Path, name: str) -> JobFileResult:
+    return JobFileResult(
+        source_name=f"{name}.png",
+        source_path=tmp_path / f"{name}.png",
+        output_name=f"{name}.webp",
+        output_path=tmp_path / f"{name}.webp",
+    )
+
+
+def test_restart_requeues_interrupted_files_and_keeps_finished_ones(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    store = SqliteJobManager(path)
+    job = store.create_job(category="images", target_format="webp", total_files=2)
+    done = store.add_result(job.job_id, _result(tmp_path, "done"))
+    running = store.add_result(job.job_id, _result(tmp_path, "running"))
+    store.update_job(job.job_id, status=JobStatus.PROCESSING)
+    store.update_result(job.job_id, done, status=JobStatus.COMPLETED, progress=1.0)
+    store.update_result(job.job_id, running, status=JobStatus.PROCESSING, progress=0.5)
+    store.close()
+
+    restarted = SqliteJobManager(path)
+    assert restarted.recover_unfinished() == [job.job_id]
+    recovered = restarted.get_job(job.job_id)
+    restarted.close()
+
+    assert recovered.status is JobStatus.PENDING
+    assert recovered.results[done].status is JobStatus.COMPLETED
+    assert recovered.results[running].status is JobStatus.PENDING
+    assert recovered.results[running].progress == 0.0
+
+
+def test_small_progress_steps_are_not_written_until_the_file_changes(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    store = SqliteJobManager(path)
+    job = store.create_job(category="video", target_format="mp4", total_files=1)
+    index = store.add_result(job.job_id, _result(tmp_path, "clip"))
+    store.update_result(job.job_id, index, progress=0.5)
+    store.update_result(job.job_id, index, progress=0.505, fps=30.0)
+
+    other = SqliteJobManager(path)
+    # The writing process sees every step; others only the written ones.
+    assert store.get_job(job.job_id).results[index].progress == 0.505
+    assert other.get_job(job.job_id).results[index].progress == 0.5
+
+    store.update_result(job.job_id, index, status=JobStatus.COMPLETED)
+    persisted = other.get_job(job.job_id).results[index]
+    store.close()
+    other.close()
+
+    assert persisted.status is JobStatus.COMPLETED
+    assert persisted.progress == 0.505
+    assert persisted.fps == 30.0
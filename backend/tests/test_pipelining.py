@@ -0,0 +1,90 @@
+import asyncio
+import io
+import uuid
+
+import httpx
+from PIL import Image
+
+from app import main
+from app.main import app
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _part(boundary: str, name: str, value: bytes, filename: str | None = None) -> bytes:
+    disposition = f'form-data; name="{name}"'
+    if filename is not None:
+        disposition += f'; filename="{filename}"'
+    return (
+        f"--{boundary}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + value + b"\r\n"
+    )
+
+
+async def _wait_for(client: httpx.AsyncClient, job_id: str, timeout: float = 20) -> str:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        job = (await client.get(f"/api/jobs/{job_id}")).json()
+        if job["status"] in ("completed", "failed"):
+            return job["status"]
+        await asyncio.sleep(0.05)
+    return "timeout"
+
+
+async def _slow_upload_and_second_job() -> tuple[str, bool, str]:
+    boundary = uuid.uuid4().hex
+    second_done = asyncio.Event()
+    still_uploading = True
+
+    async def slow_body():
+        nonlocal still_uploading
+        yield _part(boundary, "category", b"images")
+        yield _part(boundary, "target_format", b"webp")
+        second = _part(boundary, "files", _png(), "second.png")
+        # The first file is complete once the next part's headers arrive; the
+        # rest of the upload only follows when the other job is done.
+        yield _part(boundary, "files", _png(), "first.png") + second[:100]
+        await asyncio.wait_for(second_done.wait(), 30)
+        yield second[100:]
+        still_uploading = False
+        yield f"--{boundary}--\r\n".encode()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        slow = asyncio.create_task(
+            client.post(
+                "/api/convert",
+                content=slow_body(),
+                headers={"content-type": f"multipart/form-data; boundary={boundary}"},
+            )
+        )
+        # Let the first file of the slow upload reach its job slot.
+        await asyncio.sleep(1)
+        quick = await client.post(
+            "/api/convert",
+            data={"category": "images", "target_format": "webp"},
+            files=[("files", ("quick.png", _png(), "image/png"))],
+            headers={"X-API-Key": "other"},
+        )
+        quick_status = await _wait_for(client, quick.json()["jobId"])
+        blocked_while_uploading = still_uploading
+        second_done.set()
+        slow_response = await slow
+        slow_status = await _wait_for(client, slow_response.json()["jobId"])
+    return quick_status, blocked_while_uploading, slow_status
+
+
+def test_slow_pipelined_upload_does_not_hold_the_only_job_slot(monkeypatch):
+    monkeypatch.setattr(main.settings, "pipelined_uploads", True)
+    monkeypatch.setattr(main.scheduler, "slots", 1)
+    monkeypatch.setattr(main.scheduler, "reserved_slots", 0)
+    quick_status, finished_during_upload, slow_status = asyncio.run(
+        _slow_upload_and_second_job()
+    )
+    assert quick_status == "completed"
+    assert finished_during_upload
+    assert slow_status == "completed"
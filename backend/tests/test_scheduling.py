@@ -0,0 +1,81 @@
+from typing import Callable
+
+from app.scheduling import JobScheduler
+
+_MB = 1024 * 1024
+
+
+def _scheduler(slots: int, **kwargs) -> tuple[JobScheduler, list[str], list[Callable[[], None]]]:
+    """A scheduler whose slots only finish when the test runs them."""
+
+    started: list[str] = []
+    pending: list[Callable[[], None]] = []
+    scheduler = JobScheduler(started.append, pending.append, slots=slots, **kwargs)
+    return scheduler, started, pending
+
+
+def _finish_all(pending: list[Callable[[], None]]) -> None:
+    while pending:
+        pending.pop(0)()
+
+
+def _running(scheduler: JobScheduler, *job_ids: str) -> list[str]:
+    return [job_id for job_id in job_ids if scheduler.queue_info(job_id) is None]
+
+
+def test_clients_take_turns_within_a_class():
+    scheduler, started, pending = _scheduler(1, reserved_slots=0)
+    scheduler.submit("blocker", client_id="x", category="images", input_bytes=_MB)
+    for index in range(3):
+        scheduler.submit(f"a{index}", client_id="a", category="images", input_bytes=_MB)
+    scheduler.submit("b0", client_id="b", category="images", input_bytes=_MB)
+    scheduler.submit("c0", client_id="c", category="images", input_bytes=_MB)
+
+    _finish_all(pending)
+
+    assert started == ["blocker", "a0", "b0", "c0", "a1", "a2"]
+
+
+def test_small_jobs_get_weighted_turns_while_large_ones_wait():
+    scheduler, started, pending = _scheduler(1, reserved_slots=0)
+    scheduler.submit("blocker", client_id="x", category="images", input_bytes=_MB)
+    for index in range(4):
+        scheduler.submit(f"large{index}", client_id="x", category="video", input_bytes=500 * _MB)
+    for index in range(8):
+        scheduler.submit(f"small{index}", client_id="y", category="images", input_bytes=_MB)
+
+    _finish_all(pending)
+
+    order = started[1:]
+    # Four small jobs per large one, and large jobs still make progress.
+    assert order.index("large0") <= 4
+    assert order.index("large1") <= 9
+    assert order[-2:] == ["large2", "large3"]
+
+
+def test_large_jobs_leave_the_reserved_slot_free():
+    scheduler, started, pending = _scheduler(2, reserved_slots=1)
+    scheduler.submit("large0", client_id="a", category="video", input_bytes=500 * _MB)
+    scheduler.submit("large1", client_id="b", category="video", input_bytes=500 * _MB)
+    assert _running(scheduler, "large0", "large1") == ["large0"]
+
+    scheduler.submit("small", client_id="c", category="images", input_bytes=_MB)
+    assert _running(scheduler, "large0", "large1", "small") == ["large0", "small"]
+
+    _finish_all(pending)
+    assert started == ["large0", "small", "large1"]
+
+
+def test_per_client_limit_only_applies_while_others_wait():
+    scheduler, started, pending = _scheduler(2, per_client_limit=1, reserved_slots=0)
+    for index in range(3):
+        scheduler.submit(f"a{index}", client_id="a", category="images", input_bytes=_MB)
+    # Nobody else is waiting, so client a may use both slots.
+    assert _running(scheduler, "a0", "a1", "a2") == ["a0", "a1"]
+
+    scheduler.submit("b0", client_id="b", category="images", input_bytes=_MB)
+    pending.pop(0)()
+    assert _running(scheduler, "a1", "a2", "b0") == ["a1", "b0"]
+
+    _finish_all(pending)
+    assert started == ["a0", "a1", "b0", "a2"]
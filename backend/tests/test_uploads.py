@@ -0,0 +1,47 @@
+import asyncio
+
+import httpx
+
+from app.main import app
+
+SIZE = 4 * 1024 * 1024
+
+
+async def _slow_body(data: bytes, pieces: int = 8):
+    step = len(data) // pieces
+    for start in range(0, len(data), step):
+        yield data[start : start + step]
+        await asyncio.sleep(0.02)
+
+
+async def _overlapping_chunks() -> tuple[int, int, int]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        created = await client.post(
+            "/api/uploads",
+            json={
+                "category": "images",
+                "target_format": "png",
+                "files": [{"name": "big.png", "size": SIZE}],
+            },
+        )
+        assert created.status_code == 201
+        upload_id = created.json()["uploadId"]
+        url = f"/api/uploads/{upload_id}/files/0"
+        headers = {"Upload-Offset": "0"}
+
+        responses = await asyncio.gather(
+            client.patch(url, content=_slow_body(b"x" * SIZE), headers=headers),
+            client.patch(url, content=_slow_body(b"y" * SIZE), headers=headers),
+        )
+        status = await client.get(f"/api/uploads/{upload_id}")
+        await client.delete(f"/api/uploads/{upload_id}")
+    first, second = sorted(response.status_code for response in responses)
+    return first, second, status.json()["files"][0]["offset"]
+
+
+def test_overlapping_chunks_at_the_same_offset_conflict():
+    accepted, rejected, offset = asyncio.run(_overlapping_chunks())
+    assert accepted == 204
+    assert rejected == 409
+    assert offset == SIZE
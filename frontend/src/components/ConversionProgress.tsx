@@ -27,6 +27,9 @@ export const ConversionProgress = ({
             {translateStatus(job.status)}
             {showActivityDot && <span className="status-dot" />}
           </p>
+          {job.status === "pending" && job.queuePosition !== null && (
+            <p className="status-line">{describeQueue(job)}</p>
+          )}
         </div>
         <div className="progress-bar">
           <div className="progress-bar-fill" style={{ width: `${progressPercent}%` }} />
@@ -82,6 +85,18 @@ const translateStatus = (status: ConversionJob["status"]) => {
   }
 };
 
+const describeQueue = (job: ConversionJob) => {
+  const position = `Position ${job.queuePosition} in queue`;
+  if (job.estimatedStartAt === null) {
+    return position;
+  }
+  const waitSeconds = Math.max(0, Math.round(job.estimatedStartAt - Date.now() / 1000));
+  if (waitSeconds < 60) {
+    return `${position}, starting in under a minute`;
+  }
+  return `${position}, starting in about ${Math.round(waitSeconds / 60)} min`;
+};
+
 const renderSubtitle = (result: ConversionResult) => {
   if (result.status === "failed") {
     return result.error ?? "Unknown error";
@@ -90,6 +105,10 @@ const renderSubtitle = (result: ConversionResult) => {
     return "Ready to download";
   }
   if (result.status === "processing") {
+    if (result.progress > 0) {
+      const speed = result.speed ? ` at ${result.speed.toFixed(1)}x` : "";
+      return `Processing... ${Math.round(result.progress * 100)}%${speed}`;
+    }
     return "Processing...";
   }
   if (result.status === "cancelled") {
@@ -61,40 +61,23 @@ export const ConvertPage = () => {
 
   useEffect(() => {
     if (!jobId) return;
-    let cancelled = false;
     setPolling(true);
 
-    const poll = async () => {
-      try {
-        const data = await api.fetchJob(jobId);
-        if (cancelled) return;
+    const stop = api.watchJob(
+      jobId,
+      (data) => {
         setJob(data);
         if (data.status === "completed" || data.status === "failed") {
           setPolling(false);
-          return true;
         }
-      } catch (err) {
-        if (!cancelled) {
-          setUserError(err instanceof Error ? err.message : "Failed to fetch job details.");
-          setPolling(false);
-        }
-        return true;
-      }
-      return false;
-    };
-
-    void poll();
-    const interval = setInterval(async () => {
-      const shouldStop = await poll();
-      if (shouldStop) {
-        clearInterval(interval);
-      }
-    }, 1500);
+      },
+      (err) => {
+        setUserError(err.message);
+        setPolling(false);
+      },
+    );
 
-    return () => {
-      cancelled = true;
-      clearInterval(interval);
-    };
+    return stop;
   }, [jobId]);
 
   useEffect(() => {
@@ -178,8 +161,6 @@ export const ConvertPage = () => {
         },
       });
       setJobId(id);
-      const initialJob = await api.fetchJob(id);
-      setJob(initialJob);
     } catch (err) {
       setUserError(err instanceof Error ? err.message : "Conversion failed.");
     } finally {
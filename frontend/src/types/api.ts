@@ -1,24 +1,54 @@
 export type JobStatus = "pending" | "processing" | "completed" | "failed" | "cancelled";
 
+export interface InputMetadata {
+  format: string | null;
+  duration: number | null;
+  width: number | null;
+  height: number | null;
+  frames: number | null;
+  frameRate: number | null;
+  videoCodec: string | null;
+  audioCodec: string | null;
+  bitRate: number | null;
+}
+
 export interface ConversionResult {
   sourceName: string;
   outputName: string;
+  targetFormat: string | null;
+  profile: string | null;
   status: JobStatus;
   error: string | null;
+  note: string | null;
+  progress: number;
+  speed: number | null;
+  fps: number | null;
+  metadata: InputMetadata | null;
 }
 
 export interface ConversionJob {
   jobId: string;
   category: string;
   targetFormat: string;
+  targetFormats: string[];
   status: JobStatus;
   progress: number;
   totalFiles: number;
   processedFiles: number;
   error: string | null;
+  costClass: "small" | "medium" | "large";
+  queuePosition: number | null;
+  estimatedStartAt: number | null;
+  estimatedSeconds: number | null;
   results: ConversionResult[];
 }
 
+export type ConversionJobSummary = Omit<ConversionJob, "results">;
+
+export interface ConversionResultEvent extends ConversionResult {
+  index: number;
+}
+
 export type CategoryMap = Record<string, string[]>;
 
 export interface StoredJobMeta {
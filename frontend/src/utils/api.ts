@@ -1,4 +1,10 @@
-import type { CategoryMap, ConversionJob, UploadProgressPayload } from "../types/api";
+import type {
+  CategoryMap,
+  ConversionJob,
+  ConversionJobSummary,
+  ConversionResultEvent,
+  UploadProgressPayload,
+} from "../types/api";
 
 const rawBase = import.meta.env.VITE_API_BASE_URL ?? "/api";
 const API_BASE_URL = rawBase.replace(/\/$/, "");
@@ -150,6 +156,90 @@ export const api = {
     return handleJsonResponse<ConversionJob>(response);
   },
 
+  /**
+   * Follow a job through its server-sent event stream, falling back to
+   * polling when EventSource is unavailable or the stream cannot be opened.
+   * Returns a function that stops watching.
+   */
+  watchJob(
+    jobId: string,
+    onUpdate: (job: ConversionJob) => void,
+    onError: (error: Error) => void,
+  ): () => void {
+    let stopped = false;
+    let current: ConversionJob | null = null;
+    let pollTimer: ReturnType<typeof setInterval> | null = null;
+    let source: EventSource | null = null;
+
+    const emit = (job: ConversionJob) => {
+      current = job;
+      onUpdate(job);
+    };
+
+    const isFinished = (job: Pick<ConversionJob, "status">) =>
+      job.status === "completed" || job.status === "failed" || job.status === "cancelled";
+
+    const startPolling = () => {
+      const poll = async () => {
+        try {
+          const job = await api.fetchJob(jobId);
+          if (stopped) return;
+          emit(job);
+          if (isFinished(job) && pollTimer) {
+            clearInterval(pollTimer);
+          }
+        } catch (err) {
+          if (stopped) return;
+          if (pollTimer) clearInterval(pollTimer);
+          onError(err instanceof Error ? err : new Error("Failed to fetch job details."));
+        }
+      };
+      void poll();
+      pollTimer = setInterval(poll, 1500);
+    };
+
+    if (typeof EventSource === "undefined") {
+      startPolling();
+    } else {
+      source = new EventSource(`${API_BASE_URL}/jobs/${jobId}/events`);
+      source.addEventListener("snapshot", (event) => {
+        emit(JSON.parse((event as MessageEvent<string>).data) as ConversionJob);
+      });
+      source.addEventListener("job", (event) => {
+        if (!current) return;
+        const summary = JSON.parse((event as MessageEvent<string>).data) as ConversionJobSummary;
+        emit({ ...current, ...summary });
+        if (isFinished(summary)) {
+          source?.close();
+        }
+      });
+      source.addEventListener("file", (event) => {
+        if (!current) return;
+        const { index, ...result } = JSON.parse(
+          (event as MessageEvent<string>).data,
+        ) as ConversionResultEvent;
+        const results = current.results.slice();
+        results[index] = result;
+        emit({ ...current, results });
+      });
+      source.addEventListener("deleted", () => {
+        source?.close();
+        onError(new Error("Job not found"));
+      });
+      source.onerror = () => {
+        if (stopped || (current && isFinished(current))) return;
+        source?.close();
+        startPolling();
+      };
+    }
+
+    return () => {
+      stopped = true;
+      source?.close();
+      if (pollTimer) clearInterval(pollTimer);
+    };
+  },
+
   async downloadAll(jobId: string): Promise<Blob> {
     const response = await fetch(`${API_BASE_URL}/jobs/${jobId}/download`);
     return handleBlobResponse(response);